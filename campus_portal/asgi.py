@@ -13,5 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_portal.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Server-sent events of newly approved items at /live/items/
+# (imported after Django is set up, see lostfound/live.py)
+from lostfound.live import live_updates_application  # noqa: E402
+
+application = live_updates_application(django_application)
 
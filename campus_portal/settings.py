@@ -8,6 +8,8 @@ Think of it as the "control center" for your application.
 from pathlib import Path
 import os
 
+from lostfound.pwa import add_static_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # BASE_DIR is the root folder of your project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +30,10 @@ RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 
+# Campuses with their own host name (see lostfound/campus.py), comma-separated.
+# (In development, names like north.localhost work without this.)
+ALLOWED_HOSTS += [host.strip() for host in os.environ.get('CAMPUS_DOMAINS', '').split(',') if host.strip()]
+
 
 # Application definition
 # INSTALLED_APPS: All the apps (modules) your project uses
@@ -37,11 +43,9 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',  # Content types framework (built-in)
     'django.contrib.sessions',      # Session management (built-in)
     'django.contrib.messages',      # Flash messages (built-in)
+    'whitenoise.runserver_nostatic',  # runserver leaves /static/ to WhiteNoise (it adds our headers)
     'django.contrib.staticfiles',   # Static files (CSS, JS, images)
     'lostfound',                    # Our custom app for lost & found items
-    # Cloudinary for persistent media storage
-    'cloudinary',
-    'cloudinary_storage',
 ]
 
 # MIDDLEWARE: Components that process requests/responses
@@ -49,12 +53,17 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'lostfound.feeds.FeedFilesMiddleware',  # Generated RSS/Atom feeds and sitemap
+    'lostfound.metrics.MetricsMiddleware',  # Request times and query counts for /metrics
+    'lostfound.campus.CampusMiddleware',  # Sets request.campus (from the host or /c/<slug>/)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',  # Protects against CSRF attacks
     'django.contrib.auth.middleware.AuthenticationMiddleware',  # Adds user to request
     'django.contrib.messages.middleware.MessageMiddleware',
+    'lostfound.pwa.NoStoreMessagesMiddleware',  # Pages showing messages aren't kept offline
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lostfound.profiling.ProfilingMiddleware',  # Staff can profile a request with ?_profile=1
 ]
 
 # ROOT_URLCONF: Where Django looks for URL patterns
@@ -94,16 +103,22 @@ DATABASES = {
 }
 
 # Render PostgreSQL Database Configuration
-import dj_database_url
+# dj_database_url is only imported when DATABASE_URL is set, so local
+# development (and worker start-up) doesn't pay for it.
 database_url = os.environ.get('DATABASE_URL')
 
 if database_url:
+    import dj_database_url
     DATABASES['default'] = dj_database_url.parse(
         database_url,
         conn_max_age=600,
         conn_health_checks=True,
     )
 
+# PostgreSQL-only features (trigram search lookups, see lostfound/search.py)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    INSTALLED_APPS.append('django.contrib.postgres')
+
 
 # Password validation
 # Rules for password strength
@@ -133,20 +148,134 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
-STATIC_URL = 'static/'
+STATIC_URL = '/static/'  # Leading slash: the same URL on every campus (no /c/<slug>/ prefix)
 STATICFILES_DIRS = [BASE_DIR / 'static']  # Where to find static files during development
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Lets /static/js/service-worker.js work offline for the whole site (see lostfound/pwa.py)
+WHITENOISE_ADD_HEADERS_FUNCTION = add_static_headers
+WHITENOISE_MIMETYPES = {'.webmanifest': 'application/manifest+json'}
 
 # ---------------- Cloudinary Storage ----------------
 # When Cloudinary credentials are provided, store media & static files there.
+# The cloudinary apps are only installed (and imported) in that case, which
+# keeps worker start-up fast when Cloudinary isn't used.
+# (Run `python manage.py profile_startup` to see what start-up costs.)
 if os.environ.get('CLOUDINARY_CLOUD_NAME'):
+    INSTALLED_APPS += ['cloudinary', 'cloudinary_storage']
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
     STATICFILES_STORAGE  = 'cloudinary_storage.storage.StaticHashedCloudinaryStorage'
+else:
+    # Local disk: store each photo once, named after its content hash
+    # (see lostfound/storage.py). Uploads are always streamed to a temp
+    # file on disk instead of being read into memory first.
+    DEFAULT_FILE_STORAGE = 'lostfound.storage.ContentAddressedStorage'
+    FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
 # ----------------------------------------------------
 
+# Campuses (see lostfound/campus.py)
+# Requests whose host isn't a campus domain and whose path has no /c/<slug>/
+# prefix belong to this campus (created automatically if missing).
+DEFAULT_CAMPUS = os.environ.get('DEFAULT_CAMPUS', 'main')
+CAMPUS_DIRECTORY_SECONDS = 300  # Each process reloads the campus list at least this often
+
+# Admin item lists (see lostfound/changelist.py)
+# On PostgreSQL, lists the planner expects to have more rows than this show
+# an estimated count instead of running COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Item event log (see lostfound/events.py)
+EVENT_LOG_BATCH_SIZE = 500     # Events handed to a consumer at once
+EVENT_LOG_GAP_SECONDS = 600    # How long consumers wait for a skipped event ID (its transaction may still be open)
+EVENT_LOG_KEEP_DAYS = 30       # compact_events keeps every event of this many days
+
+# Email (used by the notification worker, see lostfound/notifications.py)
+# The console backend prints emails instead of sending them; set
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend and EMAIL_HOST etc.
+# in production
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') != '0'
+EMAIL_TIMEOUT = 30
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Campus Lost & Found <noreply@localhost>')
+
+# Notification outbox (see lostfound/notifications.py)
+NOTIFICATION_BATCH_SIZE = 100     # Notifications per batch (one SMTP connection per batch)
+NOTIFICATION_MAX_ATTEMPTS = 6     # Then the notification is marked failed
+NOTIFICATION_RETRY_SECONDS = 60   # Wait before the first retry, doubled after every failure
+NOTIFICATION_LEASE_SECONDS = 300  # A crashed worker's notifications are retried after this
+
+# Accounts created from a roster (see lostfound/roster.py)
+# Invitation links to choose a password stop working after this many days
+INVITATION_DAYS = 30
+
+# Prometheus metrics at /metrics (see lostfound/metrics.py)
+# Every worker process writes its numbers to a file in METRICS_DIR (all
+# workers of one server must use the same directory) at most every
+# METRICS_FLUSH_SECONDS. Set METRICS_TOKEN to let Prometheus scrape with
+# "Authorization: Bearer <token>"; without it only staff can read /metrics.
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# On-demand request profiling for staff (see lostfound/profiling.py)
+# Saved profiles are kept outside FEEDS_ROOT, which is served to everyone
+PROFILES_ROOT = BASE_DIR / 'profiles'
+PROFILE_KEEP = 100  # Older profiles (and their files) are deleted
+
+# Near-duplicate post detection (see lostfound/duplicates.py)
+# New posts whose title + description are at least this similar (0 to 1) to
+# a post of the last DUPLICATE_WINDOW_DAYS days are flagged for moderators
+DUPLICATE_SIMILARITY = 0.8
+DUPLICATE_WINDOW_DAYS = 90
+
+# Cache shared by all processes (gunicorn workers, management commands)
+# Other processes learn that items, campuses or users' posts changed through
+# generation values in this cache (search_cache, page_cache, dashboard,
+# live, typeahead, image_hashing, campus), and the rate limits count in it.
+# So it must NOT be Django's default per-process memory cache:
+# - REDIS_URL set (e.g. redis://localhost:6379/0): Redis, shared by every server
+# - otherwise: files in CACHE_DIR, shared by the processes of one server
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Full-page cache for anonymous visitors (see lostfound/page_cache.py)
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_SECONDS = 300  # Longest a cached page may be out of date
+
+# Live updates over server-sent events (see lostfound/live.py, ASGI only)
+LIVE_MAX_CONNECTIONS = 2000            # Open connections per server process
+LIVE_MAX_CONNECTIONS_PER_CLIENT = 4    # Per IP address (a few tabs)
+LIVE_QUEUE_SIZE = 100                  # Events waiting per connection before it is reset
+LIVE_POLL_SECONDS = 2                  # How often to check for items approved by other processes
+
+# RSS/Atom feeds and sitemap files (see lostfound/feeds.py)
+# They contain absolute links, so they need the site's address.
+FEEDS_ROOT = BASE_DIR / 'generated'
+if RENDER_EXTERNAL_HOSTNAME:
+    SITE_URL = os.environ.get('SITE_URL', f'https://{RENDER_EXTERNAL_HOSTNAME}')
+else:
+    SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
 # Media files (User uploaded files like images)
-MEDIA_URL = 'media/'
+MEDIA_URL = '/media/'  # Leading slash, like STATIC_URL
 MEDIA_ROOT = BASE_DIR / 'media'  # Where uploaded files are stored
 
 # Default primary key field type
@@ -157,3 +286,26 @@ LOGIN_URL = 'login'  # If user tries to access protected page, redirect here
 LOGIN_REDIRECT_URL = 'home'  # After login, go to home page
 LOGOUT_REDIRECT_URL = 'home'  # After logout, go to home page
 
+
+# Rate limiting (see lostfound/ratelimit.py)
+# Limits are "<requests>/<period>" per user (or per IP for anonymous users)
+# Set RATELIMIT_ENABLED=0 to switch it off (the load test does this, see `manage.py loadtest`)
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+RATELIMIT_CACHE = 'default'
+RATELIMIT_RATES = {
+    'post_item': '10/h',   # Posting lost/found items
+    'login': '10/m',       # Login attempts (each one runs a slow password hash)
+    'search': '120/m',     # Searches on the list pages
+}
+# Render and most hosts put a proxy in front of the app
+RATELIMIT_TRUST_X_FORWARDED_FOR = 'RENDER' in os.environ
+
+# Typo-tolerant search (see lostfound/search.py)
+# Fraction of the search's letter-trigrams an item must contain (0 to 1).
+# Lower = more forgiving of typos, but more unrelated results.
+SEARCH_TRIGRAM_THRESHOLD = 0.4
+
+# List/search result cache (see lostfound/search_cache.py)
+# Maximum number of cached result pages per worker process
+SEARCH_CACHE_MAX_ENTRIES = 1000
+SEARCH_CACHE_SECONDS = 60  # Longest a cached result page may be out of date
@@ -9,7 +9,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
+from lostfound.storage import serve
 
 urlpatterns = [
     # Admin panel URL - accessible at /admin/
@@ -20,6 +20,7 @@ urlpatterns = [
     path('', include('lostfound.urls')),
 
     # Serve media files in production (Hackathon specific config)
+    # Our serve() supports Range and conditional requests (see lostfound/storage.py)
     re_path(r'^media/(?P<path>.*)$', serve, {
         'document_root': settings.MEDIA_ROOT,
     }),
@@ -4,8 +4,173 @@ This file controls what appears in Django's admin interface.
 Admin can approve posts, mark items as returned, etc.
 """
 
-from django.contrib import admin
-from .models import UserProfile, LostItem, FoundItem
+from django.contrib import admin, messages
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from . import analytics, profiling, roster
+from .campus import directory
+from .changelist import EstimatedCountPaginator
+from .forms import ItemImportForm
+from .image_hashing import DUPLICATE_DISTANCE, find_similar_items
+from .importers import import_uploaded_file
+from .models import (
+    Campus, UserProfile, LostItem, FoundItem, DailyRollup, Notification, RequestProfile, Invitation,
+)
+
+
+class BulkImportAdminMixin:
+    """
+    Adds an "Import" button to the item list in the admin panel.
+    Staff can upload a CSV/JSONL file instead of posting items one by one.
+    """
+    import_item_type = None  # 'lost' or 'found'
+    change_list_template = 'admin/lostfound/change_list_import.html'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name=f'{self.opts.app_label}_{self.opts.model_name}_import',
+            ),
+        ]
+        # Custom URLs must come first, otherwise 'import/' is treated as an object ID
+        return custom_urls + urls
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:index')
+
+        result = None
+        if request.method == 'POST':
+            form = ItemImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                result = import_uploaded_file(
+                    form.cleaned_data['file'],
+                    self.import_item_type,
+                    request.user,
+                    approve=form.cleaned_data['approve'],
+                    campus=form.cleaned_data['campus'],
+                )
+                level = messages.SUCCESS if not result.failed else messages.WARNING
+                self.message_user(
+                    request,
+                    f'Imported {result.created} of {result.total} rows '
+                    f'({result.failed} rows had errors).',
+                    level,
+                )
+                if not result.failed:
+                    return redirect(
+                        f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist'
+                    )
+        else:
+            form = ItemImportForm(initial={'campus': directory.get_default()})
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': f'Import {self.opts.verbose_name_plural}',
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/lostfound/import_items.html', context)
+
+
+class LargeTableAdminMixin:
+    """
+    Item lists that stay fast with millions of rows (see changelist.py):
+    users and campuses are fetched with a JOIN instead of one query per row,
+    big counts are estimated, search uses the trigram indexes and the date
+    links come from two index lookups.
+    """
+    list_select_related = ['posted_by', 'campus']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skip the second COUNT(*) of the whole table
+    date_hierarchy = 'created_at'
+    # Each row has editable status/approval widgets, which take longer to
+    # render than the queries take to run, so show 50 rows instead of 100
+    list_per_page = 50
+    search_fields = ['title__ilike', 'description__ilike']
+    search_help_text = 'Searches titles and descriptions. Type user:<username> for one user\'s posts.'
+
+    def get_search_results(self, request, queryset, search_term):
+        # "user:alice" -> exact (indexed) username match instead of a text search
+        if search_term.startswith('user:'):
+            username = search_term[len('user:'):].strip()
+            return queryset.filter(posted_by__username=username), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.display(description='Similar photos')
+def similar_photos(obj):
+    """
+    Lists posts (approved or not) whose photo looks like this one,
+    so moderators can spot the same item posted twice.
+    """
+    if not obj.pk:
+        return '-'
+    matches = find_similar_items(obj, approved_only=False)
+    if not matches:
+        return 'None'
+    return format_html_join(
+        mark_safe('<br>'),
+        '<a href="{}">{} {}: {}</a> ({})',
+        (
+            (
+                reverse(f'admin:lostfound_{kind}item_change', args=[other.pk]),
+                kind.capitalize(), other.pk, other.title,
+                'duplicate' if distance <= DUPLICATE_DISTANCE else f'{distance} bits apart',
+            )
+            for distance, kind, other in matches
+        ),
+    )
+
+
+@admin.display(description='Duplicate of', ordering='duplicate_of')
+def duplicate_link(obj):
+    """
+    Link to the earlier post this one repeats (see duplicates.py).
+    """
+    if not obj.duplicate_of_id:
+        return '-'
+    return format_html(
+        '<a href="{}">#{}</a>',
+        reverse(f'admin:{obj._meta.app_label}_{obj._meta.model_name}_change', args=[obj.duplicate_of_id]),
+        obj.duplicate_of_id,
+    )
+
+
+class DuplicateFilter(admin.SimpleListFilter):
+    """
+    "Possible duplicate: Yes/No" on the right of the item lists.
+    """
+    title = 'possible duplicate'
+    parameter_name = 'duplicate'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(duplicate_of__isnull=False)
+        if self.value() == 'no':
+            return queryset.filter(duplicate_of__isnull=True)
+        return queryset
+
+
+@admin.register(Campus)
+class CampusAdmin(admin.ModelAdmin):
+    """
+    Campuses served by this deployment (see campus.py).
+    """
+    list_display = ['name', 'slug', 'domain', 'created_at']
+    prepopulated_fields = {'slug': ['name']}
 
 
 @admin.register(UserProfile)
@@ -13,41 +178,200 @@ class UserProfileAdmin(admin.ModelAdmin):
     """
     Configure how UserProfile appears in admin panel.
     """
-    list_display = ['user', 'student_id', 'phone', 'created_at']
+    list_display = ['user', 'campus', 'student_id', 'phone', 'created_at']
     # What columns to show in the list view
+    list_filter = ['campus']
     search_fields = ['user__username', 'student_id']
     # Allow searching by username and student_id
 
 
 @admin.register(LostItem)
-class LostItemAdmin(admin.ModelAdmin):
+class LostItemAdmin(BulkImportAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
     """
     Configure LostItem admin interface.
     """
-    list_display = ['title', 'posted_by', 'category', 'status', 'is_approved', 'created_at']
+    import_item_type = 'lost'
+    # Enables the bulk import page (see BulkImportAdminMixin)
+    
+    list_display = ['title', 'posted_by', 'campus', 'category', 'status', 'is_approved', duplicate_link, 'created_at']
     # Columns to display
     
-    list_filter = ['category', 'status', 'is_approved', 'created_at']
+    list_filter = ['campus', 'category', 'status', 'is_approved', DuplicateFilter, 'created_at']
     # Filters on the right side (for easy filtering)
-    
-    search_fields = ['title', 'description', 'posted_by__username']
-    # Search functionality
+    # (Search, counting and date links: see LargeTableAdminMixin)
     
     list_editable = ['is_approved', 'status']
     # Allow editing directly from list view (quick approve/reject)
     
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', similar_photos]
     # These fields can't be edited (auto-generated)
+    
+    raw_id_fields = ['duplicate_of']
+    # An item ID box instead of a dropdown of every item
 
 
 @admin.register(FoundItem)
-class FoundItemAdmin(admin.ModelAdmin):
+class FoundItemAdmin(BulkImportAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
     """
     Configure FoundItem admin interface.
     """
-    list_display = ['title', 'posted_by', 'category', 'status', 'is_approved', 'created_at']
-    list_filter = ['category', 'status', 'is_approved', 'created_at']
-    search_fields = ['title', 'description', 'posted_by__username']
+    import_item_type = 'found'
+    list_display = ['title', 'posted_by', 'campus', 'category', 'status', 'is_approved', duplicate_link, 'created_at']
+    list_filter = ['campus', 'category', 'status', 'is_approved', DuplicateFilter, 'created_at']
     list_editable = ['is_approved', 'status']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', similar_photos]
+    raw_id_fields = ['claimed_by', 'duplicate_of']  # ID boxes instead of dropdowns of every user/item
 
+
+@admin.register(DailyRollup)
+class AnalyticsAdmin(admin.ModelAdmin):
+    """
+    "Analytics" page in the admin panel.
+    Shows recovery rate, time to return and posts per day, read only from
+    the daily rollups (see analytics.py), never from the item tables.
+    """
+    change_list_template = 'admin/lostfound/analytics.html'
+    PERIODS = [7, 30, 90, 365]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            days = 30
+        if days not in self.PERIODS:
+            days = 30
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'Analytics',
+            'periods': self.PERIODS,
+            'summary': analytics.summary(days),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, self.change_list_template, context)
+
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """
+    The email outbox (see notifications.py): what was sent, what is
+    waiting and what failed. Failed emails can be retried from here.
+    """
+    list_display = ['created_at', 'user', 'event', 'title', 'status', 'attempts', 'sent_at']
+    list_filter = ['status', 'event']
+    search_fields = ['user__username', 'title']
+    list_select_related = ['user']
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_retry_permission(self, request):
+        return request.user.has_perm('lostfound.change_notification')
+    
+    @admin.action(description='Retry sending now', permissions=['retry'])
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), locked_until=None,
+        )
+        self.message_user(request, f'{count} notifications will be sent by the next worker batch.')
+
+
+
+@admin.register(Invitation)
+class InvitationAdmin(admin.ModelAdmin):
+    """
+    Invitation emails of accounts created from a roster (see roster.py).
+    Invitations that failed or expired can be sent again from here.
+    """
+    list_display = ['user', 'campus', 'status', 'created_at', 'sent_at', 'expires_at', 'accepted_at']
+    list_filter = ['status', 'campus', ('accepted_at', admin.EmptyFieldListFilter)]
+    search_fields = ['user__username', 'user__email']
+    list_select_related = ['user', 'campus']
+    paginator = EstimatedCountPaginator  # A roster can have tens of thousands of students
+    show_full_result_count = False
+    actions = ['send_again']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_resend_permission(self, request):
+        return request.user.has_perm('lostfound.change_invitation')
+    
+    @admin.action(description='Send again with a new link', permissions=['resend'])
+    def send_again(self, request, queryset):
+        count = roster.renew(queryset)
+        self.message_user(request, f'{count} invitations will be sent by the next worker batch.')
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    "Request profiles" in the admin panel: requests that staff profiled
+    with ?_profile=1 (see profiling.py). Opening one shows a flame graph
+    and the slowest functions; the raw .prof file can be downloaded.
+    """
+    change_form_template = 'admin/lostfound/request_profile.html'
+    list_display = ['created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'user']
+    list_filter = ['method', 'status_code']
+    search_fields = ['path']
+    list_select_related = ['user']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                '<int:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name=f'{self.opts.app_label}_{self.opts.model_name}_download',
+            ),
+        ]
+        return custom_urls + urls
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        record = self.get_object(request, object_id)
+        stats = profiling.load_stats(record) if record else None
+        extra_context = extra_context or {}
+        if stats is not None:
+            sort = 'cumtime' if request.GET.get('sort') == 'cumtime' else 'tottime'
+            boxes, total_ms = profiling.flame_graph(stats)
+            extra_context.update({
+                'has_stats': True,
+                'sort': sort,
+                'top_functions': profiling.top_functions(stats, sort),
+                'flame_boxes': boxes,
+                'flame_height': (max((box['depth'] for box in boxes), default=0) + 1) * 18,
+                'total_ms': total_ms,
+            })
+        return super().change_view(request, object_id, form_url, extra_context)
+    
+    def download_view(self, request, object_id):
+        record = self.get_object(request, str(object_id))
+        if record is None or not self.has_view_permission(request, record):
+            raise Http404
+        file_path = profiling.profiles_root() / record.file_name
+        if not file_path.exists():
+            raise Http404
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=record.file_name)
@@ -0,0 +1,202 @@
+"""
+Analytics for the admin panel: recovery rate, time to return, posts per day.
+
+Computing these from the LostItem / FoundItem tables would read every item
+each time. Instead we keep DAILY ROLLUPS: one DailyRollup row per
+(day, kind, category) with running counters, updated as things happen:
+
+- an item is posted            -> posted += 1 on the day it was posted
+- an item is found/claimed/
+  returned                     -> recovered += 1 on that day, and the time
+                                  since posting is added to a histogram
+- an item goes back to pending -> reopened += 1 on that day
+
+The analytics page only reads rollup rows for the chosen period, so it
+costs the same whether we keep one month or ten years of items.
+
+If the rollups are ever lost, `python manage.py rebuild_rollups` rebuilds
+them from the item tables (using updated_at as the recovery date, since
+the real one is not stored on the item).
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LostItem, FoundItem, DailyRollup
+
+
+# Statuses that mean "the owner got the item back (or it was found)"
+RECOVERED_STATUSES = {
+    'lost': {'found', 'returned'},
+    'found': {'claimed', 'returned'},
+}
+
+# Upper limits (in hours) of the time-to-return histogram buckets.
+# The last bucket holds everything longer than the last limit.
+RETURN_TIME_BUCKETS = [1, 6, 12, 24, 48, 72, 168, 336, 720]
+BUCKET_LABELS = [
+    'under 1 hour', '1-6 hours', '6-12 hours', '12-24 hours', '1-2 days',
+    '2-3 days', '3-7 days', '1-2 weeks', '2-4 weeks', 'over 4 weeks',
+]
+
+ITEM_MODELS = {'lost': LostItem, 'found': FoundItem}
+
+
+def bucket_for(duration):
+    hours = duration.total_seconds() / 3600
+    for index, limit in enumerate(RETURN_TIME_BUCKETS):
+        if hours < limit:
+            return index
+    return len(RETURN_TIME_BUCKETS)
+
+
+def empty_histogram():
+    return [0] * (len(RETURN_TIME_BUCKETS) + 1)
+
+
+def _rollup_for_update(date, kind, category):
+    """
+    Get (or create) the rollup row and lock it until the transaction ends.
+    """
+    DailyRollup.objects.get_or_create(date=date, kind=kind, category=category)
+    return DailyRollup.objects.select_for_update().get(date=date, kind=kind, category=category)
+
+
+def record_posted(kind, category, created_at, count=1):
+    date = timezone.localdate(created_at)
+    DailyRollup.objects.get_or_create(date=date, kind=kind, category=category)
+    DailyRollup.objects.filter(date=date, kind=kind, category=category).update(
+        posted=F('posted') + count
+    )
+
+
+def record_posted_items(kind, items):
+    """
+    Count many new items at once (used by bulk imports, which send no signals).
+    """
+    counts = {}
+    for item in items:
+        key = (timezone.localdate(item.created_at), item.category)
+        counts[key] = counts.get(key, 0) + 1
+    with transaction.atomic():
+        for (date, category), count in counts.items():
+            DailyRollup.objects.get_or_create(date=date, kind=kind, category=category)
+            DailyRollup.objects.filter(date=date, kind=kind, category=category).update(
+                posted=F('posted') + count
+            )
+
+
+def record_status_change(kind, item, old_status):
+    """
+    Update today's rollup when an item moves into or out of a recovered status.
+    """
+    recovered = RECOVERED_STATUSES[kind]
+    was_recovered = old_status in recovered
+    is_recovered = item.status in recovered
+    if was_recovered == is_recovered:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        rollup = _rollup_for_update(timezone.localdate(now), kind, item.category)
+        if is_recovered:
+            histogram = rollup.return_time_histogram or empty_histogram()
+            histogram[bucket_for(now - item.created_at)] += 1
+            rollup.return_time_histogram = histogram
+            rollup.recovered += 1
+        else:
+            rollup.reopened += 1
+        rollup.save(update_fields=['recovered', 'reopened', 'return_time_histogram'])
+
+
+def rebuild():
+    """
+    Recompute every rollup from the item tables (slow; management command only).
+    """
+    rollups = {}
+
+    def row(date, kind, category):
+        key = (date, kind, category)
+        if key not in rollups:
+            rollups[key] = DailyRollup(
+                date=date, kind=kind, category=category,
+                return_time_histogram=empty_histogram(),
+            )
+        return rollups[key]
+
+    for kind, model in ITEM_MODELS.items():
+        items = model.objects.values_list('category', 'status', 'created_at', 'updated_at')
+        for category, status, created_at, updated_at in items.iterator(chunk_size=5000):
+            row(timezone.localdate(created_at), kind, category).posted += 1
+            if status in RECOVERED_STATUSES[kind]:
+                rollup = row(timezone.localdate(updated_at), kind, category)
+                rollup.recovered += 1
+                rollup.return_time_histogram[bucket_for(updated_at - created_at)] += 1
+
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        DailyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+    return len(rollups)
+
+
+def _median_bucket(histogram):
+    """
+    Label of the bucket that contains the median time to return.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen * 2 >= total:
+            return BUCKET_LABELS[index]
+    return None
+
+
+def summary(days=30):
+    """
+    Everything the admin analytics page shows, for the last `days` days.
+    Reads at most days x kinds x categories rollup rows.
+    """
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    rows = DailyRollup.objects.filter(date__gte=start, date__lte=end)
+
+    kinds = {}
+    for kind, model in ITEM_MODELS.items():
+        kind_rows = [r for r in rows if r.kind == kind]
+        histogram = empty_histogram()
+        for r in kind_rows:
+            for index, count in enumerate(r.return_time_histogram or []):
+                histogram[index] += count
+
+        posted = sum(r.posted for r in kind_rows)
+        recovered = sum(r.recovered for r in kind_rows) - sum(r.reopened for r in kind_rows)
+
+        # Posts per day per category: one table row per day (newest first)
+        categories = model.CATEGORY_CHOICES
+        per_day = {}
+        for r in kind_rows:
+            per_day.setdefault(r.date, {})[r.category] = r.posted
+        daily = [
+            (end - timedelta(days=offset),
+             [per_day.get(end - timedelta(days=offset), {}).get(value, 0) for value, label in categories])
+            for offset in range(days)
+        ]
+
+        kinds[kind] = {
+            'label': dict(DailyRollup.KIND_CHOICES)[kind],
+            'posted': posted,
+            'recovered': recovered,
+            'recovery_rate': round(100 * recovered / posted, 1) if posted else None,
+            'median_return_time': _median_bucket(histogram),
+            'histogram': list(zip(BUCKET_LABELS, histogram)),
+            'category_labels': [label for value, label in categories],
+            'daily': daily,
+        }
+    return {'start': start, 'end': end, 'days': days, 'kinds': kinds}
+
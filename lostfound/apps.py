@@ -5,3 +5,6 @@ class LostfoundConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lostfound'
 
+    def ready(self):
+        # Connect signal handlers (see signals.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,163 @@
+"""
+Campuses: one deployment serving several campuses with separate data.
+
+Every request gets a campus (request.campus) from CampusMiddleware:
+1. Path prefix: /c/north/lost-items/ -> campus "north". The prefix is
+   removed before the URL patterns are checked and becomes the "script
+   prefix", so the normal patterns match and reverse() / {% url %} put it
+   back in front of every link on the page.
+2. Host name: a campus with domain "lostfound.north.example.edu" gets every
+   request for that host.
+3. Otherwise the default campus (settings.DEFAULT_CAMPUS).
+
+Views only query the rows of request.campus, and the caches keep each
+campus apart (the campus is part of every key in search_cache, page_cache,
+typeahead and live). The item tables' indexes all start with the campus,
+so a list query reads only that campus's part of the index: a small
+campus stays fast next to a big one.
+
+The campus list is tiny and rarely changes, so each process keeps it in
+memory (CampusDirectory). Saving a campus stores a new random generation
+value in the cache; processes also reload the list every
+CAMPUS_DIRECTORY_SECONDS.
+"""
+
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.http.request import split_domain_port
+from django.urls import get_script_prefix, reverse, set_script_prefix
+
+from .models import Campus
+
+
+PATH_PREFIX = '/c/'
+
+
+class CampusDirectory:
+    """
+    All campuses of the deployment, by ID, slug and domain (one per process).
+    """
+
+    GENERATION_KEY = 'campus:generation'
+
+    def __init__(self):
+        self.campuses = ({}, {}, {})  # (by ID, by slug, by domain), swapped as a whole
+        self.generation = None
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+
+    def _sync(self):
+        generation = cache.get(self.GENERATION_KEY, 0)
+        max_age = getattr(settings, 'CAMPUS_DIRECTORY_SECONDS', 300)
+        if generation == self.generation and time.monotonic() - self.loaded_at < max_age:
+            return self.campuses
+
+        with self.lock:
+            campuses = list(Campus.objects.all())
+            self.campuses = (
+                {campus.pk: campus for campus in campuses},
+                {campus.slug: campus for campus in campuses},
+                {campus.domain.lower(): campus for campus in campuses if campus.domain},
+            )
+            self.generation = generation
+            self.loaded_at = time.monotonic()
+        return self.campuses
+
+    def changed(self):
+        """
+        Called (from signals.py) when a campus is saved or deleted.
+        """
+        # A random value, not a counter: a counter evicted from the cache
+        # would start again at 1, which other processes may still hold
+        cache.set(self.GENERATION_KEY, secrets.token_hex(8), timeout=None)
+        self.generation = None
+
+    def get(self, campus_id):
+        return self._sync()[0].get(campus_id)
+
+    def get_by_slug(self, slug):
+        return self._sync()[1].get(slug)
+
+    def get_by_domain(self, domain):
+        return self._sync()[2].get(domain.lower())
+
+    def get_default(self):
+        campus = self.get_by_slug(settings.DEFAULT_CAMPUS)
+        if campus is None:
+            campus, created = Campus.objects.get_or_create(
+                slug=settings.DEFAULT_CAMPUS,
+                defaults={'name': settings.DEFAULT_CAMPUS.replace('-', ' ').title()},
+            )
+            self.changed()
+        return campus
+
+
+directory = CampusDirectory()
+
+
+def resolve(request):
+    """
+    Return (campus, path prefix) for a request; the prefix is '' unless the
+    campus was given in the path. Raises Http404 for an unknown /c/<slug>/.
+    """
+    path = request.path_info
+    if path.startswith(PATH_PREFIX):
+        slug, _, rest = path[len(PATH_PREFIX):].partition('/')
+        campus = directory.get_by_slug(slug)
+        if campus is None:
+            raise Http404('No such campus.')
+        request.path_info = '/' + rest
+        return campus, f'{PATH_PREFIX[1:]}{slug}/'
+
+    domain, port = split_domain_port(request.get_host())
+    campus = directory.get_by_domain(domain) if domain else None
+    return campus or directory.get_default(), ''
+
+
+class CampusMiddleware:
+    """
+    Set request.campus, and while handling a /c/<slug>/ request, make
+    reverse() produce links under that prefix.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.campus, prefix = resolve(request)
+        if not prefix:
+            return self.get_response(request)
+
+        script_prefix = get_script_prefix()
+        set_script_prefix(script_prefix + prefix)
+        try:
+            return self.get_response(request)
+        finally:
+            set_script_prefix(script_prefix)
+
+
+def site_path(viewname, args=None):
+    """
+    reverse() without the campus prefix of the current request
+    (for building links to another campus with campus_url()).
+    """
+    return '/' + reverse(viewname, args=args)[len(get_script_prefix()):]
+
+
+def campus_url(campus, path):
+    """
+    Absolute URL of `path` on a campus: on its own domain if it has one,
+    otherwise on SITE_URL under /c/<slug>/ (the default campus has no prefix).
+    """
+    if campus.domain:
+        return f'{urlsplit(settings.SITE_URL).scheme}://{campus.domain}{path}'
+    base = settings.SITE_URL.rstrip('/')
+    if campus.slug != settings.DEFAULT_CAMPUS:
+        base += f'{PATH_PREFIX}{campus.slug}'
+    return base + path
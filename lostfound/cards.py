@@ -0,0 +1,96 @@
+"""
+Item cards: the small boxes shown on the home and list pages.
+
+A card only shows the title, category, location, date, status and photo.
+Loading full LostItem / FoundItem objects for it also reads the long
+description and contact info and builds a model instance (plus its
+signal bookkeeping) per row. Instead, the list pages ask the database for
+just the card columns with values_list() and put each row into an
+ItemCard, a small object with __slots__ (no per-object __dict__).
+
+Display labels ("Still Looking", "Electronics") come from dictionaries
+built once at import time, not from get_FOO_display() on every card.
+
+`python manage.py benchmark_cards` compares memory and time per page
+with loading full objects.
+"""
+
+from django.core.files.storage import default_storage
+
+from .models import LostItem, FoundItem
+
+
+class ItemCard:
+    """
+    One card. Templates use the same names for lost and found items:
+    item.location, item.date, item.category_label, item.status_label...
+    """
+
+    __slots__ = (
+        'pk', 'title', 'category', 'category_label', 'location', 'date',
+        'status', 'status_label', 'image_url',
+    )
+
+    def __init__(self, pk, title, category, category_label, location, date,
+                 status, status_label, image_url):
+        self.pk = pk
+        self.title = title
+        self.category = category
+        self.category_label = category_label
+        self.location = location
+        self.date = date
+        self.status = status
+        self.status_label = status_label
+        self.image_url = image_url
+
+    def __repr__(self):
+        return f'<ItemCard {self.pk}: {self.title}>'
+
+
+class CardSpec:
+    """
+    How to load the cards of one model: which columns, and the label maps.
+    """
+
+    def __init__(self, model, location_field, date_field):
+        self.model = model
+        # Same order as the ItemCard arguments (labels are added in make())
+        self.fields = ('id', 'title', 'category', location_field, date_field, 'status', 'image')
+        self.category_labels = dict(model.CATEGORY_CHOICES)
+        self.status_labels = dict(model.STATUS_CHOICES)
+
+    def make(self, row):
+        pk, title, category, location, date, status, image = row
+        return ItemCard(
+            pk, title, category, self.category_labels.get(category, category),
+            location, date, status, self.status_labels.get(status, status),
+            default_storage.url(image) if image else '',
+        )
+
+
+CARD_SPECS = {
+    LostItem: CardSpec(LostItem, 'location_lost', 'date_lost'),
+    FoundItem: CardSpec(FoundItem, 'location_found', 'date_found'),
+}
+
+
+def load_cards(queryset, limit=None):
+    """
+    Cards for the items of a (filtered, ordered) queryset, at most `limit`.
+    """
+    spec = CARD_SPECS[queryset.model]
+    rows = queryset.values_list(*spec.fields)
+    if limit is not None:
+        rows = rows[:limit]
+    return [spec.make(row) for row in rows]
+
+
+def load_cards_by_id(model, ids, **filters):
+    """
+    Cards for the given item IDs, in the same order (IDs that don't match
+    `filters` any more, e.g. unapproved items, are skipped).
+    """
+    spec = CARD_SPECS[model]
+    rows = model.objects.filter(pk__in=ids, **filters).values_list(*spec.fields)
+    rows_by_id = {row[0]: row for row in rows}
+    return [spec.make(rows_by_id[item_id]) for item_id in ids if item_id in rows_by_id]
@@ -0,0 +1,158 @@
+"""
+Student dashboard shown on the profile page.
+
+The dashboard shows:
+- How many lost/found posts the user has, per status (and how many are
+  still waiting for admin approval), computed with ONE aggregate query.
+- The user's posts, one page at a time.
+
+Everything is cached per user. Instead of deleting many cache keys when
+the user's items change, each user has a "generation" value that is part
+of every cache key. Changing an item replaces the value with a new random
+one, so all the old cache entries are simply never read again (and expire
+on their own). A counter would not do: if the cache evicts it, it starts
+again at 1 and the pages cached under generation 1 come back.
+"""
+
+import secrets
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Value, CharField
+
+from .models import LostItem, FoundItem
+
+
+POSTS_PER_PAGE = 12
+CACHE_TIMEOUT = 60 * 15  # 15 minutes
+
+
+def _generation_key(user_id):
+    return f'dashboard:gen:{user_id}'
+
+
+def _new_generation():
+    return secrets.token_hex(8)  # Same as search_cache._new_generation()
+
+
+def get_generation(user_id):
+    return cache.get_or_set(_generation_key(user_id), _new_generation, timeout=None)
+
+
+def invalidate_user(user_id):
+    """
+    Forget every cached dashboard page of this user.
+    Called whenever one of the user's items is created, changed or deleted.
+    """
+    # Also set when no generation is stored (e.g. it was evicted): pages
+    # cached under an older value must not be read again
+    cache.set(_generation_key(user_id), _new_generation(), timeout=None)
+
+
+def get_status_counts(user):
+    """
+    Count the user's posts per (kind, status) with a single query.
+
+    Returns e.g.
+    {
+        'lost': {'total': 3, 'awaiting_approval': 1, 'by_status': {'pending': 2, 'found': 1}},
+        'found': {'total': 0, 'awaiting_approval': 0, 'by_status': {}},
+    }
+    """
+    def grouped(model, kind):
+        return (
+            model.objects.filter(posted_by=user)
+            .annotate(kind=Value(kind, output_field=CharField()))
+            .values('kind', 'status', 'is_approved')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+
+    counts = {
+        'lost': {'total': 0, 'awaiting_approval': 0, 'by_status': {}},
+        'found': {'total': 0, 'awaiting_approval': 0, 'by_status': {}},
+    }
+    # UNION ALL of both GROUP BY queries = one round trip to the database
+    for row in grouped(LostItem, 'lost').union(grouped(FoundItem, 'found'), all=True):
+        kind_counts = counts[row['kind']]
+        kind_counts['total'] += row['count']
+        by_status = kind_counts['by_status']
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+        if not row['is_approved']:
+            kind_counts['awaiting_approval'] += row['count']
+    return counts
+
+
+def _status_rows(model, by_status):
+    """
+    Turn {'pending': 2} into [('pending', 'Still Looking', 2), ...] in the
+    order the statuses are declared on the model.
+    """
+    return [
+        (value, label, by_status.get(value, 0))
+        for value, label in model.STATUS_CHOICES
+    ]
+
+
+def get_dashboard(user, lost_page=1, found_page=1):
+    """
+    Everything the profile page needs, served from the per-user cache.
+    """
+    generation = get_generation(user.pk)
+    key = f'dashboard:{user.pk}:{generation}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = get_status_counts(user)
+        cache.set(key, counts, CACHE_TIMEOUT)
+
+    return {
+        'lost_counts': counts['lost'],
+        'found_counts': counts['found'],
+        'lost_status_rows': _status_rows(LostItem, counts['lost']['by_status']),
+        'found_status_rows': _status_rows(FoundItem, counts['found']['by_status']),
+        'user_lost_items': get_posts_page(
+            user, LostItem, lost_page, counts['lost']['total'], generation
+        ),
+        'user_found_items': get_posts_page(
+            user, FoundItem, found_page, counts['found']['total'], generation
+        ),
+    }
+
+
+class _KnownCount:
+    """
+    Wraps a queryset whose length we already know from the counts above,
+    so the paginator doesn't run an extra COUNT(*) query.
+    """
+
+    def __init__(self, queryset, count):
+        self.queryset = queryset
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return self.queryset[index]
+
+
+def get_posts_page(user, model, page_number, total, generation):
+    """
+    One page of the user's posts of one kind (newest first).
+    Only the items of the page are cached; the Page object is rebuilt
+    each time (cheap, because the total is already known).
+    """
+    queryset = model.objects.filter(posted_by=user).order_by('-created_at')
+    paginator = Paginator(_KnownCount(queryset, total), POSTS_PER_PAGE)
+    page = paginator.get_page(page_number)
+
+    key = f'dashboard:{user.pk}:{generation}:{model.__name__}:{page.number}'
+    items = cache.get(key)
+    if items is None:
+        items = list(page.object_list)
+        cache.set(key, items, CACHE_TIMEOUT)
+    page.object_list = items
+    return page
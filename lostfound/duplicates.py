@@ -0,0 +1,221 @@
+"""
+Near-duplicate detection for new lost/found posts.
+
+Spammers (and worried students) submit the same text again and again.
+When a post is submitted we compare its title and description with the
+recent posts of the same kind and campus. If one of them is nearly the
+same text, the new post gets `duplicate_of` set, so moderators can see and
+reject it in one click (posts always wait for approval, see the admin).
+
+Comparing texts:
+- A text is turned into SHINGLES: every 5 consecutive characters of the
+  normalized text ("lost blue wallet" -> "lost ", "ost b", "st bl", ...).
+- The similarity of two texts is the Jaccard similarity of their shingle
+  sets: shared shingles / all shingles. 1.0 = same text.
+
+Finding candidates without comparing with every post (MinHash + LSH):
+- A MinHash signature is NUM_HASHES numbers; number i is the smallest
+  value of hash function i over the text's shingles. For two texts, the
+  chance that number i is the same equals their Jaccard similarity.
+- The signature is cut into BANDS bands of ROWS numbers. Each band is
+  hashed into one integer and stored in the MinHashBand table. Two texts
+  with similarity s share at least one band with probability
+  1 - (1 - s**ROWS)**BANDS: about 99% for s = 0.8, under 10% for s = 0.3.
+- Finding candidates is one indexed query for the new post's BANDS band
+  values (at most MAX_CANDIDATE_ROWS rows), and only the few candidates
+  that share bands have their real similarity checked. The work per post
+  doesn't grow with the number of posts indexed.
+
+Only the first MAX_TEXT_CHARS characters of a post are compared: the
+signature costs NUM_HASHES hash computations per shingle, so a pasted
+8,000-character description took over 60 ms, and two posts that start
+with the same 1,000 characters are near-duplicates anyway. The bands of
+a new post are computed once (text_bands()) and used both to look for
+duplicates and to index it.
+
+Posts found to be duplicates are not indexed themselves (the original
+already stands for that text), which keeps the band buckets small even
+when one text is submitted thousands of times.
+"""
+
+import hashlib
+import random
+import re
+import struct
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LostItem, FoundItem, MinHashBand
+
+
+ITEM_MODELS = {'lost': LostItem, 'found': FoundItem}
+
+SHINGLE_SIZE = 5
+MAX_TEXT_CHARS = 1000  # Only the start of long posts is compared
+BANDS = 16
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+
+DEFAULT_SIMILARITY = 0.8
+DEFAULT_WINDOW_DAYS = 90
+
+MAX_CANDIDATE_ROWS = 200  # Band rows read per new post
+MAX_CANDIDATES = 10       # Posts whose real similarity is checked
+
+# Hash functions h(x) = (a * x + b) mod PRIME, with fixed a and b so every
+# process (and every run) computes the same signatures
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_random = random.Random(20240601)
+HASH_PARAMS = [(_random.randrange(1, PRIME), _random.randrange(0, PRIME)) for _ in range(NUM_HASHES)]
+
+_WORDS = re.compile(r'[^\W_]+')
+
+
+def get_similarity():
+    return getattr(settings, 'DUPLICATE_SIMILARITY', DEFAULT_SIMILARITY)
+
+
+def get_window():
+    return timedelta(days=getattr(settings, 'DUPLICATE_WINDOW_DAYS', DEFAULT_WINDOW_DAYS))
+
+
+def item_text(item):
+    return f'{item.title} {item.description}'[:MAX_TEXT_CHARS]
+
+
+def shingles(text):
+    """
+    Set of 5-character pieces of the text, lowercased, with punctuation
+    and repeated spaces removed (so "Lost  wallet!!" == "lost wallet").
+    """
+    normalized = ' '.join(_WORDS.findall((text or '').lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def signature(shingle_set):
+    """
+    MinHash signature: for each hash function, the smallest hash of any shingle.
+    """
+    # Python's hash() of a string changes between processes, so hash the
+    # shingles with a stable function first (32 bits is plenty here)
+    values = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), 'big')
+        for shingle in shingle_set
+    ]
+    return [min((a * value + b) % PRIME for value in values) & MAX_HASH for a, b in HASH_PARAMS]
+
+
+def bands(shingle_set):
+    """
+    The BANDS band values of a text, as signed 64-bit integers
+    (the band number is part of the hash, so equal values mean the same band).
+    """
+    if not shingle_set:
+        return []
+    numbers = signature(shingle_set)
+    result = []
+    for band in range(BANDS):
+        data = struct.pack(f'>H{ROWS}I', band, *numbers[band * ROWS:(band + 1) * ROWS])
+        result.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True))
+    return result
+
+
+def text_bands(item):
+    """
+    The band values of a post's text (pass them to find_duplicate() and
+    index_item() so the signature is only computed once).
+    """
+    return bands(shingles(item_text(item)))
+
+
+def find_duplicate(kind, item, item_bands=None):
+    """
+    The most similar recent post of the same kind and campus whose text is
+    at least settings.DUPLICATE_SIMILARITY alike, or None.
+    `item` may be unsaved (it is checked before it is saved).
+    """
+    item_shingles = shingles(item_text(item))
+    if item_bands is None:
+        item_bands = bands(item_shingles)
+    if not item_bands:
+        return None
+
+    since = timezone.now() - get_window()
+    rows = (
+        MinHashBand.objects
+        .filter(campus_id=item.campus_id, kind=kind, band__in=item_bands, created_at__gte=since)
+        .exclude(item_id=item.pk or 0)
+        .values_list('item_id', flat=True)[:MAX_CANDIDATE_ROWS]
+    )
+    # Posts sharing the most bands are the most likely to be similar
+    shared = {}
+    for item_id in rows:
+        shared[item_id] = shared.get(item_id, 0) + 1
+    candidate_ids = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+    if not candidate_ids:
+        return None
+
+    best, best_similarity = None, get_similarity()
+    for other in ITEM_MODELS[kind].objects.filter(pk__in=candidate_ids).only('title', 'description'):
+        similarity = jaccard(item_shingles, shingles(item_text(other)))
+        if similarity >= best_similarity:
+            best, best_similarity = other, similarity
+    return best
+
+
+def band_rows(kind, item, item_bands=None):
+    if item_bands is None:
+        item_bands = text_bands(item)
+    return [
+        MinHashBand(kind=kind, campus_id=item.campus_id, band=band, item_id=item.pk,
+                    created_at=item.created_at)
+        for band in set(item_bands)
+    ]
+
+
+def index_item(kind, item, item_bands=None):
+    """
+    Add a saved post to the index (skipped for posts flagged as duplicates).
+    """
+    if item.duplicate_of_id is None:
+        MinHashBand.objects.bulk_create(band_rows(kind, item, item_bands))
+
+
+def index_items(kind, items, replace=True):
+    """
+    (Re)build the rows of many posts at once (imports, rebuilding the index).
+    Pass replace=False when the items are known to have no rows yet.
+    """
+    rows = []
+    for item in items:
+        if item.duplicate_of_id is None:
+            rows.extend(band_rows(kind, item))
+    with transaction.atomic():
+        if replace:
+            MinHashBand.objects.filter(kind=kind, item_id__in=[item.pk for item in items]).delete()
+        MinHashBand.objects.bulk_create(rows, batch_size=1000)
+
+
+def remove_item(kind, item_id):
+    MinHashBand.objects.filter(kind=kind, item_id=item_id).delete()
+
+
+def prune():
+    """
+    Delete the rows of posts older than the comparison window.
+    Returns the number of rows deleted.
+    """
+    deleted, _ = MinHashBand.objects.filter(created_at__lt=timezone.now() - get_window()).delete()
+    return deleted
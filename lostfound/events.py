@@ -0,0 +1,350 @@
+"""
+Append-only log of item changes, read by consumers from checkpoints.
+
+Every create, approval, unapproval, status change, edit and delete of a
+LostItem / FoundItem adds an ItemEvent row, in the same transaction as the
+change itself (from signals.py, and from workflow.py and importers.py,
+which change items without signals). The event's ID is its position in
+the log.
+
+A CONSUMER is a function that handles a batch of events, e.g. re-indexing
+the changed items. Each consumer has a checkpoint (EventCheckpoint): the
+ID of the last event it handled. `python manage.py consume_events` reads
+the events after each checkpoint in batches, oldest first, calls the
+consumer and moves the checkpoint forward. Nothing ever has to re-read a
+whole item table to find out what changed.
+
+Consumers must be idempotent (handling an event twice does no harm): the
+checkpoint is saved after the batch is handled, so a crash in between
+means the batch is handled again. Built-in consumers (at the bottom) keep
+the SQLite search index, the shared caches and the feed files in line
+with the database. The request-time hooks in signals.py still update
+them right away; the consumers make sure they catch up on changes those
+hooks missed (a crash before an after-commit hook ran, restoring a
+backup, or `replay_events` after a bug fix).
+
+Event IDs are handed out when the row is inserted, but transactions
+commit in their own order: event 11 can be visible while event 10's
+(long) transaction is still open. A checkpoint that jumped to 11 would
+never see 10. So each checkpoint also keeps a short list of GAPS: ranges
+of missing IDs below its position. Every read looks for events that have
+appeared in the gaps since, and hands them to the consumer together with
+the new ones. What this guarantees:
+
+- Every event whose transaction commits within EVENT_LOG_GAP_SECONDS of
+  the event after it being inserted is handled, at least once.
+- Late events arrive out of order (after higher IDs were handled), so
+  consumers must not assume a batch follows everything before it. The
+  built-in ones re-read the item's current state, so order doesn't matter.
+- A gap is given up after EVENT_LOG_GAP_SECONDS. Most gaps are IDs that
+  never show up at all (rolled-back transactions, compacted events); an
+  event committed later than that is missed until the next replay. Only
+  the newest MAX_GAPS gaps are kept.
+
+Compaction (`compact_events`) keeps the log from growing forever: for
+events older than EVENT_LOG_KEEP_DAYS that every consumer has handled,
+only the newest event of each item is kept (enough to rebuild the current
+state by replaying from 0), and deleted items lose their events entirely.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import feeds, page_cache, search, search_cache
+from .models import ItemEvent, EventCheckpoint
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_GAP_SECONDS = 600
+MAX_GAPS = 100  # Gaps a checkpoint waits for at once
+DEFAULT_KEEP_DAYS = 30
+COMPACT_WINDOW = 10000  # Events looked at per compaction step
+
+# Consumer name -> function(list of ItemEvent)
+CONSUMERS = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---------------- Writing ----------------
+
+def _event(kind, item, event, **changes):
+    return ItemEvent(
+        kind=kind, item_id=item.pk, campus_id=item.campus_id, event=event,
+        data={'category': item.category, 'status': item.status, 'is_approved': item.is_approved, **changes},
+    )
+
+
+def record(kind, item, event, **changes):
+    """
+    Append one event about `item` (after the change was made).
+    `changes` holds what it was before, e.g. old_status='pending'.
+    """
+    _event(kind, item, event, **changes).save()
+
+
+def record_many(kind, items, event):
+    """
+    Append the same event for many items (bulk import).
+    """
+    ItemEvent.objects.bulk_create([_event(kind, item, event) for item in items])
+
+
+def record_save(kind, item, created):
+    """
+    Append the events of one .save() (called from signals.py; uses the
+    state the item had when loaded, see remember_loaded_state()).
+    """
+    if created:
+        ItemEvent.objects.bulk_create([_event(kind, item, 'created')])
+        return
+
+    changes = {}
+    if item._loaded_category is not None and item._loaded_category != item.category:
+        changes['old_category'] = item._loaded_category
+    if item._loaded_campus_id is not None and item._loaded_campus_id != item.campus_id:
+        changes['old_campus_id'] = item._loaded_campus_id
+
+    events = []
+    if item._loaded_is_approved is not None and item._loaded_is_approved != item.is_approved:
+        events.append(_event(kind, item, 'approved' if item.is_approved else 'unapproved', **changes))
+    if item._loaded_status is not None and item._loaded_status != item.status:
+        events.append(_event(kind, item, 'status', old_status=item._loaded_status, **changes))
+    if not events:
+        events.append(_event(kind, item, 'updated', **changes))
+    ItemEvent.objects.bulk_create(events)
+
+
+# ---------------- Reading ----------------
+
+def consumer(name):
+    """
+    Decorator registering a consumer:
+
+        @consumer('my_cache')
+        def refresh_my_cache(events):
+            ...
+    """
+    def register(handler):
+        CONSUMERS[name] = handler
+        return handler
+    return register
+
+
+def _fill_gaps(gaps, found):
+    """
+    The gaps left after the IDs in `found` showed up (splitting a gap in
+    two when an ID in its middle showed up).
+    """
+    left = []
+    for first, last, stamp in gaps:
+        for pk in sorted(pk for pk in found if first <= pk <= last):
+            if pk > first:
+                left.append([first, pk - 1, stamp])
+            first = pk + 1
+        if first <= last:
+            left.append([first, last, stamp])
+    return left
+
+
+def read(after, limit, gaps=()):
+    """
+    Up to `limit` events: the ones that showed up in `gaps`, then the new
+    ones after position `after`, in ID order.
+
+    Returns (events, new position, new gaps). A gap is [first ID, last ID,
+    Unix time of the event after it]; the missing IDs were inserted before
+    that time, so after EVENT_LOG_GAP_SECONDS we stop waiting for them.
+    """
+    oldest = time.time() - _setting('EVENT_LOG_GAP_SECONDS', DEFAULT_GAP_SECONDS)
+    gaps = [gap for gap in gaps if gap[2] >= oldest]
+
+    late = []
+    if gaps:
+        in_gaps = Q()
+        for first, last, _ in gaps:
+            in_gaps |= Q(pk__range=(first, last))
+        late = list(ItemEvent.objects.filter(in_gaps).order_by('pk')[:limit])
+        gaps = _fill_gaps(gaps, {event.pk for event in late})
+
+    new = []
+    if len(late) < limit:
+        new = list(ItemEvent.objects.filter(pk__gt=after).order_by('pk')[:limit - len(late)])
+    previous = after
+    for event in new:
+        stamp = event.created_at.timestamp()
+        # Skipped IDs are gaps, unless they are too old to still show up
+        # (e.g. replaying a compacted log)
+        if event.pk > previous + 1 and stamp >= oldest:
+            gaps.append([previous + 1, event.pk - 1, stamp])
+        previous = event.pk
+
+    return late + new, previous, gaps[-MAX_GAPS:]
+
+
+def get_checkpoint(name):
+    checkpoint, _ = EventCheckpoint.objects.get_or_create(name=name)
+    return checkpoint
+
+
+def consume(name, batch_size=None, max_batches=None):
+    """
+    Feed the consumer every event after its checkpoint (and the ones that
+    showed up in its gaps), a batch at a time, saving the checkpoint after
+    each batch. Returns the number of events handled.
+    """
+    handler = CONSUMERS[name]
+    batch_size = batch_size or _setting('EVENT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    checkpoint = get_checkpoint(name)
+    handled = batches = 0
+    while max_batches is None or batches < max_batches:
+        batch, position, gaps = read(checkpoint.position, batch_size, checkpoint.gaps)
+        if batch:
+            handler(batch)
+        if batch or gaps != checkpoint.gaps:
+            # Also saved when only old gaps were given up
+            checkpoint.position, checkpoint.gaps = position, gaps
+            checkpoint.save(update_fields=['position', 'gaps', 'updated_at'])
+        if not batch:
+            break
+        handled += len(batch)
+        batches += 1
+    return handled
+
+
+def position_before(when):
+    """
+    Checkpoint position from which replaying handles every event since `when`.
+    """
+    first = ItemEvent.objects.filter(created_at__gte=when).aggregate(first=Min('pk'))['first']
+    if first is None:
+        return ItemEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+    return first - 1
+
+
+def rewind(name, position):
+    """
+    Move a consumer's checkpoint back (or forward) so it handles the
+    events after `position` again (forgetting its gaps).
+    """
+    EventCheckpoint.objects.update_or_create(name=name, defaults={'position': max(position, 0), 'gaps': []})
+
+
+# ---------------- Compaction ----------------
+
+def compact(keep_days=None):
+    """
+    Keep only the newest event of each item among old events every
+    consumer has handled; drop the events of deleted items.
+    Returns the number of events deleted.
+    """
+    keep_days = _setting('EVENT_LOG_KEEP_DAYS', DEFAULT_KEEP_DAYS) if keep_days is None else keep_days
+    old = ItemEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=keep_days))
+    # Don't remove events a consumer hasn't seen yet (consumers that never
+    # ran start from the compacted log, which still has every item's state)
+    slowest = EventCheckpoint.objects.aggregate(position=Min('position'))['position']
+    if slowest is not None:
+        old = old.filter(pk__lte=slowest)
+    bounds = old.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+
+    newest_of_item = (
+        ItemEvent.objects.filter(kind=OuterRef('kind'), item_id=OuterRef('item_id'))
+        .order_by('-pk').values('pk')[:1]
+    )
+    deleted = 0
+    # A window of IDs at a time, so one step never locks or loads too much
+    for start in range(bounds['first'] - 1, bounds['last'], COMPACT_WINDOW):
+        window = old.filter(pk__gt=start, pk__lte=start + COMPACT_WINDOW)
+        superseded = list(
+            window.annotate(newest=Subquery(newest_of_item)).exclude(pk=F('newest'))
+            .values_list('pk', flat=True)
+        )
+        with transaction.atomic():
+            count, _ = ItemEvent.objects.filter(pk__in=superseded).delete()
+            deleted += count
+            # What is left in the window is each item's newest event;
+            # for deleted items there is nothing left to rebuild
+            count, _ = window.filter(event='deleted').delete()
+            deleted += count
+    return deleted
+
+
+# ---------------- Built-in consumers ----------------
+
+def _item_ids(events):
+    """
+    {kind: set of item IDs} of a batch.
+    """
+    result = {}
+    for event in events:
+        result.setdefault(event.kind, set()).add(event.item_id)
+    return result
+
+
+def _visible(event):
+    """
+    Did the event change what visitors see (an approved item, or an item
+    that just stopped being approved)?
+    """
+    return event.data.get('is_approved') or event.event == 'unapproved'
+
+
+@consumer('search_index')
+def refresh_search_index(events):
+    """
+    Re-index the changed items in the SQLite trigram index (search.py).
+    """
+    if search.use_postgres():
+        return
+    for kind, item_ids in _item_ids(events).items():
+        model, location_field = search.ITEM_KINDS[kind]
+        items = list(model.objects.filter(pk__in=item_ids).only(
+            'pk', 'campus', 'is_approved', 'title', 'description', location_field
+        ))
+        # Also removes the rows of items that are no longer approved
+        search.index_items(kind, items)
+        for item_id in item_ids - {item.pk for item in items}:
+            search.remove_item(kind, item_id)
+
+
+@consumer('caches')
+def refresh_caches(events):
+    """
+    Drop cached result pages and full pages that show changed items
+    (search_cache.py, page_cache.py).
+    """
+    bumped = set()
+    for event in events:
+        if not _visible(event):
+            continue
+        for campus_id in {event.campus_id, event.data.get('old_campus_id')} - {None}:
+            if (campus_id, event.kind) not in bumped:
+                search_cache.bump_generation(campus_id, event.kind)
+                bumped.add((campus_id, event.kind))
+            page_cache.item_changed(campus_id, event.kind, event.item_id)
+
+
+@consumer('feeds')
+def refresh_feeds(events):
+    """
+    Rewrite the feed and sitemap files listing changed items (feeds.py).
+    """
+    changed = {}
+    for event in events:
+        if not _visible(event):
+            continue
+        campus_ids, categories, chunks = changed.setdefault(event.kind, (set(), set(), set()))
+        campus_ids.update({event.campus_id, event.data.get('old_campus_id')} - {None})
+        categories.update({event.data.get('category'), event.data.get('old_category')} - {None})
+        chunks.add(event.item_id // feeds.SITEMAP_CHUNK)
+    for kind, (campus_ids, categories, chunks) in changed.items():
+        feeds.rebuild(kind, campus_ids, categories, chunks)
@@ -0,0 +1,283 @@
+"""
+RSS/Atom feeds and sitemap, written as static files.
+
+Kiosks and department pages poll for new items every few minutes. Instead
+of running queries for each poll, the feeds are written to disk when items
+change and served straight from there by WhiteNoise (FeedFilesMiddleware):
+
+    generated/feeds/main/lost.rss, lost.atom         newest approved lost items of a campus
+    generated/feeds/main/lost/electronics.rss, ...   one pair per category
+    generated/feeds/main/found.rss, ...              same for found items
+    generated/sitemap.xml                            sitemap index
+    generated/sitemap-pages.xml                      home and list pages of every campus
+    generated/sitemap-lost-0.xml, ...                item pages, by ID range
+
+Feeds are per campus (feeds/<campus slug>/...); links in feeds and
+sitemaps point to the item's campus (see campus.campus_url()).
+
+Updates are INCREMENTAL: when an approved item changes (or is approved,
+unapproved, deleted), only the feeds of its campus, kind and category and
+the one sitemap file covering its ID are rewritten (see signals.py). The
+changes of one transaction are collected and written once, when it
+commits, so approving 100 items rewrites each file once, not 100 times.
+Files are written to a temp file and renamed, so readers never see half
+a file.
+
+`python manage.py build_feeds` writes everything from scratch (run it on
+deploy, before the server starts).
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .campus import campus_url, directory, site_path
+from .models import Campus, LostItem, FoundItem
+
+
+FEED_ITEMS = 50        # Newest items per feed
+SITEMAP_CHUNK = 1000   # Item IDs per sitemap file (the limit is 50,000 URLs)
+FEED_MAX_AGE = 60      # Seconds feed readers/proxies may cache a file
+
+# kind -> (model, detail URL name, list URL name, feed title)
+ITEM_KINDS = {
+    'lost': (LostItem, 'lost_item_detail', 'lost_items_list', 'Lost Items'),
+    'found': (FoundItem, 'found_item_detail', 'found_items_list', 'Found Items'),
+}
+FEED_FORMATS = [(Rss201rev2Feed, 'rss'), (Atom1Feed, 'atom')]
+
+# Changes waiting for the current transaction to commit (per thread):
+# kind -> (campus IDs, categories, sitemap chunks)
+_pending = threading.local()
+
+
+def get_root():
+    return Path(settings.FEEDS_ROOT)
+
+
+def absolute_url(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def _write(relative_path, content):
+    """
+    Atomically replace a generated file.
+    """
+    path = get_root() / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as temp_file:
+        temp_file.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+# ---------------- Feeds ----------------
+
+def feed_path(campus, kind, category='', extension='rss'):
+    if category:
+        return f'feeds/{campus.slug}/{kind}/{category}.{extension}'
+    return f'feeds/{campus.slug}/{kind}.{extension}'
+
+
+def build_feed(campus, kind, category=''):
+    """
+    Write the RSS and Atom feed of one campus and kind (and optionally one
+    category).
+    """
+    model, detail_url, list_url, title = ITEM_KINDS[kind]
+    items = model.objects.filter(campus=campus, is_approved=True)
+    link = campus_url(campus, site_path(list_url))
+    if category:
+        items = items.filter(category=category)
+        title = f'{title}: {dict(model.CATEGORY_CHOICES).get(category, category)}'
+        link += f'?category={category}'
+    items = items.order_by('-created_at', '-id')[:FEED_ITEMS]
+    location_field = 'location_lost' if kind == 'lost' else 'location_found'
+
+    for feed_class, extension in FEED_FORMATS:
+        feed = feed_class(
+            title=f'{campus.name} Lost & Found - {title}',
+            link=link,
+            description=f'Newest {title.lower()} on the {campus.name} Lost & Found Portal',
+            feed_url=absolute_url('/' + feed_path(campus, kind, category, extension)),
+            language='en',
+        )
+        for item in items:
+            item_link = campus_url(campus, site_path(detail_url, args=[item.pk]))
+            feed.add_item(
+                title=item.title,
+                link=item_link,
+                unique_id=item_link,
+                description=(
+                    f'{Truncator(item.description).chars(300)}\n'
+                    f'Location: {getattr(item, location_field)}'
+                ),
+                pubdate=item.created_at,
+                updateddate=item.updated_at,
+                categories=[item.get_category_display()],
+            )
+        _write(feed_path(campus, kind, category, extension),
+               feed.writeString('utf-8').encode('utf-8'))
+
+
+# ---------------- Sitemap ----------------
+
+def _urlset(entries):
+    """
+    entries = [(absolute URL, lastmod datetime or None), ...]
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, lastmod in entries:
+        lines.append(f'  <url><loc>{escape(url)}</loc>'
+                     + (f'<lastmod>{lastmod.date().isoformat()}</lastmod>' if lastmod else '')
+                     + '</url>')
+    lines.append('</urlset>')
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def build_sitemap_chunk(kind, chunk):
+    """
+    Write the sitemap file for items with IDs in
+    [chunk * SITEMAP_CHUNK, (chunk + 1) * SITEMAP_CHUNK), or remove it if empty.
+    """
+    model, detail_url = ITEM_KINDS[kind][:2]
+    rows = (
+        model.objects
+        .filter(is_approved=True, id__gte=chunk * SITEMAP_CHUNK, id__lt=(chunk + 1) * SITEMAP_CHUNK)
+        .order_by('id')
+        .values_list('id', 'updated_at', 'campus_id')
+    )
+    # Build the URL once per campus and fill in the IDs (reverse() per item is slow)
+    path_template = site_path(detail_url, args=[0]).replace('/0/', '/{}/')
+    url_templates = {}
+    entries = []
+    for item_id, updated_at, campus_id in rows:
+        if campus_id not in url_templates:
+            url_templates[campus_id] = campus_url(directory.get(campus_id), path_template)
+        entries.append((url_templates[campus_id].format(item_id), updated_at))
+    name = f'sitemap-{kind}-{chunk}.xml'
+    if entries:
+        _write(name, _urlset(entries))
+    else:
+        (get_root() / name).unlink(missing_ok=True)
+
+
+def build_sitemap_pages():
+    pages = [site_path('home'), site_path('lost_items_list'), site_path('found_items_list')]
+    _write('sitemap-pages.xml', _urlset([
+        (campus_url(campus, page), None) for campus in Campus.objects.all() for page in pages
+    ]))
+
+
+def build_sitemap_index():
+    """
+    List every sitemap file that exists (cheap: one directory listing).
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for path in sorted(get_root().glob('sitemap-*.xml')):
+        lines.append(f'  <sitemap><loc>{escape(absolute_url("/" + path.name))}</loc></sitemap>')
+    lines.append('</sitemapindex>')
+    _write('sitemap.xml', ('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+# ---------------- Keeping them up to date ----------------
+
+def rebuild(kind, campus_ids, categories, chunks):
+    """
+    Rewrite the feeds of `kind` on the given campuses (overall + the given
+    categories) and the given sitemap chunks.
+    """
+    for campus_id in campus_ids:
+        campus = directory.get(campus_id)
+        if campus is None:
+            continue  # Campus deleted meanwhile
+        build_feed(campus, kind)
+        for category in categories:
+            build_feed(campus, kind, category)
+    for chunk in chunks:
+        build_sitemap_chunk(kind, chunk)
+    build_sitemap_index()
+
+
+def _rebuild_pending():
+    """
+    Rewrite everything collected by items_changed() (after a commit).
+    The first call after a commit does the work, later ones find nothing.
+    """
+    changes = getattr(_pending, 'changes', None) or {}
+    _pending.changes = {}
+    for kind, (campus_ids, categories, chunks) in changes.items():
+        rebuild(kind, campus_ids, categories, chunks)
+
+
+def items_changed(kind, items, old_categories=(), old_campus_ids=()):
+    """
+    Called when approved items changed (or stopped being approved).
+    The files are rewritten after the transaction commits, so they never
+    show changes that end up rolled back, and only once per transaction.
+    """
+    if getattr(_pending, 'changes', None) is None:
+        _pending.changes = {}
+    campus_ids, categories, chunks = _pending.changes.setdefault(kind, (set(), set(), set()))
+    campus_ids.update({item.campus_id for item in items} | set(old_campus_ids))
+    categories.update({item.category for item in items} | set(old_categories))
+    chunks.update(item.pk // SITEMAP_CHUNK for item in items if item.pk is not None)
+    # If the transaction is rolled back, its changes stay collected and are
+    # rewritten with the next commit's: a few extra files, never a missed one
+    transaction.on_commit(_rebuild_pending)
+
+
+def build_all():
+    """
+    Write every feed and sitemap file from scratch. Returns the file count.
+    """
+    for path in get_root().glob('sitemap-*.xml'):
+        path.unlink()
+    campuses = list(Campus.objects.all())
+    for kind, (model, *rest) in ITEM_KINDS.items():
+        for campus in campuses:
+            build_feed(campus, kind)
+            for category, label in model.CATEGORY_CHOICES:
+                build_feed(campus, kind, category)
+        ids = model.objects.filter(is_approved=True).values_list('id', flat=True)
+        for chunk in sorted({item_id // SITEMAP_CHUNK for item_id in ids.iterator()}):
+            build_sitemap_chunk(kind, chunk)
+    build_sitemap_pages()
+    build_sitemap_index()
+    return sum(1 for path in get_root().rglob('*') if path.is_file())
+
+
+class FeedFilesMiddleware(WhiteNoise):
+    """
+    Serve the generated files with WhiteNoise (ETag, Last-Modified, 304s).
+
+    Normal static files are indexed once at start-up, but these files are
+    rewritten while the server runs, so they are looked up on disk on each
+    request ("autorefresh"). Only /feeds/ and /sitemap*.xml requests are
+    checked, everything else goes straight to the next middleware.
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(application=None, autorefresh=True, max_age=FEED_MAX_AGE)
+        self.get_response = get_response
+        self.add_files(settings.FEEDS_ROOT, prefix='/')
+
+    def __call__(self, request):
+        path = request.path_info
+        if path.startswith('/feeds/') or (path.startswith('/sitemap') and path.endswith('.xml')):
+            static_file = self.find_file(path)
+            if static_file is not None:
+                return WhiteNoiseMiddleware.serve(static_file, request)
+        return self.get_response(request)
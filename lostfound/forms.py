@@ -4,9 +4,12 @@ Django forms handle validation, HTML generation, and data cleaning.
 """
 
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import SetPasswordForm, UserCreationForm
 from django.contrib.auth.models import User
-from .models import LostItem, FoundItem, UserProfile
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from .models import Campus, LostItem, FoundItem, UserProfile
 
 
 class UserRegistrationForm(UserCreationForm):
@@ -124,3 +127,56 @@ class FoundItemForm(forms.ModelForm):
             }),
         }
 
+
+
+class ItemImportForm(forms.Form):
+    """
+    Admin form for bulk importing items from a CSV or JSONL file.
+    """
+    file = forms.FileField(help_text='CSV (with a header row) or JSONL file.')
+    campus = forms.ModelChoiceField(
+        queryset=Campus.objects.all(),
+        help_text='Campus the imported items belong to.'
+    )
+    approve = forms.BooleanField(
+        required=False,
+        help_text='Mark imported items as approved (skip moderation).'
+    )
+
+
+class RosterRowForm(forms.Form):
+    """
+    One student of a roster file (see roster.py).
+    The password is optional: students without one get an invitation email.
+    """
+    username = forms.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = forms.EmailField()
+    first_name = forms.CharField(max_length=150, required=False)
+    last_name = forms.CharField(max_length=150, required=False)
+    student_id = forms.CharField(max_length=20, required=False)
+    phone = forms.CharField(max_length=15, required=False)
+    password = forms.CharField(required=False, strip=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        password = cleaned_data.get('password')
+        if password:
+            # The same password rules as the registration page
+            # (the user is only used to compare the password with the names)
+            user = User(**{field: cleaned_data.get(field, '') for field in ['username', 'email', 'first_name', 'last_name']})
+            try:
+                validate_password(password, user)
+            except ValidationError as error:
+                self.add_error('password', error)
+        return cleaned_data
+
+
+class InvitationPasswordForm(SetPasswordForm):
+    """
+    Form for choosing a password when accepting an invitation.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'form-control'
@@ -0,0 +1,355 @@
+"""
+Perceptual image hashes for finding duplicate and similar item photos.
+
+A normal hash (like MD5) changes completely if one pixel changes.
+A perceptual hash changes only a little when the picture changes a little
+(resized, re-compressed, slightly brighter...). Two photos of the same
+item therefore get hashes that differ in only a few bits.
+
+We compute two 64-bit hashes with Pillow for every uploaded image:
+- dHash ("difference hash"): compares neighbouring pixels. Very fast, and
+  used to spot exact re-uploads of the same photo: find_similar_items()
+  also looks up the items with the same dHash (an indexed column) and
+  lists them first, even when the pHash search missed them.
+- pHash ("perceptual hash"): keeps the low frequencies of the picture
+  (via a DCT, like JPEG does). More robust, used for "looks similar".
+
+The number of different bits between two hashes is their "distance".
+To search quickly we keep every pHash in a multi-index hash table (see
+below), which finds all hashes within a distance by looking at only a few
+candidates instead of every stored hash.
+"""
+
+import math
+import secrets
+import threading
+from itertools import combinations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .models import LostItem, FoundItem
+
+
+# Bits of difference below which two photos count as duplicates / similar
+DUPLICATE_DISTANCE = 4
+SIMILAR_DISTANCE = 10
+
+HASH_SIZE = 8          # 8x8 = 64-bit hashes
+PHASH_IMAGE_SIZE = 32  # pHash looks at a 32x32 thumbnail
+
+# Item kinds stored in the index
+ITEM_MODELS = {
+    'lost': LostItem,
+    'found': FoundItem,
+}
+
+
+def _grayscale(image_file, size):
+    """
+    Open an image (file object or path) and shrink it to a gray thumbnail.
+    """
+    with Image.open(image_file) as image:
+        image.draft('L', (size[0] * 4, size[1] * 4))  # Fast JPEG downscaling
+        return image.convert('L').resize(size, Image.Resampling.LANCZOS)
+
+
+def _bits_to_hex(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f'{value:016x}'
+
+
+def dhash(image_file):
+    """
+    Difference hash: is each pixel brighter than the one to its right?
+    """
+    image = _grayscale(image_file, (HASH_SIZE + 1, HASH_SIZE))
+    pixels = list(image.getdata())
+    width = HASH_SIZE + 1
+    bits = [
+        pixels[row * width + col] > pixels[row * width + col + 1]
+        for row in range(HASH_SIZE)
+        for col in range(HASH_SIZE)
+    ]
+    return _bits_to_hex(bits)
+
+
+# DCT-II coefficients for a 32-point transform, computed once
+_DCT = [
+    [math.cos(math.pi * k * (2 * n + 1) / (2 * PHASH_IMAGE_SIZE)) for n in range(PHASH_IMAGE_SIZE)]
+    for k in range(HASH_SIZE)
+]
+
+
+def phash(image_file):
+    """
+    Perceptual hash: is each low-frequency DCT coefficient above the median?
+    Only the first 8 rows/columns of the DCT are needed, so we compute just those.
+    """
+    size = PHASH_IMAGE_SIZE
+    image = _grayscale(image_file, (size, size))
+    pixels = list(image.getdata())
+    rows = [pixels[i * size:(i + 1) * size] for i in range(size)]
+
+    # DCT of every row (first 8 frequencies), then of every column
+    row_dct = [[sum(c * p for c, p in zip(coeffs, row)) for coeffs in _DCT] for row in rows]
+    dct = [
+        [sum(c * row_dct[n][u] for n, c in enumerate(coeffs)) for u in range(HASH_SIZE)]
+        for coeffs in _DCT
+    ]
+
+    values = [value for row in dct for value in row]
+    # The first value is the average brightness; leave it out of the median
+    median = sorted(values[1:])[len(values[1:]) // 2]
+    return _bits_to_hex(value > median for value in values)
+
+
+def compute_hashes(image_file):
+    """
+    Return (dhash, phash) as 16-character hex strings, or ('', '') if the
+    file can't be read as an image.
+    """
+    try:
+        image_file.seek(0)
+        d = dhash(image_file)
+        image_file.seek(0)
+        p = phash(image_file)
+        image_file.seek(0)
+        return d, p
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return '', ''
+
+
+def update_item_hashes(item):
+    """
+    Fill item.image_dhash / item.image_phash from item.image (does not save).
+    """
+    if item.image:
+        item.image_dhash, item.image_phash = compute_hashes(item.image)
+    else:
+        item.image_dhash, item.image_phash = '', ''
+
+
+def hamming_distance(a, b):
+    """
+    Number of different bits between two integer hashes.
+    """
+    return bin(a ^ b).count('1')
+
+
+def _bit_masks(size, max_bits):
+    """
+    All masks of `size` bits with at most `max_bits` bits set
+    (XOR-ing a value with these gives every value within that distance).
+    """
+    masks = [0]
+    for count in range(1, max_bits + 1):
+        for bits in combinations(range(size), count):
+            masks.append(sum(1 << bit for bit in bits))
+    return masks
+
+
+class MultiIndexHashTable:
+    """
+    Multi-index hashing over 64-bit integer hashes.
+
+    Each hash is cut into 4 chunks of 16 bits, and every chunk has its own
+    dictionary: chunk value -> hashes that have that chunk.
+
+    If two hashes differ in at most r bits, then at least one of the 4
+    chunks differs in at most r // 4 bits (otherwise the total would be more
+    than r). So to find everything within r bits we only look up, in each
+    dictionary, the chunk values within r // 4 bits of the query's chunk,
+    and check the full distance of those few candidates.
+
+    For r = 4 that is 17 lookups per chunk, instead of comparing the query
+    with every stored hash.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+    CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.items = {}  # hash -> list of items with exactly that hash
+        self.masks = {}  # chunk radius -> list of bit masks (cached)
+
+    def __len__(self):
+        return sum(len(items) for items in self.items.values())
+
+    def _chunks(self, value):
+        return [
+            (value >> (i * self.CHUNK_BITS)) & self.CHUNK_MASK
+            for i in range(self.CHUNKS)
+        ]
+
+    def add(self, value, item):
+        items = self.items.setdefault(value, [])
+        if item in items:
+            return
+        items.append(item)
+        if len(items) == 1:
+            # First item with this hash: index the hash in every table
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                table.setdefault(chunk, []).append(value)
+
+    def search(self, value, radius):
+        """
+        Return [(distance, item), ...] for all items within `radius` bits.
+        """
+        chunk_radius = radius // self.CHUNKS
+        if chunk_radius not in self.masks:
+            self.masks[chunk_radius] = _bit_masks(self.CHUNK_BITS, chunk_radius)
+        masks = self.masks[chunk_radius]
+
+        results = []
+        checked = set()
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                for candidate in table.get(chunk ^ mask, ()):
+                    if candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    distance = hamming_distance(value, candidate)
+                    if distance <= radius:
+                        results.extend((distance, item) for item in self.items[candidate])
+        return results
+
+
+class ImageHashIndex:
+    """
+    In-memory multi-index hash table of the pHash of every item image
+    (lost and found).
+
+    Each worker process keeps its own index. It is built from the database
+    on first use, and kept up to date:
+    - items saved in this process are added right away (see signals.py);
+    - items saved in other processes set a new random "generation" value in
+      the cache; when we notice it changed, we load items updated since our
+      last sync. (Not a counter: one evicted from the cache would start
+      again at 1, which a process may still hold, and it would never sync.)
+
+    The table never removes entries. Deleted or edited items are filtered
+    out when search results are turned into items (see find_similar_items).
+    """
+
+    GENERATION_KEY = 'image_hash_index:generation'
+
+    def __init__(self):
+        self.table = None
+        self.generation = None
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    def _load(self, since=None):
+        for kind, model in ITEM_MODELS.items():
+            items = model.objects.exclude(image_phash='')
+            if since is not None:
+                items = items.filter(updated_at__gte=since)
+            for pk, value in items.values_list('pk', 'image_phash').iterator():
+                self.table.add(int(value, 16), (kind, pk))
+
+    def _sync(self):
+        generation = cache.get(self.GENERATION_KEY, 0)
+        if self.table is not None and generation == self.generation:
+            return
+        with self.lock:
+            now = timezone.now()
+            if self.table is None:
+                self.table = MultiIndexHashTable()
+                self._load()
+            elif generation != self.generation:
+                self._load(since=self.synced_at)
+            self.generation = generation
+            self.synced_at = now
+
+    def add(self, kind, pk, phash_hex):
+        """
+        Add one item (called after it is saved in this process).
+        """
+        if self.table is not None and phash_hex:
+            with self.lock:
+                self.table.add(int(phash_hex, 16), (kind, pk))
+        self.notify_changed()
+
+    def notify_changed(self):
+        """
+        Tell the other processes to load recently updated items.
+        """
+        cache.set(self.GENERATION_KEY, secrets.token_hex(8), timeout=None)
+
+    def search(self, phash_hex, radius):
+        """
+        Return [(distance, kind, pk), ...] sorted by distance.
+        """
+        self._sync()
+        # An edited item can be in the table twice; keep its closest entry
+        closest = {}
+        for distance, item in self.table.search(int(phash_hex, 16), radius):
+            closest[item] = min(distance, closest.get(item, distance))
+        return sorted((distance, kind, pk) for (kind, pk), distance in closest.items())
+
+
+index = ImageHashIndex()
+
+
+def find_similar_items(item, radius=None, limit=6, approved_only=True):
+    """
+    Items (lost or found) of the same campus whose photo looks like `item`'s
+    photo. Returns [(distance, kind, other_item), ...], closest first, without `item`
+    itself. kind is 'lost' or 'found'.
+    Set approved_only=False to include posts still waiting for moderation.
+    """
+    if not item.image_phash:
+        return []
+    if radius is None:
+        radius = getattr(settings, 'IMAGE_HASH_SIMILAR_DISTANCE', SIMILAR_DISTANCE)
+
+    own_kind = 'lost' if isinstance(item, LostItem) else 'found'
+    matches = [
+        (distance, kind, pk)
+        for distance, kind, pk in index.search(item.image_phash, radius)
+        if (kind, pk) != (own_kind, item.pk)
+    ]
+
+    # Fetch the matched items (one query per kind) and check the hash still
+    # matches, in case the item was deleted or its photo changed. The same
+    # query finds the items with the same dHash: the same photo uploaded
+    # again (listed first, as distance 0)
+    wanted = {kind: [] for kind in ITEM_MODELS}
+    for distance, kind, pk in matches[:limit * 2]:
+        wanted[kind].append(pk)
+    found = {}
+    reuploads = []
+    for kind, pks in wanted.items():
+        condition = Q(pk__in=pks)
+        if item.image_dhash:
+            condition |= Q(image_dhash=item.image_dhash)
+        elif not pks:
+            continue
+        others = ITEM_MODELS[kind].objects.filter(condition, campus_id=item.campus_id)
+        if kind == own_kind:
+            others = others.exclude(pk=item.pk)
+        if approved_only:
+            others = others.filter(is_approved=True)
+        for other in others[:limit * 3]:
+            if item.image_dhash and other.image_dhash == item.image_dhash:
+                reuploads.append((0, kind, other))
+            else:
+                found[(kind, other.pk)] = other
+
+    results = reuploads[:limit]
+    for distance, kind, pk in matches:
+        if len(results) >= limit:
+            break
+        other = found.get((kind, pk))
+        if other is not None and other.image_phash and \
+                hamming_distance(int(other.image_phash, 16), int(item.image_phash, 16)) <= radius:
+            results.append((distance, kind, other))
+    return results
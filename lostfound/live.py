@@ -0,0 +1,372 @@
+"""
+Live updates: push newly approved items to open pages (server-sent events).
+
+Instead of everyone reloading the home and list pages to see new posts,
+the pages open ONE long-lived request to /live/items/ and the server
+writes a small event into it whenever an item is approved:
+
+    id: 3f9c-17
+    event: item
+    data: {"kind": "lost", "id": 42, "title": "Black wallet", ...}
+
+Each page listens for one campus (/live/items/?campus=3) and only gets
+that campus's items.
+
+How one change reaches thousands of connections cheaply:
+
+- Every server process has one Broker. Each open connection subscribes
+  with a small queue; publishing an event puts it into every queue
+  (a fan-out in memory, no database work per connection).
+- Approvals made in THIS process are published right after the
+  transaction commits (signals.py -> item_approved()).
+- Approvals made in OTHER processes (e.g. the admin running under
+  gunicorn) set a new random generation token in the shared cache. One
+  watcher task per process checks it every LIVE_POLL_SECONDS and, only
+  when it changed, reads the new entries of the event log (events.py)
+  and loads the items that were just approved or created approved.
+  Edits and claims of items that were already live are not pushed again.
+
+Backpressure and limits:
+- Each connection's queue holds at most LIVE_QUEUE_SIZE events. A client
+  too slow to read them is sent a "reset" event and disconnected (the
+  browser reconnects and reloads the list) instead of using more memory.
+- At most LIVE_MAX_CONNECTIONS connections per process and
+  LIVE_MAX_CONNECTIONS_PER_CLIENT per IP address; extra ones get 503.
+- The last events are kept so a reconnecting browser (Last-Event-ID
+  header) gets what it missed.
+
+This needs an ASGI server (see campus_portal/asgi.py). Under plain WSGI
+/live/items/ answers 204, which tells browsers not to reconnect.
+"""
+
+import asyncio
+import json
+import secrets
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from . import events
+from .campus import directory, site_path
+from .models import LostItem, FoundItem, ItemEvent
+
+
+LIVE_PATH = '/live/items/'
+GENERATION_KEY = 'live:generation'
+HEARTBEAT_SECONDS = 15      # Comment line sent when idle, keeps proxies from closing
+RECONNECT_MILLISECONDS = 5000
+HISTORY_SIZE = 200          # Events kept for Last-Event-ID replay
+
+# kind -> (model, detail URL name, location field)
+ITEM_KINDS = {
+    'lost': (LostItem, 'lost_item_detail', 'location_lost'),
+    'found': (FoundItem, 'found_item_detail', 'location_found'),
+}
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def item_event(kind, item):
+    """
+    The JSON data sent to browsers for one item.
+    """
+    model, detail_url, location_field = ITEM_KINDS[kind]
+    return {
+        'kind': kind,
+        'campus': item.campus_id,
+        'id': item.pk,
+        'title': item.title,
+        'category': item.get_category_display(),
+        'location': getattr(item, location_field),
+        'url': site_path(detail_url, args=[item.pk]),  # Without the /c/<slug>/ prefix
+        'image': item.image.url if item.image else '',
+    }
+
+
+class Subscriber:
+    def __init__(self, campus_id, kinds, client):
+        self.campus_id = campus_id
+        self.kinds = kinds
+        self.client = client
+        self.queue = asyncio.Queue(maxsize=get_setting('LIVE_QUEUE_SIZE', 100))
+        self.overflowed = False
+
+
+class Broker:
+    """
+    In-process publish/subscribe for live events (one per process).
+    """
+
+    def __init__(self):
+        self.token = secrets.token_hex(2)  # Makes event IDs unique to this process
+        self.sequence = 0
+        self.history = deque(maxlen=HISTORY_SIZE)  # (sequence, key, event)
+        self.recent_keys = set()
+        self.subscribers = set()
+        self.clients = {}  # IP -> open connections
+        self.loop = None
+        self.watcher = None
+        self.generation = None
+        self.position = None  # Event log position and gaps of the last check
+        self.gaps = []
+
+    # ---- connections ----
+
+    def can_subscribe(self, client):
+        if len(self.subscribers) >= get_setting('LIVE_MAX_CONNECTIONS', 2000):
+            return False
+        return self.clients.get(client, 0) < get_setting('LIVE_MAX_CONNECTIONS_PER_CLIENT', 4)
+
+    def subscribe(self, campus_id, kinds, client):
+        """
+        Must be called from the event loop of the ASGI server.
+        """
+        self.loop = asyncio.get_running_loop()
+        subscriber = Subscriber(campus_id, kinds, client)
+        self.subscribers.add(subscriber)
+        self.clients[client] = self.clients.get(client, 0) + 1
+        if self.watcher is None or self.watcher.done():
+            self.watcher = self.loop.create_task(self._watch())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        self.clients[subscriber.client] -= 1
+        if not self.clients[subscriber.client]:
+            del self.clients[subscriber.client]
+
+    def missed_events(self, last_event_id):
+        """
+        Events after `last_event_id`, if it came from this process and is
+        still in the history; otherwise nothing.
+        """
+        token, _, sequence = (last_event_id or '').partition('-')
+        if token != self.token or not sequence.isdigit():
+            return []
+        return [(seq, event) for seq, key, event in self.history if seq > int(sequence)]
+
+    def event_id(self, sequence):
+        return f'{self.token}-{sequence}'
+
+    # ---- publishing ----
+
+    def _fan_out(self, key, event):
+        """
+        Runs in the event loop: put the event into every subscriber's queue.
+        """
+        if key in self.recent_keys:
+            return  # Already sent (published here and found again by the watcher)
+        self.sequence += 1
+        if len(self.history) == self.history.maxlen:
+            self.recent_keys.discard(self.history[0][1])
+        self.history.append((self.sequence, key, event))
+        self.recent_keys.add(key)
+
+        for subscriber in self.subscribers:
+            if (event['kind'] not in subscriber.kinds or event['campus'] != subscriber.campus_id
+                    or subscriber.overflowed):
+                continue
+            try:
+                subscriber.queue.put_nowait((self.sequence, event))
+            except asyncio.QueueFull:
+                # Too slow: stop queueing, the connection will be reset
+                subscriber.overflowed = True
+                subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+
+    def publish(self, kind, item):
+        """
+        Send an item to this process's subscribers (from any thread).
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return  # No live connections in this process
+        key = (kind, item.pk)
+        loop.call_soon_threadsafe(self._fan_out, key, item_event(kind, item))
+
+    # ---- changes made by other processes ----
+
+    def _load_changes(self):
+        """
+        Items approved (or created approved) since the last check, if the
+        generation token says something changed. Runs in a thread.
+        """
+        generation = cache.get(GENERATION_KEY)
+        if self.position is None:
+            # First check: only remember where we are
+            self.generation = generation
+            self.position = ItemEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+            return []
+        if generation == self.generation:
+            return []
+
+        limit = get_setting('LIVE_QUEUE_SIZE', 100)
+        batch, self.position, self.gaps = events.read(self.position, limit, self.gaps)
+        if len(batch) < limit:
+            self.generation = generation  # Otherwise read the rest next check
+        approved = {}
+        for event in batch:
+            if event.event in ('approved', 'created') and event.data.get('is_approved'):
+                approved.setdefault(event.kind, []).append(event.item_id)
+
+        changes = []
+        for kind, item_ids in approved.items():
+            model = ITEM_KINDS[kind][0]
+            # Skip items unapproved or deleted again since
+            items = model.objects.filter(pk__in=item_ids, is_approved=True).in_bulk()
+            changes.extend(
+                ((kind, pk), item_event(kind, items[pk]))
+                for pk in dict.fromkeys(item_ids) if pk in items
+            )
+        return changes
+
+    async def _watch(self):
+        """
+        One task per process (not per connection), stops when nobody listens.
+        """
+        load_changes = sync_to_async(self._load_changes)
+        await load_changes()
+        while self.subscribers:
+            await asyncio.sleep(get_setting('LIVE_POLL_SECONDS', 2))
+            for key, event in await load_changes():
+                self._fan_out(key, event)
+        # Start from scratch when the next connection comes in
+        self.generation = self.position = None
+        self.gaps = []
+
+
+broker = Broker()
+
+
+def item_approved(kind, item):
+    """
+    Called from signals.py when an item is approved: notify this process's
+    connections and (through the cache) the other processes, once the
+    transaction has committed.
+    """
+    def notify():
+        broker.publish(kind, item)
+        cache.set(GENERATION_KEY, secrets.token_hex(8), timeout=None)
+    transaction.on_commit(notify)
+
+
+def get_stats():
+    return {
+        'connections': len(broker.subscribers),
+        'clients': len(broker.clients),
+        'events_sent': broker.sequence,
+    }
+
+
+# ---------------- ASGI ----------------
+
+def _client_address(scope, headers):
+    if get_setting('RATELIMIT_TRUST_X_FORWARDED_FOR', False):
+        forwarded = headers.get(b'x-forwarded-for', b'').decode('latin-1')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return (scope.get('client') or ('',))[0]
+
+
+def _sse(sequence, event):
+    data = json.dumps(event, separators=(',', ':'))
+    return f'id: {broker.event_id(sequence)}\nevent: item\ndata: {data}\n\n'.encode('utf-8')
+
+
+async def _reject(send, status, message):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'text/plain; charset=utf-8'), (b'retry-after', b'30'),
+    ]})
+    await send({'type': 'http.response.body', 'body': message.encode('utf-8')})
+
+
+async def stream_items(scope, receive, send):
+    """
+    ASGI handler for /live/items/?campus=3&kind=lost (kind is optional,
+    campus defaults to the default campus).
+    """
+    headers = dict(scope.get('headers') or [])
+    if scope['method'] != 'GET':
+        await _reject(send, 405, 'Method not allowed')
+        return
+    client = _client_address(scope, headers)
+    if not broker.can_subscribe(client):
+        await _reject(send, 503, 'Too many live connections, try again later')
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    kinds = {kind for kind in query.get('kind', []) if kind in ITEM_KINDS} or set(ITEM_KINDS)
+    campus_id = (query.get('campus') or [''])[0]
+    if campus_id.isdigit():
+        campus_id = int(campus_id)
+    else:
+        campus_id = (await sync_to_async(directory.get_default)()).pk
+    subscriber = broker.subscribe(campus_id, kinds, client)
+
+    # Set the subscriber's queue to None when the browser goes away
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscriber.overflowed = True
+        if subscriber.queue.full():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+    disconnect_task = asyncio.create_task(wait_for_disconnect())
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # Tell nginx-like proxies not to buffer
+        ]})
+        body = f'retry: {RECONNECT_MILLISECONDS}\n\n'.encode()
+        last_event_id = headers.get(b'last-event-id', b'').decode('latin-1')
+        for sequence, event in broker.missed_events(last_event_id):
+            if event['kind'] in kinds and event['campus'] == campus_id:
+                body += _sse(sequence, event)
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                message = 'heartbeat'
+            if message is None:
+                if not disconnect_task.done():
+                    # Fell behind: tell the page to reload, then close
+                    await send({'type': 'http.response.body',
+                                'body': b'event: reset\ndata: {}\n\n', 'more_body': True})
+                break
+            if message == 'heartbeat':
+                chunk = b': ping\n\n'
+            else:
+                chunk = _sse(*message)
+            # Awaiting send() is where a slow client slows us down; events
+            # meanwhile wait in the (bounded) queue.
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        pass  # Connection dropped while sending
+    finally:
+        disconnect_task.cancel()
+        broker.unsubscribe(subscriber)
+
+
+def live_updates_application(django_application):
+    """
+    Wrap the Django ASGI application: /live/items/ is streamed by
+    stream_items(), everything else goes to Django as usual.
+    """
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == LIVE_PATH:
+            await stream_items(scope, receive, send)
+        else:
+            await django_application(scope, receive, send)
+    return application
@@ -0,0 +1,40 @@
+"""
+HTTP load testing for sizing gunicorn (see `python manage.py loadtest`).
+
+- client.py    : asyncio HTTP client, virtual users and latency statistics
+- scenarios.py : what the virtual users do (browse, post, search)
+- run()        : run one scenario with N concurrent users for some seconds
+"""
+
+import asyncio
+
+from .client import Stats, VirtualUser
+from .scenarios import SCENARIOS
+
+
+async def _user_loop(scenario, user, context, deadline):
+    loop = asyncio.get_running_loop()
+    try:
+        while loop.time() < deadline:
+            await scenario(user, context)
+    finally:
+        await user.close()
+
+
+async def _run(host, port, scenario, users, seconds, context):
+    stats = Stats()
+    deadline = asyncio.get_running_loop().time() + seconds
+    await asyncio.gather(*[
+        _user_loop(scenario, VirtualUser(host, port, stats), context, deadline)
+        for _ in range(users)
+    ])
+    stats.stop()
+    return stats
+
+
+def run(host, port, scenario_name, users, seconds, context):
+    """
+    Run a scenario and return its Stats.summary().
+    """
+    stats = asyncio.run(_run(host, port, SCENARIOS[scenario_name], users, seconds, context))
+    return stats.summary()
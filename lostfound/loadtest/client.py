@@ -0,0 +1,216 @@
+"""
+A tiny asyncio HTTP/1.1 client for load testing (no extra dependencies).
+
+Each VirtualUser is one browser: one keep-alive connection and its own
+cookies (session, CSRF token). Every request it makes is timed and
+recorded in a Stats object shared by all users of a scenario.
+"""
+
+import asyncio
+import math
+import re
+import time
+import uuid
+from urllib.parse import urlencode
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers  # Lowercase name -> list of values
+        self.body = body
+
+    def header(self, name, default=''):
+        values = self.headers.get(name.lower())
+        return values[-1] if values else default
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+
+class Stats:
+    """
+    Latencies and errors of every request of one scenario.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}  # "HTTP 500" / "ConnectionResetError" -> count
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, latency, error=None):
+        self.latencies.append(latency)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        requests = len(self.latencies)
+        errors = sum(self.errors.values())
+        return {
+            'requests': requests,
+            'seconds': round(elapsed, 2),
+            'throughput': round(requests / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 1),
+            'p90_ms': round(self.percentile(90) * 1000, 1),
+            'p99_ms': round(self.percentile(99) * 1000, 1),
+            'max_ms': round(max(self.latencies, default=0) * 1000, 1),
+            'error_rate': round(100 * errors / requests, 2) if requests else 0.0,
+            'errors': dict(self.errors),
+        }
+
+
+class VirtualUser:
+    """
+    One simulated visitor with a keep-alive connection and a cookie jar.
+    """
+
+    def __init__(self, host, port, stats, timeout=30):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def _send(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        all_headers = {'Connection': 'keep-alive', 'Content-Length': str(len(body))}
+        all_headers.update(headers or {})
+        if self.cookies:
+            all_headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        lines.extend(f'{name}: {value}' for name, value in all_headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        return await self._read_response()
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Server closed the connection')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+        if 'chunked' in ','.join(headers.get('transfer-encoding', [])).lower():
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()  # Blank line after the last chunk
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length'][-1]))
+        elif status in (204, 304):
+            body = b''
+        else:
+            body = await self.reader.read()  # Body ends when the connection closes
+            headers['connection'] = ['close']
+
+        if any(v.lower() == 'close' for v in headers.get('connection', [])):
+            await self.close()
+
+        for cookie in headers.get('set-cookie', []):
+            name, _, value = cookie.split(';')[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return Response(status, headers, body)
+
+    async def request(self, method, path, body=b'', headers=None):
+        """
+        Send a request, time it and record it. Returns the Response, or
+        None if the request failed without an HTTP answer.
+        """
+        start = time.perf_counter()
+        try:
+            try:
+                response = await asyncio.wait_for(
+                    self._send(method, path, body, headers), self.timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server may close an idle keep-alive connection right
+                # when we reuse it; retry once on a fresh connection.
+                await self.close()
+                response = await asyncio.wait_for(
+                    self._send(method, path, body, headers), self.timeout
+                )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+            await self.close()
+            self.stats.record(time.perf_counter() - start, type(error).__name__)
+            return None
+
+        error = f'HTTP {response.status}' if response.status >= 400 else None
+        self.stats.record(time.perf_counter() - start, error)
+        return response
+
+    async def get(self, path):
+        return await self.request('GET', path)
+
+    async def post_form(self, path, fields, files=None):
+        """
+        POST a form (multipart if files are given) with the CSRF token.
+        `files` is {field: (filename, content_type, bytes)}.
+        """
+        headers = {'Referer': f'http://{self.host}:{self.port}{path}'}
+        if files:
+            body, content_type = encode_multipart(fields, files)
+        else:
+            body, content_type = urlencode(fields).encode(), 'application/x-www-form-urlencoded'
+        headers['Content-Type'] = content_type
+        return await self.request('POST', path, body, headers)
+
+
+_CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def csrf_token(response):
+    match = _CSRF_INPUT.search(response.text) if response else None
+    return match.group(1) if match else ''
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content_type, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
@@ -0,0 +1,80 @@
+"""
+Load test scenarios: what one virtual user does, over and over.
+
+Each scenario is an async function `scenario(user, context)` that runs ONE
+iteration (a few requests). The runner calls it in a loop for every
+virtual user until the test time is up.
+
+`context` is built once by the loadtest command:
+    lost_ids / found_ids   approved item IDs to open detail pages of
+    search_terms           words taken from real item titles
+    username / password    account used by the posting scenario
+    image                  JPEG bytes attached to posted items
+"""
+
+import random
+
+from .client import csrf_token
+
+
+async def browse(user, context):
+    """
+    Anonymous visitor: home page, a list page, then a few item pages.
+    """
+    await user.get('/')
+    kind = random.choice(['lost', 'found'])
+    await user.get(f'/{kind}-items/')
+    ids = context[f'{kind}_ids']
+    for item_id in random.sample(ids, min(3, len(ids))):
+        await user.get(f'/{kind}-item/{item_id}/')
+
+
+async def post_items(user, context):
+    """
+    Logged-in student posting a lost or found item with a photo.
+    """
+    if 'sessionid' not in user.cookies:
+        login_page = await user.get('/login/')
+        await user.post_form('/login/', {
+            'csrfmiddlewaretoken': csrf_token(login_page),
+            'username': context['username'],
+            'password': context['password'],
+        })
+
+    kind = random.choice(['lost', 'found'])
+    form_page = await user.get(f'/post-{kind}/')
+    fields = {
+        'csrfmiddlewaretoken': csrf_token(form_page),
+        'title': f'Load test {kind} item',
+        'description': 'Posted by the load test.',
+        'category': 'other',
+        f'location_{kind}': 'Library',
+        f'date_{kind}': '2024-01-15',
+        'contact_info': 'loadtest@example.com',
+    }
+    await user.post_form(f'/post-{kind}/', fields, files={
+        'image': ('photo.jpg', 'image/jpeg', context['image']),
+    })
+
+
+async def search_burst(user, context):
+    """
+    Someone typing a search: typeahead suggestions for each prefix,
+    then the search itself (sometimes with a typo).
+    """
+    kind = random.choice(['lost', 'found'])
+    term = random.choice(context['search_terms'])
+    for length in range(2, min(len(term), 6) + 1):
+        await user.get(f'/search/suggest/?kind={kind}&q={term[:length]}')
+    if len(term) > 3 and random.random() < 0.3:
+        # Swap two letters: "wallet" -> "walelt"
+        i = random.randrange(len(term) - 1)
+        term = term[:i] + term[i + 1] + term[i] + term[i + 2:]
+    await user.get(f'/{kind}-items/?q={term}')
+
+
+SCENARIOS = {
+    'browse': browse,
+    'post': post_items,
+    'search': search_burst,
+}
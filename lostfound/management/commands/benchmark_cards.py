@@ -0,0 +1,95 @@
+"""
+Management command that compares ways of loading one list page of items.
+
+For a page of N approved items (default 1,000) it measures:
+    full     model instances with every column (what the pages used to do)
+    only     model instances with only the card columns (.only())
+    cards    ItemCard records from values_list() (what the pages do now)
+
+and reports the median time to load the page and the memory it takes
+(measured with tracemalloc in a separate run, since tracing slows Python
+down). Memory is what the loaded page still holds ("kept") and the most
+used while loading ("peak").
+
+Usage:
+    python manage.py benchmark_cards
+    python manage.py benchmark_cards --kind lost --items 500 --repeat 10
+"""
+
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from lostfound.cards import CARD_SPECS, load_cards
+from lostfound.models import LostItem, FoundItem
+
+
+ITEM_MODELS = {'lost': LostItem, 'found': FoundItem}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark memory and time per list page: full objects vs .only() vs cards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(ITEM_MODELS), default='found')
+        parser.add_argument('--items', type=int, default=1000,
+                            help='Items per page')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per method (the median is shown)')
+
+    def handle(self, *args, **options):
+        model = ITEM_MODELS[options['kind']]
+        limit = options['items']
+        queryset = model.objects.filter(is_approved=True).order_by('-created_at', '-id')
+        available = queryset[:limit].count()
+        if available < limit:
+            raise CommandError(
+                f'Only {available} approved {options["kind"]} items; lower --items or add data.'
+            )
+
+        card_fields = [field for field in CARD_SPECS[model].fields if field != 'id']
+        methods = [
+            ('full', lambda: list(queryset[:limit])),
+            ('only', lambda: list(queryset.only(*card_fields)[:limit])),
+            ('cards', lambda: load_cards(queryset, limit)),
+        ]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{limit} {options["kind"]} items per page, median of {options["repeat"]} runs\n'
+            f'{"method":<8}{"ms":>9}{"kept KiB":>11}{"peak KiB":>11}{"bytes/item":>12}'
+        ))
+        for name, load in methods:
+            load()  # Warm up (query plan, label maps, imports)
+            seconds = self._time(load, options['repeat'])
+            kept, peak = self._memory(load)
+            self.stdout.write(
+                f'{name:<8}{seconds * 1000:>9.1f}{kept / 1024:>11.0f}{peak / 1024:>11.0f}'
+                f'{kept / limit:>12.0f}'
+            )
+
+    def _time(self, load, repeat):
+        timings = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - start)
+            reset_queries()  # Don't let DEBUG's query log grow
+        return statistics.median(timings)
+
+    def _memory(self, load):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            page = load()
+            kept, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del page
+        reset_queries()
+        return kept - before, peak - before
@@ -0,0 +1,19 @@
+"""
+Management command to write all RSS/Atom feeds and sitemap files.
+
+The files are updated automatically when items change; run this on deploy
+(the generated/ folder starts empty) or if a file looks wrong:
+    python manage.py build_feeds
+"""
+
+from django.core.management.base import BaseCommand
+
+from lostfound.feeds import build_all, get_root
+
+
+class Command(BaseCommand):
+    help = 'Write the RSS/Atom feeds and sitemap files served by WhiteNoise.'
+
+    def handle(self, *args, **options):
+        count = build_all()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} files to {get_root()}.'))
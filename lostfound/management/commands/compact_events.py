@@ -0,0 +1,25 @@
+"""
+Management command that compacts the item event log (see events.py):
+old events that every consumer has handled are reduced to the newest event
+of each item, and deleted items lose their events.
+
+Run it daily from cron:
+    python manage.py compact_events
+    python manage.py compact_events --keep-days 7
+"""
+
+from django.core.management.base import BaseCommand
+
+from lostfound.events import compact
+
+
+class Command(BaseCommand):
+    help = 'Compact item events older than EVENT_LOG_KEEP_DAYS to the newest event per item.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=None,
+                            help='Keep every event of the last N days (default: settings.EVENT_LOG_KEEP_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = compact(options['keep_days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} events.'))
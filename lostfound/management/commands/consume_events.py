@@ -0,0 +1,42 @@
+"""
+Management command that runs the consumers of the item event log
+(see events.py) from their checkpoints.
+
+Run it as a worker process, or from cron:
+    python manage.py consume_events --loop
+    python manage.py consume_events --consumer search_index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from lostfound.events import CONSUMERS, consume, get_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Feed new item events to the event log consumers and save their checkpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', choices=sorted(CONSUMERS),
+                            help='Only run this consumer (can be repeated; default: all)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Events per batch (default: settings.EVENT_LOG_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and wait for new events')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when there are no new events (with --loop)')
+
+    def handle(self, *args, **options):
+        names = options['consumer'] or sorted(CONSUMERS)
+        while True:
+            handled = 0
+            for name in names:
+                count = consume(name, options['batch_size'])
+                if count:
+                    self.stdout.write(f'{name}: handled {count} events, now at #{get_checkpoint(name).position}.')
+                handled += count
+            if not options['loop']:
+                break
+            if not handled:
+                time.sleep(options['interval'])
@@ -0,0 +1,80 @@
+"""
+Management command to bulk import lost/found items from a CSV or JSONL file.
+
+Usage:
+    python manage.py import_items found desk_log.csv --posted-by security --approve
+    python manage.py import_items lost items.jsonl --posted-by admin --workers 4
+    python manage.py import_items found north.csv --posted-by security --campus north
+
+CSV files need a header row with the form field names, for example:
+    title,description,category,location_found,date_found,contact_info
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from lostfound.importers import (
+    ITEM_TYPES, FILE_FORMATS, DEFAULT_BATCH_SIZE, guess_format, import_items
+)
+from lostfound.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Bulk import lost or found items from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('item_type', choices=list(ITEM_TYPES))
+        parser.add_argument('path', help='Path to the CSV or JSONL file')
+        parser.add_argument('--posted-by', required=True,
+                            help='Username that will own the imported items')
+        parser.add_argument('--campus',
+                            help='Slug of the campus the items belong to (default: the default campus)')
+        parser.add_argument('--format', choices=FILE_FORMATS,
+                            help='File format (default: guessed from the extension)')
+        parser.add_argument('--approve', action='store_true',
+                            help='Mark imported items as approved')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes used to validate rows')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['posted_by'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['posted_by']}' does not exist.")
+
+        campus = None
+        if options['campus']:
+            try:
+                campus = Campus.objects.get(slug=options['campus'])
+            except Campus.DoesNotExist:
+                raise CommandError(f"Campus '{options['campus']}' does not exist.")
+
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be at least 1.')
+
+        file_format = options['format'] or guess_format(options['path'])
+
+        def report_error(row_number, errors):
+            for field, messages in errors.items():
+                for message in messages:
+                    self.stderr.write(f'Row {row_number}: {field}: {message}')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                result = import_items(
+                    f, options['item_type'], user,
+                    file_format=file_format,
+                    approve=options['approve'],
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    on_error=report_error,
+                    campus=campus,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} of {result.total} rows '
+            f'({result.failed} rows had errors).'
+        ))
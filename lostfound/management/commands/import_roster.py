@@ -0,0 +1,67 @@
+"""
+Management command to create student accounts from a roster file (see roster.py).
+
+Usage:
+    python manage.py import_roster students.csv --campus north
+    python manage.py import_roster students.jsonl --workers 8
+
+CSV files need a header row with the column names, for example:
+    username,email,first_name,last_name,student_id,phone
+
+Students get an invitation email to choose their password (sent by
+`send_notifications`). A `password` column is hashed instead, spread over
+--workers processes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lostfound.importers import FILE_FORMATS, DEFAULT_BATCH_SIZE, guess_format
+from lostfound.models import Campus
+from lostfound.roster import import_roster
+
+
+class Command(BaseCommand):
+    help = 'Create student accounts (with invitation emails) from a CSV or JSONL roster.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV or JSONL file')
+        parser.add_argument('--campus',
+                            help='Slug of the students\' campus (default: the default campus)')
+        parser.add_argument('--format', choices=FILE_FORMATS,
+                            help='File format (default: guessed from the extension)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of processes used to validate rows and hash passwords')
+
+    def handle(self, *args, **options):
+        campus = None
+        if options['campus']:
+            try:
+                campus = Campus.objects.get(slug=options['campus'])
+            except Campus.DoesNotExist:
+                raise CommandError(f"Campus '{options['campus']}' does not exist.")
+
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be at least 1.')
+
+        def report_error(row_number, errors):
+            for field, messages in errors.items():
+                for message in messages:
+                    self.stderr.write(f'Row {row_number}: {field}: {message}')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                result = import_roster(
+                    f, campus=campus,
+                    file_format=options['format'] or guess_format(options['path']),
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    on_error=report_error,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created} accounts ({result.invited} will get an invitation email), '
+            f'{result.existing} already existed, {result.failed} rows had errors.'
+        ))
@@ -0,0 +1,227 @@
+"""
+Management command that load tests the site under different worker models.
+
+For each server mode it starts a local server, runs every scenario
+(see lostfound/loadtest/scenarios.py) with N concurrent virtual users,
+stops the server and prints throughput, latency percentiles and error
+rates, so gunicorn settings can be chosen from numbers instead of guesses.
+
+Server modes:
+    sync     gunicorn, one request at a time per worker process
+    gthread  gunicorn, several threads per worker process
+    asgi     uvicorn running campus_portal.asgi (needs `pip install uvicorn`)
+
+Rate limiting is switched off in the started servers (RATELIMIT_ENABLED=0),
+otherwise the test would mostly measure 429 responses.
+
+Usage:
+    python manage.py loadtest
+    python manage.py loadtest --modes gthread --workers 2 --threads 8 --users 50
+    python manage.py loadtest --url http://127.0.0.1:8000 --scenarios browse,search
+"""
+
+import io
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from lostfound import loadtest
+from lostfound.campus import directory
+from lostfound.loadtest.scenarios import SCENARIOS
+from lostfound.models import LostItem, FoundItem
+
+
+LOADTEST_USERNAME_PREFIX = 'loadtest-'
+MODES = ['sync', 'gthread', 'asgi']
+
+
+def server_command(mode, port, workers, threads):
+    bind = f'127.0.0.1:{port}'
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--bind', bind, '--workers', str(workers),
+                '--worker-class', 'sync', 'campus_portal.wsgi:application']
+    if mode == 'gthread':
+        return [sys.executable, '-m', 'gunicorn', '--bind', bind, '--workers', str(workers),
+                '--worker-class', 'gthread', '--threads', str(threads),
+                'campus_portal.wsgi:application']
+    return [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--no-access-log', 'campus_portal.asgi:application']
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Load test the site in sync, gthread and ASGI server modes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Comma-separated server modes (sync, gthread, asgi)')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help='Comma-separated scenarios (' + ', '.join(SCENARIOS) + ')')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Concurrent virtual users per scenario')
+        parser.add_argument('--duration', type=float, default=15,
+                            help='Seconds to run each scenario')
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Server worker processes')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Threads per worker in gthread mode')
+        parser.add_argument('--port', type=int, default=8765,
+                            help='Port for the started servers')
+        parser.add_argument('--url',
+                            help='Test an already running server instead of starting one')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON')
+        parser.add_argument('--keep-data', action='store_true',
+                            help="Don't delete the load test's account and the items it posted")
+
+    def handle(self, *args, **options):
+        scenarios = [s.strip() for s in options['scenarios'].split(',') if s.strip()]
+        for scenario in scenarios:
+            if scenario not in SCENARIOS:
+                raise CommandError(f'Unknown scenario "{scenario}"')
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        for mode in modes:
+            if mode not in MODES:
+                raise CommandError(f'Unknown mode "{mode}"')
+
+        context = self._build_context()
+        results = []
+        try:
+            if options['url']:
+                url = urlsplit(options['url'])
+                for scenario in scenarios:
+                    results.append(self._run(
+                        'external', url.hostname, url.port or 80, scenario, context, options
+                    ))
+            else:
+                for mode in modes:
+                    results.extend(self._run_mode(mode, scenarios, context, options))
+        finally:
+            if options['keep_data']:
+                self.stderr.write(f'Kept the account {self.user.username} and its posts.')
+            else:
+                self._delete_test_data()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self._print_table(results)
+
+    def _build_context(self):
+        """
+        Everything the scenarios need, read from the database once.
+        """
+        # The servers are reached as 127.0.0.1, i.e. on the default campus
+        campus = directory.get_default()
+        lost_items = LostItem.objects.filter(campus=campus, is_approved=True)
+        found_items = FoundItem.objects.filter(campus=campus, is_approved=True)
+        lost_ids = list(lost_items.values_list('id', flat=True)[:500])
+        found_ids = list(found_items.values_list('id', flat=True)[:500])
+        if not lost_ids or not found_ids:
+            raise CommandError('Need approved lost and found items (try create_test_data.py)')
+
+        titles = list(lost_items.values_list('title', flat=True)[:200])
+        terms = sorted({word.lower() for title in titles for word in title.split() if len(word) >= 4})
+
+        image = io.BytesIO()
+        Image.new('RGB', (640, 480), (90, 120, 200)).save(image, 'JPEG', quality=85)
+
+        # A throwaway account for the posting scenario, so real accounts
+        # (and their posts) are never touched. Only what it posts during
+        # this run is deleted afterwards, then the account itself.
+        password = secrets.token_urlsafe(16)
+        self.user = User.objects.create_user(
+            username=LOADTEST_USERNAME_PREFIX + secrets.token_hex(4), password=password,
+        )
+        # Items with higher IDs than these were posted during the run
+        self.last_ids = {
+            model: model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            for model in (LostItem, FoundItem)
+        }
+
+        return {
+            'lost_ids': lost_ids,
+            'found_ids': found_ids,
+            'search_terms': terms or ['wallet'],
+            'username': self.user.username,
+            'password': password,
+            'image': image.getvalue(),
+        }
+
+    def _delete_test_data(self):
+        """
+        Delete the items the run posted, then the throwaway account.
+        """
+        for model, last_id in self.last_ids.items():
+            # Deleted one by one so the signal handlers keep caches in sync
+            for item in model.objects.filter(posted_by=self.user, pk__gt=last_id):
+                item.delete()
+        self.user.delete()
+
+    def _run_mode(self, mode, scenarios, context, options):
+        port = options['port']
+        env = dict(os.environ, RATELIMIT_ENABLED='0', PYTHONUNBUFFERED='1')
+        command = server_command(mode, port, options['workers'], options['threads'])
+        self.stderr.write(f'Starting {mode} server: {" ".join(command[1:])}')
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            if not wait_for_port(port, process):
+                process.kill()
+                error = process.communicate()[1][-1000:]
+                self.stderr.write(self.style.ERROR(f'{mode} server did not start, skipped:\n{error}'))
+                return []
+            return [self._run(mode, '127.0.0.1', port, scenario, context, options)
+                    for scenario in scenarios]
+        finally:
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    def _run(self, mode, host, port, scenario, context, options):
+        self.stderr.write(f'  {mode}: {scenario} with {options["users"]} users '
+                          f'for {options["duration"]:g}s ...')
+        summary = loadtest.run(host, port, scenario, options['users'], options['duration'], context)
+        return dict(mode=mode, scenario=scenario, **summary)
+
+    def _print_table(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n{"mode":<9}{"scenario":<9}{"requests":>9}{"req/s":>8}'
+            f'{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"max ms":>9}{"errors":>8}'
+        ))
+        for r in results:
+            self.stdout.write(
+                f'{r["mode"]:<9}{r["scenario"]:<9}{r["requests"]:>9}{r["throughput"]:>8}'
+                f'{r["p50_ms"]:>9}{r["p90_ms"]:>9}{r["p99_ms"]:>9}{r["max_ms"]:>9}'
+                f'{r["error_rate"]:>7}%'
+            )
+            if r['errors']:
+                details = ', '.join(f'{name}: {count}' for name, count in r['errors'].items())
+                self.stdout.write(f'{"":<18}{details}')
@@ -0,0 +1,139 @@
+"""
+Management command that measures how long a fresh worker takes to start.
+
+Every gunicorn worker imports Django, our settings, every installed app and
+their dependencies before it can answer a request. This command starts
+fresh Python processes (so nothing is imported yet) and reports:
+
+1. Import cost per module during django.setup(), using Python's built-in
+   `-X importtime` option, grouped by top-level package.
+2. Time to first request: start -> django.setup() -> WSGI app ready ->
+   first response, repeated a few times (median is shown).
+
+Usage:
+    python manage.py profile_startup
+    python manage.py profile_startup --top 30 --runs 5 --path /lost-items/
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Code run in the fresh process to time the first request
+FIRST_REQUEST_SCRIPT = r'''
+import io, json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+app_ready = time.perf_counter()
+
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+body = b''.join(application(environ, lambda s, h, e=None: status.append(s)))
+done = time.perf_counter()
+print(json.dumps({
+    'setup': setup_done - start,
+    'app': app_ready - setup_done,
+    'first_request': done - app_ready,
+    'total': done - start,
+    'status': status[0] if status else '',
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report import cost during django.setup() and time to first request.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of slowest modules/packages to show')
+        parser.add_argument('--runs', type=int, default=3,
+                            help='How many fresh processes to time the first request in')
+        parser.add_argument('--path', default='/',
+                            help='URL path of the first request')
+
+    def _env(self):
+        env = dict(os.environ)
+        env['DJANGO_SETTINGS_MODULE'] = os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'campus_portal.settings'
+        )
+        env['PYTHONPATH'] = os.pathsep.join(
+            [str(settings.BASE_DIR)] + [p for p in [env.get('PYTHONPATH')] if p]
+        )
+        return env
+
+    def handle(self, *args, **options):
+        self._report_imports(options['top'])
+        self._report_first_request(options['runs'], options['path'])
+
+    def _report_imports(self, top):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import django; django.setup()'],
+            env=self._env(), cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr[-2000:])
+
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+        packages = {}
+        for name, self_us, cumulative_us in modules:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+        total_us = sum(packages.values())
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Imports during django.setup(): {len(modules)} modules, {total_us / 1000:.1f} ms'
+        ))
+        self.stdout.write('\nSlowest packages (own import time of all their modules):')
+        for package, us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+            self.stdout.write(f'  {us / 1000:8.1f} ms  {100 * us / total_us:5.1f}%  {package}')
+
+        self.stdout.write('\nSlowest modules (including what they import):')
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[2])[:top]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} ms  {name}')
+
+    def _report_first_request(self, runs, path):
+        timings = []
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, '-c', FIRST_REQUEST_SCRIPT, path],
+                env=self._env(), cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(result.stderr[-2000:])
+            timings.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nTime to first request ({path}, median of {runs} fresh processes, '
+            f'status {timings[-1]["status"]}):'
+        ))
+        for key, label in [
+            ('setup', 'django.setup()'),
+            ('app', 'WSGI application ready'),
+            ('first_request', 'first response'),
+            ('total', 'total'),
+        ]:
+            median = statistics.median(t[key] for t in timings)
+            self.stdout.write(f'  {median * 1000:8.1f} ms  {label}')
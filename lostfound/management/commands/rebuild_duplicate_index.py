@@ -0,0 +1,48 @@
+"""
+Management command to rebuild the near-duplicate index (see duplicates.py).
+
+New posts are indexed when they are submitted; run this after upgrading,
+after importing many items, or from a daily cron job with --prune-only to
+drop the rows of posts older than settings.DUPLICATE_WINDOW_DAYS:
+    python manage.py rebuild_duplicate_index
+    python manage.py rebuild_duplicate_index --prune-only
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from lostfound.duplicates import ITEM_MODELS, get_window, index_items, prune
+from lostfound.models import MinHashBand
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHashBand table from the posts of the last DUPLICATE_WINDOW_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prune-only', action='store_true',
+                            help='Only delete the rows of posts that are too old')
+
+    def handle(self, *args, **options):
+        if options['prune_only']:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {prune()} old rows.'))
+            return
+
+        MinHashBand.objects.all().delete()
+        since = timezone.now() - get_window()
+        for kind, model in ITEM_MODELS.items():
+            items = model.objects.filter(created_at__gte=since).only(
+                'pk', 'campus', 'title', 'description', 'created_at', 'duplicate_of'
+            )
+            count = 0
+            batch = []
+            for item in items.iterator(chunk_size=options['batch_size']):
+                batch.append(item)
+                if len(batch) >= options['batch_size']:
+                    index_items(kind, batch, replace=False)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                index_items(kind, batch, replace=False)
+                count += len(batch)
+            self.stdout.write(self.style.SUCCESS(f'{kind}: indexed {count} posts.'))
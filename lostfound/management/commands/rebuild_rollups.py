@@ -0,0 +1,19 @@
+"""
+Management command to rebuild the analytics rollups from the item tables.
+
+Rollups are updated automatically as items are posted and change status;
+run this after upgrading or if the numbers look wrong:
+    python manage.py rebuild_rollups
+"""
+
+from django.core.management.base import BaseCommand
+
+from lostfound.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailyRollup table used by the admin analytics page.'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollup rows.'))
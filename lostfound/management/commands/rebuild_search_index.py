@@ -0,0 +1,42 @@
+"""
+Management command to rebuild the trigram search index (SQLite only).
+
+Items are indexed automatically when saved; run this after upgrading or if
+the index got out of sync:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from lostfound.models import SearchTrigram
+from lostfound.search import ITEM_KINDS, index_items, use_postgres
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SearchTrigram table from all approved items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if use_postgres():
+            self.stdout.write('PostgreSQL uses pg_trgm indexes; nothing to rebuild.')
+            return
+
+        SearchTrigram.objects.all().delete()
+        for kind, (model, location_field) in ITEM_KINDS.items():
+            items = model.objects.filter(is_approved=True).only(
+                'pk', 'campus', 'is_approved', 'title', 'description', location_field
+            )
+            count = 0
+            batch = []
+            for item in items.iterator(chunk_size=options['batch_size']):
+                batch.append(item)
+                if len(batch) >= options['batch_size']:
+                    index_items(kind, batch, replace=False)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                index_items(kind, batch, replace=False)
+                count += len(batch)
+            self.stdout.write(self.style.SUCCESS(f'{kind}: indexed {count} items.'))
@@ -0,0 +1,50 @@
+"""
+Management command that replays the item event log for a consumer
+(see events.py), e.g. after fixing a bug in it or restoring a cache:
+    python manage.py replay_events search_index --from-id 0
+    python manage.py replay_events feeds --since 2024-03-01
+
+The consumer's checkpoint is moved back and the events from there on are
+handled again (consumers are idempotent, so this is safe).
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from lostfound.events import CONSUMERS, consume, position_before, rewind
+
+
+class Command(BaseCommand):
+    help = 'Move a consumer\'s checkpoint back and handle the item events from there again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumer', choices=sorted(CONSUMERS))
+        start = parser.add_mutually_exclusive_group(required=True)
+        start.add_argument('--from-id', type=int,
+                           help='Replay the events after this event ID (0 = the whole log)')
+        start.add_argument('--since',
+                           help='Replay the events since this date or date-time (YYYY-MM-DD[ HH:MM])')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                day = parse_date(options['since'])
+                if day is None:
+                    raise CommandError('--since must look like 2024-03-01 or 2024-03-01 14:30.')
+                since = datetime.datetime.combine(day, datetime.time())
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            position = position_before(since)
+        else:
+            position = options['from_id']
+
+        rewind(options['consumer'], position)
+        count = consume(options['consumer'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["consumer"]}: replayed {count} events after #{position}.'
+        ))
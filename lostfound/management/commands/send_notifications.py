@@ -0,0 +1,51 @@
+"""
+Management command that emails queued notifications (see notifications.py)
+and account invitations (see roster.py).
+
+Run it as a separate worker process next to the web server:
+    python manage.py send_notifications --loop
+or from cron every minute, sending everything that is due and exiting:
+    python manage.py send_notifications
+
+It uses settings.EMAIL_BACKEND; with the console backend the emails are
+printed instead of sent.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from lostfound.notifications import DEFAULT_BATCH_SIZE, deliver_batch
+from lostfound.roster import deliver_invitations
+
+
+class Command(BaseCommand):
+    help = 'Send queued notification emails (one digest per user) and invitations in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Notifications leased and sent per batch')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and check for new notifications')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when nothing is due (with --loop)')
+
+    def handle(self, *args, **options):
+        while True:
+            result = deliver_batch(options['batch_size'])
+            if result.total:
+                self.stdout.write(
+                    f'Sent {result.emails} emails ({result.notifications} notifications), '
+                    f'{result.failed} failed, {result.skipped} skipped.'
+                )
+            invitations = deliver_invitations(options['batch_size'])
+            if invitations.total:
+                self.stdout.write(
+                    f'Sent {invitations.emails} invitations, '
+                    f'{invitations.failed} failed, {invitations.skipped} skipped.'
+                )
+            if result.total or invitations.total:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,387 @@
+"""
+Application metrics for Prometheus, served at /metrics.
+
+What is measured:
+- lostfound_http_request_duration_seconds: histogram of request time per
+  URL name (the names in lostfound/urls.py; admin pages count as "admin",
+  anything else as "other"), method and status class (2xx, 4xx...).
+- lostfound_db_queries_total / lostfound_db_query_seconds_total: queries
+  and database time per URL name, plus a histogram of single query times.
+- lostfound_cache_lookups_total: hits and misses of the search result
+  cache (search_cache.py) and the full-page cache (page_cache.py). The
+  hit ratio is hits / (hits + misses), e.g. in PromQL:
+  rate(...{result="hit"}[5m]) / ignoring(result) sum without(result)(rate(...[5m])).
+- lostfound_upload_size_bytes: histogram of uploaded photo sizes.
+- lostfound_items_pending_moderation: posts waiting for approval, per
+  kind and campus (counted from the database when /metrics is read).
+
+Several processes (gunicorn workers) serve requests, and Prometheus only
+talks to one of them per scrape. So, like prometheus_client's
+"multiprocess mode":
+- Each process counts in memory (a dictionary update under a lock, a few
+  microseconds per request) and writes its totals to its own JSON file in
+  settings.METRICS_DIR at most every METRICS_FLUSH_SECONDS, and when it
+  exits.
+- /metrics adds up the files of all processes. Files of processes that
+  are gone (e.g. recycled by gunicorn's max_requests) are merged into
+  archive.json first, so their counts are not lost.
+
+/metrics needs `Authorization: Bearer <METRICS_TOKEN>` when the
+METRICS_TOKEN environment variable is set, and a staff login otherwise.
+"""
+
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from . import page_cache, search_cache
+from .campus import directory as campus_directory
+from .models import LostItem, FoundItem
+
+
+DEFAULT_FLUSH_SECONDS = 5
+
+COUNTERS = {
+    'lostfound_db_queries_total': 'Database queries, per URL name.',
+    'lostfound_db_query_seconds_total': 'Time spent in database queries, per URL name.',
+    'lostfound_cache_lookups_total': 'Cache lookups by cache and result (hit/miss).',
+}
+
+HISTOGRAMS = {
+    'lostfound_http_request_duration_seconds': (
+        'Time to answer a request, per URL name, method and status class.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'lostfound_db_query_duration_seconds': (
+        'Time of single database queries.',
+        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+    ),
+    'lostfound_upload_size_bytes': (
+        'Size of uploaded item photos.',
+        (50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000),
+    ),
+}
+
+
+class Registry:
+    """
+    This process's counters and histograms.
+    Keys are (metric name, ((label, value), ...)).
+    A histogram value is [count per bucket..., count above the last bucket, sum].
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        buckets = HISTOGRAMS[name][1]
+        index = bisect.bisect_left(buckets, value)
+        key = (name, labels)
+        with self.lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+# ---------------- Writing this process's file ----------------
+
+def get_dir():
+    return Path(settings.METRICS_DIR)
+
+
+class ProcessFile:
+    """
+    The file this process writes its totals to: <pid>-<random>.json (the
+    random part keeps a new process that gets an old PID from overwriting
+    the old process's counts).
+    """
+
+    def __init__(self):
+        self.path = None
+        self.pid = None
+        self.flushed_at = 0.0
+        self.lock = threading.Lock()
+
+    def due(self):
+        return time.monotonic() - self.flushed_at >= getattr(settings, 'METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+
+    def flush(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                # First flush, or a forked child (gunicorn --preload): own file
+                self.pid = os.getpid()
+                self.path = get_dir() / f'{self.pid}-{secrets.token_hex(4)}.json'
+            data = registry.snapshot()
+            # Hit/miss totals of this process's caches (counted there already)
+            for cache_name, stats in (('search', search_cache.results.stats()), ('page', page_cache.get_stats())):
+                for result, key in (('hit', 'hits'), ('miss', 'misses')):
+                    data['counters'].append([
+                        'lostfound_cache_lookups_total',
+                        [['cache', cache_name], ['result', result]],
+                        stats[key],
+                    ])
+            data['pid'] = self.pid
+            _write_json(self.path, data)
+            self.flushed_at = time.monotonic()
+
+
+process_file = ProcessFile()
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename it, so readers never see half a file
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as temp_file:
+        json.dump(data, temp_file)
+    os.replace(temp_path, path)
+
+
+@atexit.register
+def _flush_at_exit():
+    if process_file.pid == os.getpid():
+        process_file.flush()
+
+
+# ---------------- Recording ----------------
+
+def view_label(request):
+    """
+    URL name for the labels: names from lostfound/urls.py, 'admin' or 'other'.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'other'
+    if match.namespace == 'admin':
+        return 'admin'
+    return match.url_name or 'other'
+
+
+class QueryObserver:
+    """
+    Counts the queries of one request and their time
+    (installed with connection.execute_wrapper()).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            registry.observe('lostfound_db_query_duration_seconds', elapsed)
+
+
+class MetricsMiddleware:
+    """
+    Time every request and count its database queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryObserver()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = view_label(request)
+        registry.observe(
+            'lostfound_http_request_duration_seconds', elapsed,
+            (('view', view), ('method', request.method), ('status', f'{response.status_code // 100}xx')),
+        )
+        if queries.count:
+            registry.inc('lostfound_db_queries_total', (('view', view),), queries.count)
+            registry.inc('lostfound_db_query_seconds_total', (('view', view),), queries.seconds)
+        if process_file.due():
+            try:
+                process_file.flush()
+            except OSError:
+                # Full disk or missing permissions must not break the site;
+                # the numbers are written on a later request
+                pass
+        return response
+
+
+def observe_upload(size):
+    registry.observe('lostfound_upload_size_bytes', size)
+
+
+# ---------------- Reading all processes (/metrics) ----------------
+
+def _add(totals, data):
+    counters, histograms = totals
+    for name, labels, value in data['counters']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, values in data['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        current = histograms.get(key)
+        if current is None or len(current) != len(values):
+            histograms[key] = list(values)
+        else:
+            histograms[key] = [a + b for a, b in zip(current, values)]
+
+
+def _read(path):
+    try:
+        with open(path) as data_file:
+            return json.load(data_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _archive_dead_processes(directory):
+    """
+    Merge the files of processes that no longer run into archive.json.
+    """
+    archive_path = directory / 'archive.json'
+    with open(directory / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # One process merges at a time
+        dead = []
+        for path in directory.glob('*-*.json'):
+            data = _read(path)
+            if data is not None and not _is_running(data['pid']):
+                dead.append((path, data))
+        if not dead:
+            return
+        totals = ({}, {})
+        archive = _read(archive_path)
+        if archive:
+            _add(totals, archive)
+        for path, data in dead:
+            _add(totals, data)
+        counters, histograms = totals
+        _write_json(archive_path, {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+        })
+        for path, data in dead:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """
+    ({counter key: value}, {histogram key: values}) summed over all processes.
+    """
+    process_file.flush()
+    directory = get_dir()
+    _archive_dead_processes(directory)
+    totals = ({}, {})
+    for path in directory.glob('*.json'):
+        data = _read(path)
+        if data is not None:
+            _add(totals, data)
+    return totals
+
+
+def pending_moderation():
+    """
+    [(kind, campus_id, count), ...] of posts waiting for approval
+    (uses the partial "pending" indexes, so it doesn't scan the tables).
+    """
+    rows = []
+    for kind, model in (('lost', LostItem), ('found', FoundItem)):
+        counts = model.objects.filter(is_approved=False).values('campus_id').annotate(count=Count('id')).order_by()
+        rows.extend((kind, row['campus_id'], row['count']) for row in counts)
+    return rows
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    # Label values are quoted; backslashes, quotes and newlines are escaped
+    escaped = (
+        name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """
+    All metrics in the Prometheus text format.
+    """
+    counters, histograms = collect()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            cumulative += values[len(buckets)]
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(values[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    name = 'lostfound_items_pending_moderation'
+    lines += [f'# HELP {name} Posts waiting for approval.', f'# TYPE {name} gauge']
+    for kind, campus_id, count in pending_moderation():
+        campus = campus_directory.get(campus_id)
+        labels = (('kind', kind), ('campus', campus.slug if campus else str(campus_id)))
+        lines.append(f'{name}{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founditem',
+            name='image_dhash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='founditem',
+            name='image_phash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='lostitem',
+            name='image_dhash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='lostitem',
+            name='image_phash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+    ]
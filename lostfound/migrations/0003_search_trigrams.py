@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:02
+
+import re
+
+from django.db import migrations, models
+
+
+# Trigram GIN indexes for typo-tolerant search on PostgreSQL (see search.py).
+# SQLite uses the SearchTrigram table instead, so there we do nothing.
+TRIGRAM_INDEXES = [
+    ('lostfound_lostitem', 'title'),
+    ('lostfound_lostitem', 'description'),
+    ('lostfound_lostitem', 'location_lost'),
+    ('lostfound_founditem', 'title'),
+    ('lostfound_founditem', 'description'),
+    ('lostfound_founditem', 'location_found'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+# The trigram rules of search.py at the time of this migration (copied, so
+# later changes to search.py don't change what this migration does)
+_WORDS = re.compile(r'[^\W_]+')
+
+
+def _trigrams(text):
+    result = set()
+    for word in _WORDS.findall((text or '').lower()):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+def index_existing_items(apps, schema_editor):
+    """
+    Fill SearchTrigram with the items that are already approved, so search
+    finds them right after upgrading (new changes are indexed from signals).
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    SearchTrigram = apps.get_model('lostfound', 'SearchTrigram')
+    for kind, model_name, location_field in [('lost', 'LostItem', 'location_lost'),
+                                             ('found', 'FoundItem', 'location_found')]:
+        items = (
+            apps.get_model('lostfound', model_name).objects.filter(is_approved=True)
+            .only('pk', 'title', 'description', location_field)
+        )
+        rows = []
+        for item in items.iterator(chunk_size=1000):
+            text = ' '.join([item.title, item.description, getattr(item, location_field)])
+            rows.extend(SearchTrigram(kind=kind, item_id=item.pk, trigram=trigram) for trigram in _trigrams(text))
+            if len(rows) >= 10000:
+                SearchTrigram.objects.bulk_create(rows, batch_size=1000)
+                rows = []
+        SearchTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0002_image_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=5)),
+                ('item_id', models.BigIntegerField()),
+                ('trigram', models.CharField(max_length=3)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'trigram', 'item_id'], name='searchtrigram_lookup_idx'), models.Index(fields=['item_id'], name='searchtrigram_item_idx')],
+            },
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+        migrations.RunPython(index_existing_items, migrations.RunPython.noop),
+    ]
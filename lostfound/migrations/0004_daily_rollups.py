@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0003_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(choices=[('lost', 'Lost'), ('found', 'Found')], max_length=5)),
+                ('category', models.CharField(max_length=50)),
+                ('posted', models.PositiveIntegerField(default=0)),
+                ('recovered', models.PositiveIntegerField(default=0)),
+                ('reopened', models.PositiveIntegerField(default=0)),
+                ('return_time_histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name': 'analytics',
+                'verbose_name_plural': 'analytics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'kind', 'category'), name='unique_daily_rollup'),
+        ),
+    ]
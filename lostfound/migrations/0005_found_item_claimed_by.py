@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lostfound', '0004_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founditem',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_items', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
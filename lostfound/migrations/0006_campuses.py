@@ -0,0 +1,137 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import lostfound.models
+
+
+def create_default_campus(apps, schema_editor):
+    """
+    Existing items and profiles move to the default campus
+    (see set_default_campus below).
+    """
+    Campus = apps.get_model('lostfound', 'Campus')
+    slug = getattr(settings, 'DEFAULT_CAMPUS', 'main')
+    Campus.objects.get_or_create(slug=slug, defaults={'name': slug.replace('-', ' ').title()})
+
+
+def set_default_campus(apps, schema_editor):
+    """
+    Fill the new campus columns of existing rows.
+    Uses the historical Campus model: the field's default
+    (models.default_campus_id) reads the live campus directory and cache,
+    which must not be relied on while migrating.
+    """
+    Campus = apps.get_model('lostfound', 'Campus')
+    campus = Campus.objects.get(slug=getattr(settings, 'DEFAULT_CAMPUS', 'main'))
+    for model_name in ('LostItem', 'FoundItem', 'UserProfile'):
+        model = apps.get_model('lostfound', model_name)
+        model.objects.filter(campus__isnull=True).update(campus=campus)
+
+
+def campus_field(**options):
+    return models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='lostfound.campus', **options)
+
+
+def make_campus_required(model_name, **options):
+    """
+    NOT NULL in the database; the Python-side default is only added to the
+    migration state (so altering the column never calls it).
+    """
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            migrations.AlterField(model_name=model_name, name='campus', field=campus_field(**options)),
+        ],
+        state_operations=[
+            migrations.AlterField(
+                model_name=model_name, name='campus',
+                field=campus_field(default=lostfound.models.default_campus_id, **options),
+            ),
+        ],
+    )
+
+
+def set_trigram_campus(apps, schema_editor):
+    """
+    Existing search rows belong to the default campus too.
+    """
+    Campus = apps.get_model('lostfound', 'Campus')
+    SearchTrigram = apps.get_model('lostfound', 'SearchTrigram')
+    campus = Campus.objects.get(slug=getattr(settings, 'DEFAULT_CAMPUS', 'main'))
+    SearchTrigram.objects.update(campus_id=campus.pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0005_found_item_claimed_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+                ('domain', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'campuses',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(create_default_campus, migrations.RunPython.noop),
+        # Nullable first, filled in, then made required
+        migrations.AddField(
+            model_name='founditem',
+            name='campus',
+            field=campus_field(db_index=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lostitem',
+            name='campus',
+            field=campus_field(db_index=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='campus',
+            field=campus_field(null=True),
+        ),
+        migrations.RunPython(set_default_campus, migrations.RunPython.noop),
+        make_campus_required('founditem', db_index=False),
+        make_campus_required('lostitem', db_index=False),
+        make_campus_required('userprofile'),
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['campus', '-created_at', '-id'], name='founditem_campus_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['campus', 'category', '-created_at', '-id'], name='founditem_campus_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitem',
+            index=models.Index(fields=['campus', '-created_at', '-id'], name='lostitem_campus_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitem',
+            index=models.Index(fields=['campus', 'category', '-created_at', '-id'], name='lostitem_campus_category_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='searchtrigram',
+            name='searchtrigram_lookup_idx',
+        ),
+        migrations.AddField(
+            model_name='searchtrigram',
+            name='campus_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_trigram_campus, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['campus_id', 'kind', 'trigram', 'item_id'], name='searchtrigram_campus_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0006_campuses'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(fields=['created_at'], name='founditem_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitem',
+            index=models.Index(fields=['created_at'], name='lostitem_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('lostfound', '0007_item_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('status_code', models.PositiveSmallIntegerField(default=0)),
+                ('duration_ms', models.FloatField(default=0)),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('query_ms', models.FloatField(default=0)),
+                ('function_calls', models.PositiveIntegerField(default=0)),
+                ('file_name', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
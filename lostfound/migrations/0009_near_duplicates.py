@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0008_request_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='founditem',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lostfound.founditem'),
+        ),
+        migrations.AddField(
+            model_name='lostitem',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lostfound.lostitem'),
+        ),
+        migrations.CreateModel(
+            name='MinHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=5)),
+                ('campus_id', models.IntegerField()),
+                ('band', models.BigIntegerField()),
+                ('item_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campus_id', 'kind', 'band', 'created_at'], name='minhashband_lookup_idx'), models.Index(fields=['item_id'], name='minhashband_item_idx'), models.Index(fields=['created_at'], name='minhashband_created_idx')],
+            },
+        ),
+    ]
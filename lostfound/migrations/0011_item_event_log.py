@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0010_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('kind', models.CharField(max_length=5)),
+                ('item_id', models.BigIntegerField()),
+                ('campus_id', models.IntegerField()),
+                ('event', models.CharField(choices=[('created', 'Created'), ('approved', 'Approved'), ('unapproved', 'Unapproved'), ('status', 'Status changed'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('data', models.JSONField(default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'item_id'], name='itemevent_item_idx'), models.Index(fields=['created_at'], name='itemevent_created_idx')],
+            },
+        ),
+    ]
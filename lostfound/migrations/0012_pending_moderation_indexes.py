@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0011_item_event_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='founditem',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['campus'], name='founditem_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitem',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['campus'], name='lostitem_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lostfound', '0013_invitations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventcheckpoint',
+            name='gaps',
+            field=models.JSONField(default=list),
+        ),
+    ]
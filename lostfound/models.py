@@ -11,6 +11,40 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+class Campus(models.Model):
+    """
+    One campus (tenant). A single deployment serves several campuses; every
+    item and profile belongs to exactly one of them (see campus.py).
+    """
+    
+    name = models.CharField(max_length=100)
+    # Shown in the page header (e.g. "North Campus")
+    
+    slug = models.SlugField(max_length=50, unique=True)
+    # Used in URLs: /c/north/lost-items/
+    
+    domain = models.CharField(max_length=255, blank=True, default='')
+    # Optional own host name (e.g. "lostfound.north.example.edu")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = 'campuses'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+def default_campus_id():
+    """
+    Campus used when none is given (settings.DEFAULT_CAMPUS).
+    Looked up in the per-process campus directory, not the database.
+    """
+    from .campus import directory
+    return directory.get_default().pk
+
+
 class UserProfile(models.Model):
     """
     Extended user information for students.
@@ -20,6 +54,9 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     # OneToOneField means: One User = One UserProfile (like a passport)
     
+    campus = models.ForeignKey(Campus, on_delete=models.PROTECT, default=default_campus_id)
+    # The campus the student registered on
+    
     phone = models.CharField(max_length=15, blank=True)
     # CharField = text field, max_length = maximum characters allowed
     # blank=True means this field is optional
@@ -64,6 +101,13 @@ class LostItem(models.Model):
     # Many LostItems can belong to one User
     # on_delete=models.CASCADE means: if user is deleted, delete their posts too
     
+    campus = models.ForeignKey(
+        Campus, on_delete=models.PROTECT, default=default_campus_id, db_index=False
+    )
+    # Which campus the item belongs to. Every page only shows the items of
+    # the campus being visited. (No separate index: the indexes in Meta
+    # below all start with campus.)
+    
     title = models.CharField(max_length=200)
     # Title of the lost item (e.g., "Lost iPhone 12")
     
@@ -85,6 +129,11 @@ class LostItem(models.Model):
     # upload_to='lost_items/' means: save images in media/lost_items/ folder
     # blank=True, null=True means: image is optional
     
+    image_dhash = models.CharField(max_length=16, blank=True, default='', db_index=True, editable=False)
+    image_phash = models.CharField(max_length=16, blank=True, default='', editable=False)
+    # Perceptual hashes of the image (filled automatically, see image_hashing.py)
+    # Used to find duplicate posts and items with similar-looking photos
+    
     contact_info = models.CharField(max_length=200)
     # How to contact the person (phone, email, etc.)
     
@@ -94,12 +143,37 @@ class LostItem(models.Model):
     is_approved = models.BooleanField(default=False)
     # Admin must approve posts before they appear (prevents spam)
     
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    # Set when the post was submitted with (nearly) the same text as an
+    # earlier post (see duplicates.py), so moderators can reject it quickly
+    
     created_at = models.DateTimeField(auto_now_add=True)
     # When the post was created
     
     updated_at = models.DateTimeField(auto_now=True)
     # auto_now=True means: automatically update when object is modified
     
+    class Meta:
+        indexes = [
+            # Campus first, so each campus's rows sit together in the index
+            # and a query's cost depends on that campus's size, not the total.
+            # List pages (newest first, optionally per category) read the
+            # index in order and stop after one page. (is_approved is left
+            # out: almost every item is approved, so it's checked per row.)
+            models.Index(fields=['campus', '-created_at', '-id'],
+                         name='lostitem_campus_recent_idx'),
+            models.Index(fields=['campus', 'category', '-created_at', '-id'],
+                         name='lostitem_campus_category_idx'),
+            # First/last date for the admin's date links (see changelist.py)
+            models.Index(fields=['created_at'], name='lostitem_created_idx'),
+            # Posts waiting for approval (moderation queue, /metrics); only
+            # unapproved rows are in it, so it stays small
+            models.Index(fields=['campus'], condition=models.Q(is_approved=False),
+                         name='lostitem_pending_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.posted_by.username}"
 
@@ -128,6 +202,10 @@ class FoundItem(models.Model):
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE)
     # Who found the item
     
+    campus = models.ForeignKey(
+        Campus, on_delete=models.PROTECT, default=default_campus_id, db_index=False
+    )
+    
     title = models.CharField(max_length=200)
     # Title (e.g., "Found Black Wallet")
     
@@ -145,17 +223,341 @@ class FoundItem(models.Model):
     image = models.ImageField(upload_to='found_items/', blank=True, null=True)
     # Image of the found item
     
+    image_dhash = models.CharField(max_length=16, blank=True, default='', db_index=True, editable=False)
+    image_phash = models.CharField(max_length=16, blank=True, default='', editable=False)
+    # Perceptual hashes of the image (filled automatically, see image_hashing.py)
+    # Used to find duplicate posts and items with similar-looking photos
+    
     contact_info = models.CharField(max_length=200)
     # How to contact the finder
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
+    claimed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_items'
+    )
+    # Who claimed the item (set by the claim workflow, see workflow.py)
+    
     is_approved = models.BooleanField(default=False)
     # Admin approval required
     
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    # Earlier post with (nearly) the same text (see duplicates.py)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Same as LostItem (campus first)
+            models.Index(fields=['campus', '-created_at', '-id'],
+                         name='founditem_campus_recent_idx'),
+            models.Index(fields=['campus', 'category', '-created_at', '-id'],
+                         name='founditem_campus_category_idx'),
+            models.Index(fields=['created_at'], name='founditem_created_idx'),
+            # Posts waiting for approval (moderation queue, /metrics); only
+            # unapproved rows are in it, so it stays small
+            models.Index(fields=['campus'], condition=models.Q(is_approved=False),
+                         name='founditem_pending_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.posted_by.username}"
 
+
+
+class SearchTrigram(models.Model):
+    """
+    Search index used on SQLite (see search.py).
+    One row = "this 3-letter piece appears in this approved item".
+    PostgreSQL doesn't need this table; it uses the pg_trgm extension instead.
+    """
+    
+    kind = models.CharField(max_length=5)
+    # 'lost' or 'found'
+    
+    item_id = models.BigIntegerField()
+    # ID of the LostItem / FoundItem
+    
+    trigram = models.CharField(max_length=3)
+    # Three characters, e.g. "wal"
+    
+    campus_id = models.IntegerField(default=0)
+    # Campus of the item (searches only look at one campus)
+    
+    class Meta:
+        indexes = [
+            # Finding items by trigram (the search itself), within one campus
+            models.Index(fields=['campus_id', 'kind', 'trigram', 'item_id'],
+                         name='searchtrigram_campus_idx'),
+            # Removing the rows of one item when it changes.
+            # (Deliberately without 'kind': an index starting with 'kind' tempts
+            # SQLite into using it for searches instead of the lookup index.)
+            models.Index(fields=['item_id'], name='searchtrigram_item_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigram!r} in {self.kind} item {self.item_id}"
+
+
+class MinHashBand(models.Model):
+    """
+    Near-duplicate index of recently submitted posts (see duplicates.py).
+    One row = "this post's MinHash signature has this band".
+    Posts with a band in common are candidates for being the same text.
+    """
+    
+    kind = models.CharField(max_length=5)
+    # 'lost' or 'found'
+    
+    campus_id = models.IntegerField()
+    # Posts are only compared with posts of the same campus
+    
+    band = models.BigIntegerField()
+    # Hash of one band (a few consecutive MinHash values) and its number
+    
+    item_id = models.BigIntegerField()
+    # ID of the LostItem / FoundItem
+    
+    created_at = models.DateTimeField()
+    # When the post was submitted (older rows are ignored, then pruned)
+    
+    class Meta:
+        indexes = [
+            # Finding posts that share a band with a new post
+            models.Index(fields=['campus_id', 'kind', 'band', 'created_at'],
+                         name='minhashband_lookup_idx'),
+            # Removing the rows of a deleted item, and pruning old rows
+            models.Index(fields=['item_id'], name='minhashband_item_idx'),
+            models.Index(fields=['created_at'], name='minhashband_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"band {self.band} of {self.kind} item {self.item_id}"
+
+
+class DailyRollup(models.Model):
+    """
+    Statistics for one day, item kind and category (see analytics.py).
+    Updated a little every time an item is posted or changes status, so the
+    analytics page never has to scan the LostItem / FoundItem tables.
+    """
+    
+    KIND_CHOICES = [
+        ('lost', 'Lost'),
+        ('found', 'Found'),
+    ]
+    
+    date = models.DateField()
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    category = models.CharField(max_length=50)
+    
+    posted = models.PositiveIntegerField(default=0)
+    # Items posted on this day
+    
+    recovered = models.PositiveIntegerField(default=0)
+    # Items that reached found/claimed/returned on this day
+    
+    reopened = models.PositiveIntegerField(default=0)
+    # Items moved back from found/claimed/returned to pending on this day
+    
+    return_time_histogram = models.JSONField(default=list)
+    # How long recovered items took, counted per time bucket
+    # (bucket limits are in analytics.RETURN_TIME_BUCKETS)
+    
+    class Meta:
+        verbose_name = 'analytics'
+        verbose_name_plural = 'analytics'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'kind', 'category'], name='unique_daily_rollup'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.kind} {self.category}"
+
+
+class ItemEvent(models.Model):
+    """
+    Append-only log of item changes (see events.py). The ID is the event's
+    position in the log: consumers remember the last ID they handled.
+    """
+    
+    EVENT_CHOICES = [
+        ('created', 'Created'),
+        ('approved', 'Approved'),
+        ('unapproved', 'Unapproved'),
+        ('status', 'Status changed'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    kind = models.CharField(max_length=5)
+    # 'lost' or 'found'
+    item_id = models.BigIntegerField()
+    campus_id = models.IntegerField()
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    
+    data = models.JSONField(default=dict)
+    # The item's category, status and approval after the change, plus what
+    # it was before for changes (e.g. {"old_status": "pending"})
+    
+    class Meta:
+        indexes = [
+            # Compaction: the events of one item
+            models.Index(fields=['kind', 'item_id'], name='itemevent_item_idx'),
+            # Replaying from a date
+            models.Index(fields=['created_at'], name='itemevent_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.event} {self.kind} item {self.item_id}"
+
+
+class EventCheckpoint(models.Model):
+    """
+    How far one consumer of the item event log has got (see events.py).
+    """
+    
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    # ID of the last event the consumer handled (0 = none yet)
+    gaps = models.JSONField(default=list)
+    # Missing IDs below the position, still waited for (see events.read())
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} at #{self.position}"
+
+
+class Notification(models.Model):
+    """
+    Outbox of emails to send (see notifications.py).
+    Rows are written in the same transaction as the change they are about
+    (post approved, possible match, item claimed); the send_notifications
+    worker emails them later, several per user in one digest.
+    """
+    
+    EVENT_CHOICES = [
+        ('approved', 'Post approved'),
+        ('matched', 'Possible match'),
+        ('claimed', 'Item claimed'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Waiting to be sent'),
+        ('sent', 'Sent'),
+        ('skipped', 'Skipped (no email address)'),
+        ('failed', 'Failed'),
+    ]
+    
+    key = models.CharField(max_length=100, unique=True)
+    # Identifies the event, e.g. "approved:lost:42", so the same event is
+    # never queued (and emailed) twice
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    
+    item_kind = models.CharField(max_length=5)
+    item_id = models.BigIntegerField()
+    campus_id = models.IntegerField()
+    title = models.CharField(max_length=200)
+    # The item the email links to, and its title at the time of the event
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Failed sends are retried later, waiting longer after each failure
+    
+    locked_until = models.DateTimeField(null=True, blank=True)
+    lock_token = models.CharField(max_length=32, blank=True, default='')
+    # Set by the worker sending the row, so two workers never send the same row
+    
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "what is due?" query
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_display()} for {self.user_id}: {self.title}"
+
+
+class RequestProfile(models.Model):
+    """
+    One request profiled on demand by a staff member (see profiling.py).
+    The timings per function are in a .prof file in settings.PROFILES_ROOT;
+    this row only keeps the summary shown in the admin list.
+    """
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    
+    duration_ms = models.FloatField(default=0)
+    # Wall-clock time of the view and template rendering (with profiling on)
+    
+    query_count = models.PositiveIntegerField(default=0)
+    query_ms = models.FloatField(default=0)
+    function_calls = models.PositiveIntegerField(default=0)
+    
+    file_name = models.CharField(max_length=100)
+    # The .prof file in settings.PROFILES_ROOT
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class Invitation(models.Model):
+    """
+    Invitation email for a student account created from a roster (see
+    roster.py). The account has no usable password until the student opens
+    the link in the email and chooses one. The link's token isn't stored:
+    it is computed from this row and the user's password field, so it stops
+    working as soon as a password is set.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Waiting to be sent'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='invitation')
+    campus = models.ForeignKey(Campus, on_delete=models.PROTECT, related_name='+')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    
+    # Sending works like the notification outbox (see notifications.py)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    lock_token = models.CharField(max_length=32, blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "what is due?" query
+            models.Index(fields=['status', 'next_attempt_at'], name='invitation_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Invitation for {self.user_id} ({self.get_status_display()})"
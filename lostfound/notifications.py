@@ -0,0 +1,252 @@
+"""
+Email notifications for posters, sent through an outbox.
+
+Posters are told when their post is approved, when a found item looks
+like their lost item (similar photo, see image_hashing.py) and when
+someone claims an item they found.
+
+Sending an email from a view would keep the web worker waiting for the
+mail server (seconds, or a timeout if it is down). Instead:
+
+1. The code making the change writes a Notification row in the SAME
+   database transaction (the "transactional outbox"). If the change is
+   rolled back, so is the notification; if it is committed, the
+   notification will be sent.
+
+2. `python manage.py send_notifications --loop` (a separate worker
+   process) picks up due rows in batches, groups them per user into one
+   digest email, and sends all emails of the batch over one reused SMTP
+   connection.
+
+Delivery is idempotent:
+- Every event has a unique key ("approved:lost:42"), so queuing the same
+  event twice (e.g. an item approved, unapproved and approved again)
+  only creates one row.
+- A worker first "leases" the rows it will send (locked_until +
+  lock_token in one UPDATE), so two workers never send the same row; a
+  crashed worker's lease just runs out and the rows are picked up again.
+- Sent rows are marked `sent` right after the mail server accepted them.
+
+Failed emails are retried with exponential backoff
+(NOTIFICATION_RETRY_SECONDS, then twice as long each time, with some
+randomness) until NOTIFICATION_MAX_ATTEMPTS, then marked `failed`.
+
+The worker uses Django's configured EMAIL_BACKEND, so it works the same
+with the console backend (prints emails) and the locmem backend (keeps
+them in django.core.mail.outbox, handy for tests).
+"""
+
+import hashlib
+import random
+import uuid
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .campus import campus_url, directory, site_path
+from .image_hashing import find_similar_items
+from .models import Notification
+
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_SECONDS = 60
+DEFAULT_LEASE_SECONDS = 300
+MAX_RETRY_SECONDS = 6 * 60 * 60
+
+DETAIL_VIEWS = {'lost': 'lost_item_detail', 'found': 'found_item_detail'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---------------- Queuing (called next to the item change) ----------------
+
+def notification(key, user_id, event, kind, item):
+    """
+    An unsaved Notification about `item` (a LostItem or FoundItem).
+    """
+    return Notification(
+        key=key[:100], user_id=user_id, event=event, item_kind=kind,
+        item_id=item.pk, campus_id=item.campus_id, title=item.title[:200],
+    )
+
+
+def queue(notifications):
+    """
+    Save notifications, ignoring ones whose event key is already queued.
+    Call this inside the transaction that makes the change.
+    """
+    if notifications:
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+
+
+def item_approved(kind, item):
+    """
+    The post is live: tell its owner, and tell the owners of lost items
+    whose photo looks like this one (or, for a lost item, its owner about
+    similar found items).
+    """
+    notifications = [notification(f'approved:{kind}:{item.pk}', item.posted_by_id, 'approved', kind, item)]
+    for distance, other_kind, other in find_similar_items(item):
+        if kind == 'found' and other_kind == 'lost':
+            # Tell the loser about the found item
+            notifications.append(notification(
+                f'matched:{other.pk}:found:{item.pk}', other.posted_by_id, 'matched', 'found', item,
+            ))
+        elif kind == 'lost' and other_kind == 'found':
+            notifications.append(notification(
+                f'matched:{item.pk}:found:{other.pk}', item.posted_by_id, 'matched', 'found', other,
+            ))
+    queue(notifications)
+
+
+def item_claimed(item):
+    """
+    Someone claimed a found item: tell the finder.
+    (updated_at is part of the key, so a new claim after a cancelled one
+    is a new event.)
+    """
+    queue([notification(
+        f'claimed:{item.pk}:{item.claimed_by_id}:{item.updated_at.timestamp():.0f}',
+        item.posted_by_id, 'claimed', 'found', item,
+    )])
+
+
+# ---------------- Delivering (the send_notifications worker) ----------------
+
+class DeliveryResult:
+    """
+    What one call of deliver_batch() did.
+    """
+
+    def __init__(self):
+        self.emails = 0         # Digest emails sent
+        self.notifications = 0  # Rows marked sent
+        self.failed = 0         # Rows that failed this time (retried later or given up)
+        self.skipped = 0        # Rows of users without an email address
+
+    @property
+    def total(self):
+        return self.notifications + self.failed + self.skipped
+
+
+def lease_batch(batch_size, now=None, model=Notification):
+    """
+    Lease up to `batch_size` due notifications for this worker and return
+    them (with their users). Rows leased by another worker are left alone.
+    `model` can be another outbox model with the same fields (Invitation).
+    """
+    now = now or timezone.now()
+    not_leased = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    due = model.objects.filter(not_leased, status='pending', next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    lease_until = now + timedelta(seconds=_setting('NOTIFICATION_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+    # Conditional UPDATE: rows another worker leased in the meantime no
+    # longer match `due` and are not taken
+    due.filter(pk__in=ids).update(locked_until=lease_until, lock_token=token)
+    return list(model.objects.filter(lock_token=token).select_related('user').order_by('created_at'))
+
+
+def item_url(notification):
+    campus = directory.get(notification.campus_id) or directory.get_default()
+    return campus_url(campus, site_path(DETAIL_VIEWS[notification.item_kind], [notification.item_id]))
+
+
+def build_email(user, notifications):
+    """
+    One email for all of a user's notifications in the batch.
+    """
+    if len(notifications) == 1:
+        subject = f'Lost & Found: {notifications[0].get_event_display()}'
+    else:
+        subject = f'Lost & Found: {len(notifications)} updates on your posts'
+    body = render_to_string('lostfound/emails/notifications.txt', {
+        'user': user,
+        'notifications': [(note, item_url(note)) for note in notifications],
+        'site_url': settings.SITE_URL,
+    })
+    # The same notifications always get the same Message-ID, so if a retry
+    # repeats an email the mail server already accepted, mail clients can
+    # recognise it as the same message
+    digest = hashlib.sha1(','.join(str(note.pk) for note in notifications).encode()).hexdigest()[:20]
+    domain = urlsplit(settings.SITE_URL).hostname or 'localhost'
+    return EmailMessage(
+        subject, body, settings.DEFAULT_FROM_EMAIL, [user.email],
+        headers={'Message-ID': f'<notifications.{digest}@{domain}>'},
+    )
+
+
+def _retry_delay(attempts):
+    delay = _setting('NOTIFICATION_RETRY_SECONDS', DEFAULT_RETRY_SECONDS) * 2 ** (attempts - 1)
+    # Up to 20% randomness, so emails that failed together aren't all retried together
+    return min(delay, MAX_RETRY_SECONDS) * random.uniform(0.8, 1.2)
+
+
+def mark_failed(notifications, error, now):
+    """
+    Retry the leased rows later (or give up after NOTIFICATION_MAX_ATTEMPTS).
+    """
+    max_attempts = _setting('NOTIFICATION_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    for note in notifications:
+        attempts = note.attempts + 1
+        type(note).objects.filter(pk=note.pk, lock_token=note.lock_token).update(
+            attempts=attempts,
+            status='failed' if attempts >= max_attempts else 'pending',
+            next_attempt_at=now + timedelta(seconds=_retry_delay(attempts)),
+            locked_until=None,
+            last_error=f'{type(error).__name__}: {error}'[:1000],
+        )
+
+
+def deliver_batch(batch_size=None, connection=None):
+    """
+    Send one batch of due notifications. Returns a DeliveryResult
+    (result.total == 0 means nothing was due).
+    """
+    result = DeliveryResult()
+    notifications = lease_batch(batch_size or _setting('NOTIFICATION_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    if not notifications:
+        return result
+
+    by_user = {}
+    for note in notifications:
+        by_user.setdefault(note.user, []).append(note)
+
+    connection = connection or get_connection()
+    try:
+        for user, user_notifications in by_user.items():
+            ids = [note.pk for note in user_notifications]
+            now = timezone.now()
+            if not user.email:
+                Notification.objects.filter(pk__in=ids).update(status='skipped', locked_until=None)
+                result.skipped += len(ids)
+                continue
+            try:
+                # Opens the connection the first time (and again after an
+                # error closed it); it is then reused for the next emails
+                connection.open()
+                connection.send_messages([build_email(user, user_notifications)])
+            except Exception as error:  # SMTP errors, refused addresses, timeouts...
+                mark_failed(user_notifications, error, now)
+                result.failed += len(ids)
+                connection.close()
+                continue
+            Notification.objects.filter(pk__in=ids).update(
+                status='sent', sent_at=now, attempts=F('attempts') + 1, locked_until=None,
+            )
+            result.emails += 1
+            result.notifications += len(ids)
+    finally:
+        connection.close()
+    return result
@@ -0,0 +1,177 @@
+"""
+Full-page cache for anonymous visitors.
+
+Most visitors browse the home, list and detail pages without logging in,
+and they all see exactly the same HTML. So for them we keep the finished
+page in the cache and send it again without running the view or template.
+
+    key = page path + sorted query string + generation of the page's group
+
+Bypass (the page is built normally and not stored) when:
+- the request isn't GET/HEAD,
+- the browser has a session cookie (logged in, or has a session) or a
+  messages cookie (a "Your item was posted" message must be shown),
+- the response isn't a plain 200, sets cookies or contains a CSRF token.
+
+Purging: every page belongs to a GROUP, e.g. 'list:lost' for the lost
+items list (every query/page of it) or 'detail:found:42' for one item.
+Groups are per campus (the campus ID is put in front: '3:list:lost'), so
+a change on one campus never purges another campus's pages.
+Each group has a generation value in the cache, part of its pages' keys;
+item_changed() gives the groups showing that item (its detail page, its
+list, the home page) a new random value, so only those pages are rebuilt.
+(A counter would not do: if the cache evicts it, it starts again at 1 and
+pages cached under 1 earlier would be served again.) Pages also expire after
+settings.PAGE_CACHE_SECONDS, which bounds staleness for things we don't
+track (e.g. the "similar photos" box on other items' pages).
+
+Each response gets an X-Page-Cache header (HIT, MISS or BYPASS); hit
+counts of this process are shown at /page-cache-stats/ (staff only).
+"""
+
+import hashlib
+import secrets
+import threading
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+DEFAULT_TIMEOUT = 300
+
+
+class Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.lock = threading.Lock()
+
+    def count(self, outcome):
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+stats = Stats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(group):
+    return f'page_cache:gen:{group}'
+
+
+def _new_generation():
+    return secrets.token_hex(8)  # Same as search_cache._new_generation()
+
+
+def purge(*groups):
+    """
+    Make every cached page of these groups stale.
+    """
+    cache = get_cache()
+    cache.set_many({_generation_key(group): _new_generation() for group in groups}, timeout=None)
+
+
+def _campus_group(campus_id, group):
+    return f'{campus_id}:{group}'
+
+
+def item_changed(campus_id, kind, item_id):
+    """
+    Called when a visible item changes (approved, edited, status changed,
+    unapproved or deleted): purge the pages of its campus that show it.
+    """
+    purge(*(_campus_group(campus_id, group)
+            for group in ('home', f'list:{kind}', f'detail:{kind}:{item_id}')))
+
+
+def items_changed(campus_id, kind):
+    """
+    Many new items of one kind at once (bulk import): purge the pages
+    listing them (detail pages of new items weren't cached yet).
+    """
+    purge(_campus_group(campus_id, 'home'), _campus_group(campus_id, f'list:{kind}'))
+
+
+def should_bypass(request):
+    if request.method not in ('GET', 'HEAD'):
+        return True
+    cookies = request.COOKIES
+    return settings.SESSION_COOKIE_NAME in cookies or 'messages' in cookies
+
+
+def normalized_query(request):
+    """
+    "?page=2&q=" and "?q=&page=2" are the same page: drop empty values
+    and sort the parameters.
+    """
+    params = sorted((k, v) for k, v in parse_qsl(request.META.get('QUERY_STRING', '')) if v)
+    return urlencode(params)
+
+
+def _page_key(request, group, generation):
+    raw = f'{request.path}?{normalized_query(request)}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'page_cache:page:{group}:{generation}:{digest}'
+
+
+def cache_anonymous_page(group):
+    """
+    View decorator. `group` is the purge group name, or a function
+    (request, *args, **kwargs) -> name, e.g. for detail pages:
+        @cache_anonymous_page(lambda request, pk: f'detail:lost:{pk}')
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if should_bypass(request):
+                stats.count('bypasses')
+                response = view_func(request, *args, **kwargs)
+                response['X-Page-Cache'] = 'BYPASS'
+                return response
+
+            cache = get_cache()
+            group_name = group(request, *args, **kwargs) if callable(group) else group
+            group_name = _campus_group(request.campus.pk, group_name)
+            generation = cache.get_or_set(_generation_key(group_name), _new_generation, timeout=None)
+            key = _page_key(request, group_name, generation)
+
+            cached = cache.get(key)
+            if cached is not None:
+                stats.count('hits')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            stats.count('misses')
+            response = view_func(request, *args, **kwargs)
+            # Pages with a CSRF token or cookies are personal: don't share them
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+                timeout = getattr(settings, 'PAGE_CACHE_SECONDS', DEFAULT_TIMEOUT)
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def get_stats():
+    return stats.as_dict()
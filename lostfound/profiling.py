@@ -0,0 +1,235 @@
+"""
+On-demand profiling of single requests, for staff.
+
+When a page is slow in production, a staff member opens it again with
+`?_profile=1` added to the address (or sends the header `X-Profile: 1`).
+ProfilingMiddleware then runs that one request under cProfile, which
+records every Python function call made by the view and the template
+rendering, plus the number and time of the database queries.
+
+The result is written to a .prof file in settings.PROFILES_ROOT and listed
+in the admin panel under "Request profiles", with a flame graph (which
+calls took the time) and a table of the slowest functions. The .prof file
+can also be downloaded and opened with tools like snakeviz.
+
+Requests without the flag or header pay for one string search and one
+dictionary lookup: the user isn't even loaded, nothing is imported and
+no profiler is created. Only the newest settings.PROFILE_KEEP profiles are
+kept.
+"""
+
+import cProfile
+import pstats
+import secrets
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+
+PROFILE_FLAG = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'  # How Django spells the X-Profile header
+
+DEFAULT_KEEP = 100
+
+# The flame graph leaves out calls that took less than this share of the request
+FLAME_MIN_FRACTION = 0.005
+FLAME_MAX_BOXES = 600
+
+
+class QueryTimer:
+    """
+    Counts the database queries of the profiled request and their time
+    (installed with connection.execute_wrapper()).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests from staff that ask for it (must come after
+    AuthenticationMiddleware).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_FLAG not in request.META.get('QUERY_STRING', '') and PROFILE_HEADER not in request.META:
+            return self.get_response(request)
+        if not request.user.is_staff:
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        queries = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+
+        record = save_profile(request, response, profiler, duration, queries)
+        response['X-Profile-Id'] = str(record.pk)
+        response['X-Profile-Url'] = reverse('admin:lostfound_requestprofile_change', args=[record.pk])
+        return response
+
+
+def profiles_root():
+    return Path(settings.PROFILES_ROOT)
+
+
+def save_profile(request, response, profiler, duration, queries):
+    """
+    Write the profile to disk, record it for the admin panel and remove
+    the oldest profiles beyond settings.PROFILE_KEEP.
+    """
+    from .models import RequestProfile
+
+    root = profiles_root()
+    root.mkdir(parents=True, exist_ok=True)
+    file_name = f'{timezone.now():%Y%m%d-%H%M%S}-{secrets.token_hex(4)}.prof'
+    profiler.dump_stats(root / file_name)
+
+    record = RequestProfile.objects.create(
+        user=request.user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=queries.count,
+        query_ms=queries.seconds * 1000,
+        function_calls=pstats.Stats(profiler).total_calls,
+        file_name=file_name,
+    )
+
+    keep = getattr(settings, 'PROFILE_KEEP', DEFAULT_KEEP)
+    old_ids = list(RequestProfile.objects.values_list('pk', flat=True)[keep:])
+    if old_ids:
+        # Their files are removed by a post_delete signal (see signals.py)
+        RequestProfile.objects.filter(pk__in=old_ids).delete()
+    return record
+
+
+def load_stats(record):
+    """
+    The pstats.Stats of a saved profile, or None if its file is gone.
+    """
+    path = profiles_root() / record.file_name
+    if not path.exists():
+        return None
+    return pstats.Stats(str(path))
+
+
+def function_label(func):
+    """
+    ('/path/to/views.py', 12, 'home') -> ('home', 'lostfound/views.py:12').
+    """
+    file_name, line, name = func
+    if file_name == '~':
+        # Built-in functions, e.g. "<method 'join' of 'str' objects>"
+        return name, ''
+    parts = Path(file_name).parts
+    # Shorten to the package path ("django/db/models/query.py")
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            parts = parts[parts.index(marker) + 1:]
+            break
+    else:
+        base = Path(settings.BASE_DIR).parts
+        if parts[:len(base)] == base:
+            parts = parts[len(base):]
+        else:
+            parts = parts[-2:]
+    return name, f"{'/'.join(parts)}:{line}"
+
+
+def top_functions(stats, sort='tottime', limit=30):
+    """
+    The `limit` functions that took the most time, for a table:
+    own time (tottime) or time including the functions they call (cumtime).
+    """
+    index = {'tottime': 2, 'cumtime': 3}[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+    result = []
+    for func, (primitive_calls, calls, own, cumulative, callers) in rows:
+        name, where = function_label(func)
+        result.append({
+            'name': name,
+            'where': where,
+            'calls': calls if calls == primitive_calls else f'{calls}/{primitive_calls}',
+            'own_ms': own * 1000,
+            'cumulative_ms': cumulative * 1000,
+        })
+    return result
+
+
+def flame_graph(stats):
+    """
+    Boxes for a flame graph (drawn top-down, like an icicle chart).
+
+    cProfile doesn't keep whole call stacks, only "who called whom and how
+    long it took", so the graph is rebuilt from those caller -> callee
+    times starting at the request. Each box's width is its share of the
+    request's time; boxes under FLAME_MIN_FRACTION are left out.
+    """
+    callees = defaultdict(list)
+    roots = []
+    for func, (primitive_calls, calls, own, cumulative, callers) in stats.stats.items():
+        if not callers:
+            roots.append((func, cumulative))
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    for children in callees.values():
+        children.sort(key=lambda child: child[1], reverse=True)
+
+    total = sum(seconds for func, seconds in roots)
+    if not total:
+        return [], 0
+
+    boxes = []
+    # Depth-first, so a box's children come right after it
+    stack = [(func, seconds, 0, 0.0, seconds / total, frozenset([func]))
+             for func, seconds in reversed(roots)]
+    while stack and len(boxes) < FLAME_MAX_BOXES:
+        func, seconds, depth, left, width, path = stack.pop()
+        if width < FLAME_MIN_FRACTION:
+            continue
+        name, where = function_label(func)
+        boxes.append({
+            'name': name,
+            'where': where,
+            'ms': seconds * 1000,
+            'depth': depth,
+            'left': left * 100,
+            'width': width * 100,
+        })
+
+        children = [(child, child_seconds) for child, child_seconds in callees[func] if child not in path]
+        child_total = sum(child_seconds for child, child_seconds in children)
+        # Recursion and shared callees can add up to more than the parent;
+        # squeeze them into the parent's box then
+        scale = width / (child_total / total) if child_total / total > width else 1.0
+        child_left = left
+        child_boxes = []
+        for child, child_seconds in children:
+            child_width = child_seconds / total * scale
+            child_boxes.append((child, child_seconds, depth + 1, child_left, child_width, path | {child}))
+            child_left += child_width
+        stack.extend(reversed(child_boxes))
+    return boxes, total * 1000
@@ -0,0 +1,69 @@
+"""
+Offline support: the site as a progressive web app (PWA).
+
+Students on flaky campus Wi-Fi kept reloading the list pages. The browser
+side lives in static/:
+- manifest.webmanifest: name, icons and colours, so the site can be
+  "installed" to the home screen.
+- js/service-worker.js: a script the browser runs next to the pages that
+  sees every request they make:
+  * The shell (the /offline/ page, built from base.html) and the CSS and
+    JavaScript files are stored when the worker is installed. Static
+    files are then served from that store (their names contain a hash of
+    their content, so a stored file never goes stale).
+  * The home, list and detail pages a student opened are kept too
+    (the newest MAX_PAGES). Opening one again shows the kept copy at once
+    and fetches a fresh copy for next time ("stale-while-revalidate").
+    Without a connection, a page that wasn't kept shows the shell.
+  * A lost/found post submitted without a connection is saved in the
+    browser (IndexedDB) and sent when the connection is back (Background
+    Sync; browsers without it send the posts when a page of the site is
+    opened online). Posts sent twice (the first try reached the server
+    but the answer didn't come back) are flagged by duplicates.py.
+- js/pwa.js: registers the worker and shows its banners.
+
+This module holds the server side:
+- add_static_headers() (settings.WHITENOISE_ADD_HEADERS_FUNCTION): a
+  worker may only control the pages under the folder it is served from.
+  /static/js/service-worker.js must control the whole site, which the
+  Service-Worker-Allowed header allows.
+- NoStoreMessagesMiddleware: a page showing a message ("Your item was
+  posted") must not be kept, or the message would be shown again every
+  time the kept copy is. Such pages get Cache-Control: no-store, which
+  the worker respects.
+"""
+
+import posixpath
+
+from django.utils.cache import patch_cache_control
+
+
+SERVICE_WORKER = 'service-worker.'
+
+
+def add_static_headers(headers, path, url):
+    """
+    Extra headers for static files served by WhiteNoise.
+    `url` is the file's URL, with the content hash after collectstatic
+    (e.g. /static/js/service-worker.3f2a9c8e1b7d.js).
+    """
+    name = posixpath.basename(url or '')
+    if name.startswith(SERVICE_WORKER) and name.endswith('.js'):
+        headers['Service-Worker-Allowed'] = '/'
+
+
+class NoStoreMessagesMiddleware:
+    """
+    Mark responses that showed flash messages as not cacheable.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # The messages storage sets `used` once a template loops over it
+        storage = getattr(request, '_messages', None)
+        if storage is not None and storage.used:
+            patch_cache_control(response, no_store=True)
+        return response
@@ -0,0 +1,249 @@
+"""
+Rate limiting for expensive endpoints (posting items, login, search).
+
+Each (endpoint, user or IP) pair gets a "token bucket":
+- The bucket holds at most `limit` tokens and starts full.
+- Every request takes one token.
+- Tokens come back at a steady speed (`limit` tokens per `period`).
+- When the bucket is empty, the request is rejected with HTTP 429
+  BEFORE the view runs (no form parsing, no password hashing, no queries).
+
+Buckets are stored in the configured Django cache (settings.RATELIMIT_CACHE),
+so all workers share them when the cache is shared (e.g. Redis/Memcached).
+If the cache is unavailable, we fall back to a per-process dictionary.
+
+Taking a token is "read the bucket, change it, write it back". Two workers
+doing that at the same moment would both read the same bucket and both
+let their request through, so a burst could go well over the limit. Each
+bucket is therefore locked while it is updated:
+- Redis/Memcached/local memory: a lock entry created with cache.add(),
+  which only one worker can win.
+- FileBasedCache (the default without REDIS_URL): its add() and incr()
+  are a read and a write too, so a lock file is used instead
+  (fcntl.flock, like metrics.py). There is a fixed set of LOCK_FILES
+  lock files per cache directory and each bucket uses the one its key
+  hashes to, so requests of different clients rarely wait for each
+  other. The counters of _record() have lock files of their own.
+
+Usage:
+    @ratelimit('login')
+    def login_view(request):
+        ...
+"""
+
+import fcntl
+import os
+import zlib
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+
+
+# Default limits per scope, as "<requests>/<period>" (s, m, h or d).
+# Override in settings.py with RATELIMIT_RATES = {'login': '5/m', ...}
+DEFAULT_RATES = {
+    'post_item': '10/h',
+    'login': '10/m',
+    'search': '120/m',
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+LOCK_DIRECTORY = '.ratelimit-locks'  # Inside the FileBasedCache directory
+LOCK_FILES = 64
+LOCK_TIMEOUT = 2          # Seconds until a lock entry expires (if its worker died)
+LOCK_WAIT_SECONDS = 0.5   # Longest wait for a bucket's lock
+
+# Per-process fallback storage, used when the cache backend fails
+_local_buckets = {}
+_local_stats = {}
+_local_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """
+    Turn '10/m' into (10, 60): 10 requests per 60 seconds.
+    """
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[-1]] * int(period[:-1] or 1)
+
+
+def get_rate(scope):
+    rates = {**DEFAULT_RATES, **getattr(settings, 'RATELIMIT_RATES', {})}
+    return parse_rate(rates[scope])
+
+
+def get_cache():
+    return caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+
+
+def get_client_ip(request):
+    """
+    IP address of the client.
+    Behind a proxy (e.g. Render), set RATELIMIT_TRUST_X_FORWARDED_FOR = True
+    so we use the real client IP instead of the proxy's IP.
+    """
+    if getattr(settings, 'RATELIMIT_TRUST_X_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_client_key(request):
+    """
+    Logged-in users are limited per account, anonymous users per IP.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{get_client_ip(request)}'
+
+
+def _take_token(bucket, limit, period, now):
+    """
+    Refill a bucket for the time that passed and try to take one token.
+    bucket is (tokens, last_update) or None for a new (full) bucket.
+    Returns (allowed, new_bucket, seconds_until_next_token).
+    """
+    tokens, last_update = bucket if bucket else (limit, now)
+    refill_speed = limit / period  # tokens per second
+    tokens = min(limit, tokens + (now - last_update) * refill_speed)
+
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0
+    return False, (tokens, now), (1 - tokens) / refill_speed
+
+
+@contextmanager
+def _file_lock(cache, key, group):
+    """
+    Let one process at a time into the block for `key` when `cache` is a
+    FileBasedCache (other caches need no file lock). `group` keeps the
+    lock files of buckets and of counters apart.
+    """
+    if not isinstance(cache, FileBasedCache):
+        yield
+        return
+    directory = os.path.join(cache._dir, LOCK_DIRECTORY)
+    os.makedirs(directory, exist_ok=True)
+    number = zlib.crc32(key.encode()) % LOCK_FILES  # Same key -> same file, in every process
+    with open(os.path.join(directory, f'{group}-{number}.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+        yield
+
+
+@contextmanager
+def _bucket_lock(cache, key):
+    """
+    Lock one bucket while it is read and written back.
+    """
+    if isinstance(cache, FileBasedCache):
+        with _file_lock(cache, key, 'bucket'):
+            yield
+        return
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    # add() only stores the entry if it doesn't exist yet: the worker
+    # that manages it holds the lock
+    while not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # check_rate() then limits inside this process instead
+            raise TimeoutError(f'Rate limit bucket {key} stayed locked')
+        time.sleep(0.002)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def _record(scope, outcome):
+    """
+    Count allowed/limited requests per scope (for monitoring).
+    """
+    key = f'ratelimit:stats:{scope}:{outcome}'
+    try:
+        cache = get_cache()
+        with _file_lock(cache, key, 'stats'):
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+    except Exception:
+        with _local_lock:
+            _local_stats[key] = _local_stats.get(key, 0) + 1
+
+
+def check_rate(scope, client_key):
+    """
+    Take one token from the bucket of (scope, client).
+    Returns (allowed, retry_after_seconds).
+    """
+    limit, period = get_rate(scope)
+    key = f'ratelimit:{scope}:{client_key}'
+
+    try:
+        cache = get_cache()
+        with _bucket_lock(cache, key):
+            # The time is read inside the lock, so the bucket's last
+            # update never lies in the future
+            allowed, bucket, retry_after = _take_token(cache.get(key), limit, period, time.time())
+            cache.set(key, bucket, timeout=period)
+    except Exception:
+        # Cache is down: keep limiting inside this process
+        with _local_lock:
+            allowed, bucket, retry_after = _take_token(_local_buckets.get(key), limit, period, time.time())
+            _local_buckets[key] = bucket
+
+    _record(scope, 'allowed' if allowed else 'limited')
+    return allowed, retry_after
+
+
+def get_stats():
+    """
+    Allowed/limited counters for every scope, e.g.
+    {'login': {'allowed': 120, 'limited': 3}, ...}
+    """
+    stats = {}
+    for scope in {**DEFAULT_RATES, **getattr(settings, 'RATELIMIT_RATES', {})}:
+        stats[scope] = {}
+        for outcome in ('allowed', 'limited'):
+            key = f'ratelimit:stats:{scope}:{outcome}'
+            try:
+                value = get_cache().get(key, 0)
+            except Exception:
+                value = 0
+            stats[scope][outcome] = value + _local_stats.get(key, 0)
+    return stats
+
+
+def ratelimit(scope, methods=('POST',), when=None):
+    """
+    View decorator that applies the token bucket of `scope`.
+
+    methods: only these HTTP methods use up tokens (default: POST)
+    when:    optional function(request) -> bool; only limit when it returns True
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (getattr(settings, 'RATELIMIT_ENABLED', True)
+                    and request.method in methods
+                    and (when is None or when(request))):
+                allowed, retry_after = check_rate(scope, get_client_key(request))
+                if not allowed:
+                    response = HttpResponse(
+                        'Too many requests. Please wait a moment and try again.',
+                        status=429,
+                        content_type='text/plain',
+                    )
+                    response['Retry-After'] = str(max(1, int(retry_after + 0.5)))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,327 @@
+"""
+Creating student accounts in bulk from a roster, with invitation emails.
+
+At the start of a semester thousands of students register in the same
+hour, and each registration runs the password validators, a deliberately
+slow password hash (PBKDF2) and two INSERTs on a web worker. With the
+registrar's roster, staff can create the accounts beforehand:
+
+    python manage.py import_roster students.csv --campus north --workers 8
+
+The roster is a CSV or JSONL file with the columns username and email,
+and optionally first_name, last_name, student_id, phone and password.
+
+How it works (like importers.py for items):
+1. Rows are read from the file in batches (default 1000 rows).
+2. Each row is checked with RosterRowForm. A row that has a password goes
+   through the password validators and is hashed. That is the slow part,
+   so with `--workers` it is spread over several processes.
+3. The User, UserProfile and Invitation rows of the batch are inserted
+   with one bulk_create each, in one transaction.
+
+Usernames that already exist are skipped (before step 2), so the same
+roster can be imported again after students are added.
+
+Rows without a password get an unusable password, which costs nothing to
+hash, plus an Invitation. The send_notifications worker emails each
+student a link. The token in the link is an HMAC of the invitation and the
+user's password field:
+- it can't be guessed without the SECRET_KEY,
+- it isn't stored anywhere,
+- it stops working once the student has chosen a password.
+Invitations expire after settings.INVITATION_DAYS. The admin can send an
+invitation again, which gives it a new expiry date and a new link.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from . import notifications
+from .campus import campus_url, directory, site_path
+from .forms import RosterRowForm
+from .importers import DEFAULT_BATCH_SIZE, ImportResult, iter_rows
+from .models import Invitation, UserProfile
+
+
+DEFAULT_INVITATION_DAYS = 30
+TOKEN_SALT = 'lostfound.roster.invitation'
+
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name']
+PROFILE_FIELDS = ['student_id', 'phone']
+
+
+class RosterResult(ImportResult):
+    """
+    Summary of one roster import.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.invited = 0   # Created accounts that get an invitation email
+        self.existing = 0  # Rows skipped because the username is taken
+
+    @property
+    def total(self):
+        return self.created + self.existing + self.failed
+
+
+# ---------------- Importing ----------------
+
+def prepare_row(row_number, row):
+    """
+    Validate one roster row and hash its password.
+    Returns (row_number, data, None) or (row_number, None, errors).
+
+    Runs inside worker processes, so it only receives and returns plain data.
+    """
+    if '__error__' in row:
+        return row_number, None, {'__all__': [row['__error__']]}
+
+    form = RosterRowForm(data=row)
+    if not form.is_valid():
+        return row_number, None, {field: list(messages) for field, messages in form.errors.items()}
+
+    data = dict(form.cleaned_data)
+    password = data.pop('password')
+    data['invite'] = not password
+    # make_password(None) is an unusable password: no hashing work at all
+    data['password'] = make_password(password or None)
+    return row_number, data, None
+
+
+def _prepare_chunk(rows):
+    return [prepare_row(row_number, row) for row_number, row in rows]
+
+
+def _username(row):
+    username = row.get('username')
+    return username.strip() if isinstance(username, str) else None
+
+
+def _taken_usernames(usernames):
+    usernames = [username for username in usernames if username]
+    if not usernames:
+        return set()
+    return set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+
+def _insert(accounts, campus, expires_at):
+    """
+    Insert the users, profiles and invitations of a batch in one transaction.
+    """
+    users = [
+        User(password=data['password'], **{field: data[field] for field in USER_FIELDS})
+        for data in accounts
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        if users and users[0].pk is None:
+            # Databases that don't return the new IDs from bulk inserts
+            ids = dict(User.objects.filter(username__in=[user.username for user in users])
+                       .values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, campus=campus, **{field: data[field] for field in PROFILE_FIELDS})
+            for user, data in zip(users, accounts)
+        ])
+        Invitation.objects.bulk_create([
+            Invitation(user=user, campus=campus, expires_at=expires_at)
+            for user, data in zip(users, accounts) if data['invite']
+        ])
+
+
+def import_roster(text_file, campus=None, file_format='csv', batch_size=DEFAULT_BATCH_SIZE,
+                  workers=1, on_error=None):
+    """
+    Create accounts for the students of a roster file.
+
+    campus:    Campus of the students (default: settings.DEFAULT_CAMPUS)
+    workers:   Number of processes used to validate rows and hash passwords
+    on_error:  Optional callback(row_number, errors), called for every bad row
+
+    Returns a RosterResult.
+    """
+    if campus is None:
+        campus = directory.get_default()
+    expires_at = timezone.now() + get_invitation_lifetime()
+    result = RosterResult()
+    rows = iter_rows(text_file, file_format)
+    seen = set()  # Usernames of this roster, to report rows listed twice
+
+    def report(row_number, errors):
+        result.add_error(row_number, errors)
+        if on_error:
+            on_error(row_number, errors)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            # Students who already have an account are skipped before the
+            # slow part, so importing the same roster again is quick
+            taken = _taken_usernames(_username(row) for row_number, row in batch)
+            todo = [(row_number, row) for row_number, row in batch if _username(row) not in taken]
+            result.existing += len(batch) - len(todo)
+            batch = todo
+
+            # Validate and hash (in parallel when workers > 1)
+            if executor:
+                chunk_size = max(1, len(batch) // (workers * 4))
+                chunks = [batch[i:i + chunk_size] for i in range(0, len(batch), chunk_size)]
+                prepared = []
+                for chunk_result in executor.map(_prepare_chunk, chunks):
+                    prepared.extend(chunk_result)
+            else:
+                prepared = _prepare_chunk(batch)
+
+            accounts = []
+            for row_number, data, errors in prepared:
+                if errors:
+                    report(row_number, errors)
+                elif data['username'] in seen:
+                    report(row_number, {'username': ['This username is listed more than once in the roster.']})
+                else:
+                    seen.add(data['username'])
+                    accounts.append(data)
+
+            # Try again if a student registers on the website between the
+            # check above and the insert
+            for attempt in range(3):
+                taken = _taken_usernames(data['username'] for data in accounts)
+                new_accounts = [data for data in accounts if data['username'] not in taken]
+                try:
+                    _insert(new_accounts, campus, expires_at)
+                    break
+                except IntegrityError:
+                    if attempt == 2:
+                        raise
+            result.existing += len(accounts) - len(new_accounts)
+            result.created += len(new_accounts)
+            result.invited += sum(1 for data in new_accounts if data['invite'])
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return result
+
+
+# ---------------- Invitation links ----------------
+
+def get_invitation_lifetime():
+    return timedelta(days=getattr(settings, 'INVITATION_DAYS', DEFAULT_INVITATION_DAYS))
+
+
+def invitation_token(invitation):
+    """
+    The secret part of the invitation link. Changes (so old links stop
+    working) when the user's password is set or the invitation is renewed.
+    """
+    value = f'{invitation.pk}:{invitation.user.password}:{invitation.expires_at.timestamp():.0f}'
+    return salted_hmac(TOKEN_SALT, value, algorithm='sha256').hexdigest()[:40]
+
+
+def invitation_url(invitation):
+    campus = directory.get(invitation.campus_id) or directory.get_default()
+    return campus_url(campus, site_path('accept_invitation', [invitation.pk, invitation_token(invitation)]))
+
+
+def check_invitation(invitation_id, token):
+    """
+    The invitation the link is for, or None if the link is wrong, expired
+    or already used.
+    """
+    invitation = Invitation.objects.select_related('user').filter(pk=invitation_id).first()
+    if invitation is None or invitation.accepted_at or invitation.expires_at < timezone.now():
+        return None
+    if not constant_time_compare(token, invitation_token(invitation)):
+        return None
+    return invitation
+
+
+def accept(invitation):
+    """
+    Record that the student chose a password through the invitation.
+    """
+    invitation.accepted_at = timezone.now()
+    invitation.save(update_fields=['accepted_at'])
+
+
+def renew(queryset):
+    """
+    Send the invitations again, with a new expiry date (and so a new link).
+    Returns the number of invitations renewed.
+    """
+    return queryset.filter(accepted_at__isnull=True).update(
+        status='pending', attempts=0, next_attempt_at=timezone.now(), locked_until=None,
+        expires_at=timezone.now() + get_invitation_lifetime(),
+    )
+
+
+# ---------------- Sending (the send_notifications worker) ----------------
+
+def build_email(invitation):
+    user = invitation.user
+    body = render_to_string('lostfound/emails/invitation.txt', {
+        'user': user,
+        'url': invitation_url(invitation),
+        'expires_at': invitation.expires_at,
+        'campus': directory.get(invitation.campus_id),
+        'site_url': settings.SITE_URL,
+    })
+    return EmailMessage(
+        'Your Campus Lost & Found account', body, settings.DEFAULT_FROM_EMAIL, [user.email],
+    )
+
+
+def deliver_invitations(batch_size=None, connection=None):
+    """
+    Email one batch of due invitations over one connection, with the same
+    leasing and retries as notifications.deliver_batch().
+    Returns a notifications.DeliveryResult (one email per invitation).
+    """
+    result = notifications.DeliveryResult()
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', notifications.DEFAULT_BATCH_SIZE)
+    invitations = notifications.lease_batch(batch_size, model=Invitation)
+    if not invitations:
+        return result
+
+    connection = connection or get_connection()
+    try:
+        for invitation in invitations:
+            now = timezone.now()
+            if not invitation.user.email:
+                Invitation.objects.filter(pk=invitation.pk).update(
+                    status='failed', locked_until=None, last_error='The user has no email address.',
+                )
+                result.skipped += 1
+                continue
+            try:
+                connection.open()
+                connection.send_messages([build_email(invitation)])
+            except Exception as error:  # SMTP errors, refused addresses, timeouts...
+                notifications.mark_failed([invitation], error, now)
+                result.failed += 1
+                connection.close()
+                continue
+            Invitation.objects.filter(pk=invitation.pk).update(
+                status='sent', sent_at=now, attempts=invitation.attempts + 1, locked_until=None,
+            )
+            result.emails += 1
+            result.notifications += 1
+    finally:
+        connection.close()
+    return result
@@ -0,0 +1,187 @@
+"""
+Typo-tolerant search for the lost/found list pages.
+
+`title__icontains='aripods'` finds nothing when the item is called
+"AirPods". Instead we compare TRIGRAMS (groups of 3 letters):
+
+    "airpods" -> "  a", " ai", "air", "irp", "rpo", "pod", "ods", "ds "
+    "aripods" -> "  a", " ar", "ari", "rip", "ipo", "pod", "ods", "ds "
+
+Half of the trigrams of "aripods" appear in "airpods", so it is still a
+good match. The score of an item is the fraction of the query's trigrams
+found in its title, description and location (1.0 = every trigram found).
+Items scoring at least settings.SEARCH_TRIGRAM_THRESHOLD are shown, best first.
+
+Two implementations, picked automatically from the database in use:
+- PostgreSQL: the pg_trgm extension with GIN trigram indexes
+  (created in migration 0003) and word_similarity() for ranking.
+- SQLite: our own inverted index, the SearchTrigram table
+  (trigram -> items containing it), kept up to date from signals.py.
+  Finding candidates is one indexed GROUP BY over the query's trigrams.
+"""
+
+import math
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, When
+
+from .models import LostItem, FoundItem, SearchTrigram
+
+
+DEFAULT_THRESHOLD = 0.4
+MAX_RESULTS = 500  # Ranked results returned per search
+
+# kind -> (model, location field)
+ITEM_KINDS = {
+    'lost': (LostItem, 'location_lost'),
+    'found': (FoundItem, 'location_found'),
+}
+
+_WORDS = re.compile(r'[^\W_]+')
+
+
+def get_threshold():
+    return getattr(settings, 'SEARCH_TRIGRAM_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def kind_of(model):
+    return 'lost' if model is LostItem else 'found'
+
+
+def trigrams(text):
+    """
+    Set of trigrams of a text, computed like PostgreSQL's pg_trgm:
+    lowercase each word, pad it with two spaces in front and one behind,
+    and take every 3 consecutive characters.
+    """
+    result = set()
+    for word in _WORDS.findall((text or '').lower()):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+def item_trigrams(item, location_field):
+    return trigrams(' '.join([item.title, item.description, getattr(item, location_field)]))
+
+
+# ---------------- SQLite: maintaining the SearchTrigram table ----------------
+
+def index_items(kind, items, replace=True):
+    """
+    (Re)build the trigram rows of the given items.
+    Only approved items are searchable, so other items just get removed.
+    Pass replace=False when the items are known to have no rows yet.
+    """
+    if use_postgres():
+        return
+    location_field = ITEM_KINDS[kind][1]
+    rows = []
+    for item in items:
+        if item.is_approved:
+            rows.extend(
+                SearchTrigram(kind=kind, item_id=item.pk, trigram=trigram, campus_id=item.campus_id)
+                for trigram in item_trigrams(item, location_field)
+            )
+    with transaction.atomic():
+        if replace:
+            SearchTrigram.objects.filter(kind=kind, item_id__in=[item.pk for item in items]).delete()
+        SearchTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+def remove_item(kind, item_id):
+    if not use_postgres():
+        SearchTrigram.objects.filter(kind=kind, item_id=item_id).delete()
+
+
+# ---------------- Searching ----------------
+
+def _rank_sqlite(queryset, query, threshold, campus_id):
+    """
+    Return [(item_id, score), ...] best first, from the SearchTrigram table
+    (only items of one campus that are in `queryset`).
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+    # An item needs at least this many of the query's trigrams
+    needed = max(1, math.ceil(threshold * len(query_trigrams)))
+
+    rows = (
+        SearchTrigram.objects
+        .filter(campus_id=campus_id, kind=kind_of(queryset.model), trigram__in=query_trigrams)
+        # The caller's filters (e.g. a category) must apply before the best
+        # MAX_RESULTS are picked, or good matches could be cut off. (EXISTS
+        # rather than item_id IN (...): with IN, SQLite probes the trigram
+        # index once per listed item and gets several times slower.)
+        .filter(Exists(queryset.filter(pk=OuterRef('item_id'))))
+        .values('item_id')
+        .annotate(hits=Count('*'))
+        .filter(hits__gte=needed)
+        .order_by('-hits', '-item_id')[:MAX_RESULTS]
+    )
+    return [(row['item_id'], row['hits'] / len(query_trigrams)) for row in rows]
+
+
+def _rank_postgres(queryset, query, threshold, location_field):
+    """
+    pg_trgm version: the `%>` operator (trigram_word_similar) uses the GIN
+    indexes to find candidates, word_similarity() ranks them.
+    Returns [(item_id, score), ...] best first.
+    """
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    from django.db.models.functions import Greatest
+
+    ranked = (
+        queryset
+        .filter(
+            Q(title__trigram_word_similar=query)
+            | Q(description__trigram_word_similar=query)
+            | Q(**{f'{location_field}__trigram_word_similar': query})
+        )
+        .annotate(search_score=Greatest(
+            TrigramWordSimilarity(query, 'title'),
+            TrigramWordSimilarity(query, 'description'),
+            TrigramWordSimilarity(query, location_field),
+        ))
+        .filter(search_score__gte=threshold)
+        .order_by('-search_score', '-created_at')
+        .values_list('pk', 'search_score')[:MAX_RESULTS]
+    )
+    # SET LOCAL only lasts until the end of the transaction, so the
+    # threshold never stays set on a pooled connection used by other
+    # requests. The query runs inside that same transaction.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s', [threshold])
+        return list(ranked)
+
+
+def search_items(queryset, query, campus):
+    """
+    Filter `queryset` (of LostItem or FoundItem items of `campus`) with a
+    typo-tolerant search for `query`, ordered by relevance.
+    """
+    model = queryset.model
+    threshold = get_threshold()
+    location_field = ITEM_KINDS[kind_of(model)][1]
+
+    if use_postgres():
+        ranked = _rank_postgres(queryset, query, threshold, location_field)
+    else:
+        ranked = _rank_sqlite(queryset, query, threshold, campus.pk)
+    if not ranked:
+        return queryset.none()
+    # Keep the order of the ranking: ORDER BY CASE id WHEN 7 THEN 0 WHEN 3 THEN 1 ...
+    order = Case(
+        *[When(pk=item_id, then=position) for position, (item_id, score) in enumerate(ranked)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=[item_id for item_id, score in ranked]).order_by(order)
@@ -0,0 +1,193 @@
+"""
+Cache of list/search results for the lost and found list pages.
+
+Popular searches ("wallet", category=electronics...) used to be computed
+from scratch on every request. Now each result page is remembered as a
+short list of item IDs:
+
+    key   = (campus, kind, normalized query, category, cursor, generation)
+    value = ([12, 9, 7, ...], next_cursor)
+
+Only IDs are cached (small), and the items of a page are then loaded by
+primary key, which is the cheapest query there is (only the columns the
+cards show, see cards.py).
+
+Invalidation uses a GENERATION value per campus and kind, stored in the
+shared Django cache (settings.CACHES, shared by all processes). Whenever an
+approved item changes (or an item is approved, unapproved or deleted), the
+generation of its campus and kind is replaced by a new random value (see
+signals.py), so other campuses keep their cached pages. Old entries are
+never read again and are pushed out of the per-process LRU cache (at most
+settings.SEARCH_CACHE_MAX_ENTRIES entries). Entries also expire after
+settings.SEARCH_CACHE_SECONDS, which bounds staleness if a change is
+missed (e.g. the shared cache was restarted).
+
+Paging uses cursors:
+- browsing (no query): the cursor is the (created_at, id) of the last
+  item shown, so the next page is an indexed "older than this" query;
+- searching: the cursor is the position in the ranked result list.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .cards import load_cards_by_id
+from .models import LostItem, FoundItem
+from .search import search_items
+
+
+PAGE_SIZE = 24
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TIMEOUT = 60
+
+MODEL_KINDS = {LostItem: 'lost', FoundItem: 'found'}
+
+
+class LRUCache:
+    """
+    Dictionary that forgets the least recently used entry when full, and
+    entries older than `timeout` seconds.
+    Counts hits and misses for monitoring.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()  # key -> (expires at, value)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+        }
+
+
+results = LRUCache(
+    getattr(settings, 'SEARCH_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+    getattr(settings, 'SEARCH_CACHE_SECONDS', DEFAULT_TIMEOUT),
+)
+
+
+def _generation_key(campus_id, kind):
+    return f'search_cache:gen:{campus_id}:{kind}'
+
+
+def _new_generation():
+    # A random value instead of a counter: two processes bumping at the same
+    # time can't end up writing the same number, and a generation that was
+    # pushed out of the shared cache never comes back as an old value
+    return secrets.token_hex(8)
+
+
+def get_generation(campus_id, kind):
+    return cache.get_or_set(_generation_key(campus_id, kind), _new_generation, timeout=None)
+
+
+def bump_generation(campus_id, kind):
+    """
+    Throw away (logically) every cached result page of this kind on one campus.
+    """
+    cache.set(_generation_key(campus_id, kind), _new_generation(), timeout=None)
+
+
+def normalize_query(query):
+    """
+    "  Black   WALLET " and "black wallet" give the same results, so they
+    should share a cache entry.
+    """
+    return ' '.join(query.lower().split())
+
+
+def _browse_ids(queryset, cursor):
+    """
+    Newest-first IDs after the (created_at, id) cursor.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, _, last_id = cursor.rpartition(',')
+        created_at = parse_datetime(created_at)
+        if created_at is None or not last_id.isdigit():
+            return [], ''
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=int(last_id))
+        )
+    rows = list(queryset.values_list('id', 'created_at')[:PAGE_SIZE + 1])
+    next_cursor = ''
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        next_cursor = f'{rows[-1][1].isoformat()},{rows[-1][0]}'
+    return [item_id for item_id, created_at in rows], next_cursor
+
+
+def _search_ids(queryset, query, campus, cursor):
+    """
+    Best-match-first IDs starting at position `cursor` of the ranking.
+    """
+    start = int(cursor) if cursor.isdigit() else 0
+    ranked = list(search_items(queryset, query, campus).values_list('id', flat=True))
+    ids = ranked[start:start + PAGE_SIZE]
+    next_cursor = str(start + PAGE_SIZE) if start + PAGE_SIZE < len(ranked) else ''
+    return ids, next_cursor
+
+
+def get_page(model, campus, query='', category='', cursor=''):
+    """
+    One page of approved items of `campus` for the list pages.
+    Returns (cards, next_cursor); next_cursor is '' on the last page.
+    """
+    kind = MODEL_KINDS[model]
+    query = normalize_query(query)
+    key = (campus.pk, kind, query, category, cursor, get_generation(campus.pk, kind))
+
+    cached = results.get(key)
+    if cached is None:
+        queryset = model.objects.filter(campus=campus, is_approved=True)
+        if category:
+            queryset = queryset.filter(category=category)
+        if query:
+            cached = _search_ids(queryset, query, campus, cursor)
+        else:
+            cached = _browse_ids(queryset, cursor)
+        results.set(key, cached)
+
+    ids, next_cursor = cached
+    # Load the page's cards by primary key and keep the cached order.
+    # (Items unapproved since caching are skipped.)
+    return load_cards_by_id(model, ids, is_approved=True), next_cursor
+
+
+def get_stats():
+    return results.stats()
@@ -0,0 +1,157 @@
+"""
+Signal handlers: code that runs automatically when items are saved or deleted.
+
+Django sends `post_save` after every .save() and `post_delete` after every
+.delete() (including saves made from the admin panel). We use them to keep
+caches in sync with the database.
+"""
+
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import (
+    analytics, dashboard, duplicates, events, feeds, image_hashing, live, metrics, notifications,
+    page_cache, profiling, search, search_cache, typeahead,
+)
+from .campus import directory
+from .models import Campus, LostItem, FoundItem, RequestProfile
+
+
+@receiver(post_save, sender=Campus)
+@receiver(post_delete, sender=Campus)
+def campus_changed(sender, instance, **kwargs):
+    """
+    Make every process reload its list of campuses (see campus.py).
+    """
+    directory.changed()
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """
+    Remove the .prof file of a deleted request profile (see profiling.py).
+    """
+    (profiling.profiles_root() / instance.file_name).unlink(missing_ok=True)
+
+
+@receiver(post_init, sender=LostItem)
+@receiver(post_init, sender=FoundItem)
+def remember_loaded_state(sender, instance, **kwargs):
+    """
+    Remember the approval flag, status, category and campus the item had when
+    it was loaded, so after saving we can tell whether it was just approved,
+    changed status or moved to another category or campus.
+    (Fields left out with .only()/.defer() are not in __dict__ and are skipped.)
+    """
+    instance._loaded_is_approved = instance.__dict__.get('is_approved')
+    instance._loaded_status = instance.__dict__.get('status')
+    instance._loaded_category = instance.__dict__.get('category')
+    instance._loaded_campus_id = instance.__dict__.get('campus_id')
+
+
+def was_just_approved(instance, created):
+    """
+    True if this save turned the item from unapproved into approved.
+    """
+    if not instance.is_approved:
+        return False
+    return created or instance._loaded_is_approved is False
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_save, sender=FoundItem)
+@receiver(post_delete, sender=LostItem)
+@receiver(post_delete, sender=FoundItem)
+def item_changed(sender, instance, **kwargs):
+    """
+    The owner's dashboard counts/pages are now out of date.
+    """
+    dashboard.invalidate_user(instance.posted_by_id)
+
+
+@receiver(post_delete, sender=LostItem)
+@receiver(post_delete, sender=FoundItem)
+def item_deleted(sender, instance, **kwargs):
+    """
+    Log the delete and remove the item from the search index and cached
+    result pages.
+    """
+    kind = 'lost' if sender is LostItem else 'found'
+    events.record(kind, instance, 'deleted')
+    search.remove_item(kind, instance.pk)
+    duplicates.remove_item(kind, instance.pk)
+    if instance.is_approved:
+        search_cache.bump_generation(instance.campus_id, kind)
+        page_cache.item_changed(instance.campus_id, kind, instance.pk)
+        feeds.items_changed(kind, [instance])
+
+
+@receiver(pre_save, sender=LostItem)
+@receiver(pre_save, sender=FoundItem)
+def hash_new_image(sender, instance, **kwargs):
+    """
+    Compute perceptual hashes when a new image is uploaded (and count its
+    size for /metrics).
+    `_committed` is False only for a file that hasn't been stored yet,
+    i.e. a fresh upload from a form or the admin panel.
+    """
+    if not instance.image:
+        instance.image_dhash = instance.image_phash = ''
+    elif not instance.image._committed:
+        image_hashing.update_item_hashes(instance)
+        metrics.observe_upload(instance.image.size)
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_save, sender=FoundItem)
+def index_image_hash(sender, instance, **kwargs):
+    """
+    Make the item's photo searchable in the similar-images index.
+    """
+    if instance.image_phash:
+        kind = 'lost' if sender is LostItem else 'found'
+        image_hashing.index.add(kind, instance.pk, instance.image_phash)
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_save, sender=FoundItem)
+def item_saved(sender, instance, created, **kwargs):
+    """
+    Runs after every save; reacts to an item being approved.
+    """
+    kind = 'lost' if sender is LostItem else 'found'
+    
+    # Append what changed to the item event log (see events.py)
+    events.record_save(kind, instance, created)
+    
+    # Daily statistics for the admin analytics page
+    if created:
+        analytics.record_posted(kind, instance.category, instance.created_at)
+    elif instance._loaded_status is not None and instance._loaded_status != instance.status:
+        analytics.record_status_change(kind, instance, instance._loaded_status)
+    
+    if was_just_approved(instance, created):
+        # Push the new item to open home/list pages
+        live.item_approved(kind, instance)
+        # Email the owner (and owners of matching lost items) later, through the outbox
+        notifications.item_approved(kind, instance)
+    if instance.is_approved or instance._loaded_is_approved:
+        # Add, replace or (when unapproved) remove the item's search box suggestions
+        typeahead.indexes.item_changed()
+        # Add, refresh or (when unapproved) remove the item's search trigrams
+        search.index_items(kind, [instance])
+        # The campus it was on before (if moved) and the one it's on now
+        campus_ids = {instance.campus_id, instance._loaded_campus_id} - {None}
+        for campus_id in campus_ids:
+            # Cached list/search result pages of this kind may now be wrong
+            search_cache.bump_generation(campus_id, kind)
+            # ...and so are the cached full pages showing this item
+            page_cache.item_changed(campus_id, kind, instance.pk)
+        # Rewrite the RSS/Atom feeds and sitemap file that list this item
+        old_categories = [instance._loaded_category] if instance._loaded_category else []
+        feeds.items_changed(kind, [instance], old_categories, campus_ids)
+    # Remember the saved state, in case the same object is saved again
+    instance._loaded_is_approved = instance.is_approved
+    instance._loaded_status = instance.status
+    instance._loaded_category = instance.category
+    instance._loaded_campus_id = instance.campus_id
@@ -0,0 +1,234 @@
+"""
+Local media storage for item photos (used when Cloudinary isn't configured).
+
+The default FileSystemStorage saves every upload under its original name
+(lost_items/IMG_1234.jpg, lost_items/IMG_1234_aXb3c.jpg, ...), so the same
+photo posted twice is stored twice. ContentAddressedStorage instead names
+each file after the SHA-256 hash of its content:
+
+    cas/3f/a2/3fa29c...e1.jpg
+        ^^ ^^ first two pairs of hash characters = directory "shards"
+
+- Identical photos get the same name, so they are stored only once.
+- Sharding keeps every directory small (at most 256 x 256 directories),
+  which file systems handle much better than one folder of 100k files.
+- Uploads are streamed to disk in chunks while the hash is computed, so a
+  large photo is never held in memory as a whole.
+
+serve() replaces django.views.static.serve for MEDIA_URL. It supports
+conditional requests (ETag / Last-Modified -> 304 Not Modified) and Range
+requests (206 Partial Content), so browsers can revalidate and resume.
+Content-addressed files never change, so they are cached "forever".
+
+Note: because several items can share one file, files must not be deleted
+when an item is deleted (the app never does; keep it that way).
+"""
+
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+CAS_DIRECTORY = 'cas'
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60  # One year
+
+_CAS_NAME = re.compile(r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that stores files by content hash, once.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The real name is only known once the content is hashed (_save),
+        # and an existing file with that name is exactly what we want.
+        return name
+
+    def hashed_name(self, digest, original_name):
+        extension = os.path.splitext(original_name)[1].lower()
+        return posixpath.join(CAS_DIRECTORY, digest[:2], digest[2:4], digest + extension)
+
+    def _save(self, name, content):
+        temp_dir = os.path.join(self.location, CAS_DIRECTORY, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+
+        upload_path = None
+        if hasattr(content, 'temporary_file_path'):
+            # Large uploads are already on disk: just hash them in chunks.
+            for chunk in content.chunks(CHUNK_SIZE):
+                sha256.update(chunk)
+            upload_path = content.temporary_file_path()
+            temp_path = None
+        else:
+            # Otherwise write the chunks to a temp file while hashing them.
+            fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    temp_file.write(chunk)
+
+        name = self.hashed_name(sha256.hexdigest(), name)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Same content is already stored: keep that copy (deduplication)
+            if temp_path:
+                os.remove(temp_path)
+            return name
+
+        if temp_path is None:
+            # The upload is in FILE_UPLOAD_TEMP_DIR (usually /tmp), which may
+            # be on another file system than MEDIA_ROOT. Bring it into
+            # cas/tmp first: a rename if it's the same file system, a copy
+            # otherwise. Either way the final step below is then a rename.
+            fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+            os.close(fd)
+            file_move_safe(upload_path, temp_path, allow_overwrite=True)
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # cas/tmp and the final directory are both in MEDIA_ROOT, so this is
+        # an atomic rename: readers never see a half-written file. Two
+        # uploads of the same photo racing here both have identical bytes,
+        # so whichever wins is fine.
+        os.replace(temp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+def _etag_for(path, stat):
+    """
+    Content-addressed files already have their hash in the name; other
+    files (uploaded before this storage existed) use size + modified time.
+    """
+    match = _CAS_NAME.match(path)
+    if match:
+        return quote_etag(match.group(1))
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: W/"abc" matches "abc"
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates
+
+
+def _parse_range(header, size):
+    """
+    Return (start, end) (inclusive) for a single "bytes=..." range,
+    None if the header should be ignored, or 'unsatisfiable'.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # Multiple or malformed ranges: send the whole file
+    first, last = match.groups()
+    if first == '':
+        # "bytes=-500" = the last 500 bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def serve(request, path, document_root=None):
+    """
+    Serve a media file with conditional and Range request support.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    path = posixpath.normpath(path).lstrip('/')
+    full_path = safe_join(document_root, path)  # Refuses paths like ../settings.py
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    etag = _etag_for(path, stat)
+    last_modified = http_date(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Accept-Ranges': 'bytes',
+    }
+    if _CAS_NAME.match(path):
+        headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+
+    # Conditional GET: If-None-Match wins over If-Modified-Since
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and int(stat.st_mtime) <= since
+    if not_modified:
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    size = stat.st_size
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header:
+        # If-Range: only honour the range if the file is still the same one
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range.strip() in (etag, last_modified):
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(file, start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    for header, value in headers.items():
+        response[header] = value
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,18 @@
+"""
+Template tags for the item lists in the admin panel (see changelist.py).
+"""
+from django import template
+
+from lostfound.changelist import date_levels
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def item_date_hierarchy(cl):
+    """
+    Date drill-down links ("2024 > March > 14") without scanning the table.
+    """
+    if not cl.date_hierarchy:
+        return {'show': False}
+    return date_levels(cl)
@@ -0,0 +1,266 @@
+"""
+Search suggestions ("typeahead") for the search box on the list pages.
+
+As the user types "wal", we suggest "Lost Black Wallet", "Wallets"...
+without touching the database: every worker keeps an in-memory index of
+the titles, categories and locations of approved items, one per campus
+and kind (a campus only ever sees its own suggestions).
+
+The index is a SORTED LIST of strings. All strings starting with a prefix
+sit next to each other in a sorted list, so `bisect` finds the first one
+in O(log n) steps and we read forward from there.
+
+To match words in the middle of a title ("wallet" -> "Lost Black Wallet"),
+each word position of a text is stored as its own entry:
+    "lost black wallet", "black wallet", "wallet"
+
+Each text counts how many items use it. Every worker also remembers
+which texts it added for each item, so an item's texts can be taken out
+again (a text disappears once no item uses it).
+
+Updates:
+- Saving an approved item (or unapproving one) stores a new random
+  generation value in the cache. When a worker sees it change, it loads
+  only the items changed since the newest change it has already loaded
+  (one query per change, never one per keystroke). The old texts of those
+  items are replaced by the new ones, so an edited title shows up at once
+  and an item saved twice is not counted twice. Texts of unapproved items
+  are removed.
+- Texts of deleted items are dropped at the next full rebuild (every
+  TYPEAHEAD_REBUILD_SECONDS).
+"""
+
+import re
+import secrets
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import LostItem, FoundItem
+
+
+MAX_SUGGESTIONS = 8
+MAX_TEXT_LENGTH = 80  # Longer texts are not useful as suggestions
+MAX_SCANNED = 200     # Entries read per query before ranking
+
+# kind -> (model, location field)
+ITEM_KINDS = {
+    'lost': (LostItem, 'location_lost'),
+    'found': (FoundItem, 'location_found'),
+}
+
+# Types of an item's three texts, in the order they are loaded
+TEXT_TYPES = ('title', 'category', 'location')
+
+# Keys and display texts are kept apart by a character that sorts first
+SEPARATOR = '\x00'
+
+_SPACES = re.compile(r'\s+')
+_WORD_STARTS = re.compile(r'(?:^|\s)(?=\w)')
+
+
+def normalize(text):
+    """
+    Lowercase and collapse spaces, so "  Black   WALLET" == "black wallet".
+    """
+    return _SPACES.sub(' ', text).strip().lower()
+
+
+def _clean(text):
+    return _SPACES.sub(' ', text or '').strip()
+
+
+class PrefixIndex:
+    """
+    Sorted list of "<normalized key>\\0<display text>" entries, plus, for
+    each display text, its type (title/category/location) and how many
+    items use it (used to rank suggestions).
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.texts = {}  # display text -> [type, count]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text, text_type, keep_sorted=True):
+        """
+        Add a text. When loading many texts at once, pass keep_sorted=False
+        and call sort() at the end (sorting once is much faster than
+        inserting each entry at its sorted position).
+        """
+        text = _clean(text)
+        if not text or len(text) > MAX_TEXT_LENGTH:
+            return
+        info = self.texts.get(text)
+        if info is not None:
+            info[1] += 1
+            return
+        self.texts[text] = [text_type, 1]
+
+        normalized = text.lower()
+        for match in _WORD_STARTS.finditer(normalized):
+            entry = normalized[match.end():] + SEPARATOR + text
+            if keep_sorted:
+                insort(self.entries, entry)
+            else:
+                self.entries.append(entry)
+
+    def remove(self, text):
+        """
+        Take back one use of a text added with add(). Its entries are
+        removed when no item uses it any more.
+        """
+        text = _clean(text)
+        info = self.texts.get(text)
+        if info is None:
+            return  # Empty or too long: it was never added
+        info[1] -= 1
+        if info[1] > 0:
+            return
+        del self.texts[text]
+
+        normalized = text.lower()
+        for match in _WORD_STARTS.finditer(normalized):
+            entry = normalized[match.end():] + SEPARATOR + text
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def sort(self):
+        self.entries.sort()
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """
+        Return up to `limit` (text, type) pairs whose words start with `prefix`,
+        most used first.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        found = {}
+        position = bisect_left(self.entries, prefix)
+        for entry in self.entries[position:position + MAX_SCANNED]:
+            if not entry.startswith(prefix):
+                break
+            text = entry.split(SEPARATOR, 1)[1]
+            found[text] = self.texts[text]
+
+        ranked = sorted(found.items(), key=lambda pair: (-pair[1][1], pair[0].lower()))
+        return [(text, info[0]) for text, info in ranked[:limit]]
+
+
+class TypeaheadIndexes:
+    """
+    One PrefixIndex per (campus ID, item kind), kept in sync with the
+    database as described at the top of this file.
+    """
+
+    GENERATION_KEY = 'typeahead:generation'
+
+    def __init__(self):
+        self.indexes = None
+        self.item_texts = None  # (kind, item ID) -> (campus ID, its texts)
+        self.generation = None
+        self.synced_at = None   # updated_at of the newest change loaded
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    def _load(self, indexes, item_texts, since=None):
+        """
+        Add approved items to the indexes. With `since`, only items changed
+        since then are loaded (approved or not): their old texts are
+        removed first, and only approved ones get their new texts.
+        Only the needed columns are fetched.
+        Returns the newest updated_at of the loaded items (or None).
+        """
+        keep_sorted = since is not None
+        newest = None
+        for kind, (model, location_field) in ITEM_KINDS.items():
+            category_labels = dict(model.CATEGORY_CHOICES)
+            if since is None:
+                items = model.objects.filter(is_approved=True)
+            else:
+                items = model.objects.filter(updated_at__gte=since)
+            rows = items.values_list(
+                'pk', 'campus_id', 'is_approved', 'updated_at', 'title', 'category', location_field,
+            )
+            for row in rows.iterator(chunk_size=5000):
+                pk, campus_id, is_approved, updated_at, title, category, location = row
+                if newest is None or updated_at > newest:
+                    newest = updated_at
+                old = item_texts.pop((kind, pk), None)
+                if old is not None:
+                    old_campus_id, old_texts = old
+                    for text in old_texts:
+                        indexes[(old_campus_id, kind)].remove(text)
+                if not is_approved:
+                    continue
+
+                index = indexes.get((campus_id, kind))
+                if index is None:
+                    index = indexes[(campus_id, kind)] = PrefixIndex()
+                texts = (title, category_labels.get(category, ''), location)
+                for text, text_type in zip(texts, TEXT_TYPES):
+                    index.add(text, text_type, keep_sorted)
+                item_texts[(kind, pk)] = (campus_id, texts)
+        if not keep_sorted:
+            for index in indexes.values():
+                index.sort()
+        return newest
+
+    def _sync(self):
+        generation = cache.get(self.GENERATION_KEY, 0)
+        rebuild_every = getattr(settings, 'TYPEAHEAD_REBUILD_SECONDS', 3600)
+        needs_rebuild = self.indexes is None or time.monotonic() - self.built_at > rebuild_every
+        if not needs_rebuild and generation == self.generation:
+            return
+
+        with self.lock:
+            # Another thread may have synced while we waited for the lock
+            generation = cache.get(self.GENERATION_KEY, 0)
+            needs_rebuild = self.indexes is None or time.monotonic() - self.built_at > rebuild_every
+            if not needs_rebuild and generation == self.generation:
+                return
+
+            if needs_rebuild:
+                # Build a fresh index on the side, then swap it in
+                started_at = timezone.now()
+                indexes, item_texts = {}, {}
+                newest = self._load(indexes, item_texts)
+                self.indexes, self.item_texts = indexes, item_texts
+                self.built_at = time.monotonic()
+                self.synced_at = newest or started_at
+            else:
+                # updated_at >= the newest change already loaded: that item
+                # is loaded again, which is harmless since texts are replaced
+                newest = self._load(self.indexes, self.item_texts, since=self.synced_at)
+                self.synced_at = newest or self.synced_at
+            self.generation = generation
+
+    def item_changed(self):
+        """
+        Called (from signals.py) when an approved item is saved or an item
+        is unapproved, and by importers.py after approved items are
+        imported. Every process, including this one, loads the item's new
+        texts before its next suggestion.
+        """
+        # A random value, not a counter: one that was evicted from the
+        # cache can't come back as a value a worker has already seen
+        cache.set(self.GENERATION_KEY, secrets.token_hex(8), timeout=None)
+
+    def suggest(self, campus_id, kind, prefix, limit=MAX_SUGGESTIONS):
+        self._sync()
+        index = self.indexes.get((campus_id, kind))
+        if index is None:
+            return []  # No approved items of this kind on the campus yet
+        return index.suggest(prefix, limit)
+
+
+indexes = TypeaheadIndexes()
@@ -19,6 +19,8 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    # Invitation links of accounts created from a roster (see roster.py)
+    path('invite/<int:pk>/<str:token>/', views.accept_invitation, name='accept_invitation'),
     
     # Profile
     path('profile/', views.profile, name='profile'),
@@ -31,6 +33,13 @@ urlpatterns = [
     path('lost-items/', views.lost_items_list, name='lost_items_list'),
     path('found-items/', views.found_items_list, name='found_items_list'),
     
+    # Search box suggestions (JSON)
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
+    # Offline page (kept by the service worker, see pwa.py)
+    path('offline/', views.offline, name='offline'),
+    # Live updates (answered by the ASGI server; this is the WSGI fallback)
+    path('live/items/', views.live_items_unavailable, name='live_items'),
+    
     # Item details
     # Item details
     path('lost-item/<int:pk>/', views.lost_item_detail, name='lost_item_detail'),
@@ -38,5 +47,14 @@ urlpatterns = [
     
     # Actions
     path('item/<int:pk>/mark-found/', views.mark_found, name='mark_found'),
+    path('lost-item/<int:pk>/status/', views.lost_item_status, name='lost_item_status'),
+    path('found-item/<int:pk>/status/', views.found_item_status, name='found_item_status'),
+    
+    # Monitoring (staff only)
+    path('ratelimit-stats/', views.ratelimit_stats, name='ratelimit_stats'),
+    path('search-cache-stats/', views.search_cache_stats, name='search_cache_stats'),
+    path('live-stats/', views.live_stats, name='live_stats'),
+    path('page-cache-stats/', views.page_cache_stats, name='page_cache_stats'),
+    path('metrics', views.prometheus_metrics, name='metrics'),  # Prometheus (see metrics.py)
 ]
 
@@ -4,26 +4,52 @@ When a user visits a URL, Django calls the corresponding view function.
 Views process data and return HTML pages.
 """
 
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_POST
 from .models import LostItem, FoundItem, UserProfile
 from .forms import (
     UserRegistrationForm, UserProfileForm,
-    LostItemForm, FoundItemForm
+    LostItemForm, FoundItemForm, InvitationPasswordForm
 )
+from .cards import load_cards
+from .dashboard import get_dashboard
+from .image_hashing import find_similar_items
+from .ratelimit import ratelimit, get_stats as get_ratelimit_stats
+from . import duplicates, live, metrics, roster, search_cache, workflow
+from .page_cache import cache_anonymous_page, get_stats as get_page_cache_stats
+from .typeahead import indexes as typeahead_indexes
 
 
+def has_search_query(request):
+    """
+    True when a list page is being searched (only searches are rate limited).
+    """
+    return bool(request.GET.get('q'))
+
+
+@cache_anonymous_page('home')
 def home(request):
     """
     Home page view.
     Shows recent lost and found items.
     """
-    # Get recent approved items (limit to 6 each)
-    recent_lost = LostItem.objects.filter(is_approved=True).order_by('-created_at')[:6]
-    recent_found = FoundItem.objects.filter(is_approved=True).order_by('-created_at')[:6]
+    # Get recent approved items of this campus (limit to 6 each)
+    # request.campus is set by CampusMiddleware (see campus.py)
+    # Only the columns shown on the cards are loaded (see cards.py)
+    recent_lost = load_cards(LostItem.objects.filter(
+        campus=request.campus, is_approved=True
+    ).order_by('-created_at', '-id'), limit=6)
+    recent_found = load_cards(FoundItem.objects.filter(
+        campus=request.campus, is_approved=True
+    ).order_by('-created_at', '-id'), limit=6)
     
     # Pass data to template
     context = {
@@ -45,8 +71,8 @@ def register(request):
             # Save the user
             user = form.save()
             
-            # Create user profile
-            UserProfile.objects.create(user=user)
+            # Create user profile (on the campus they registered on)
+            UserProfile.objects.create(user=user, campus=request.campus)
             
             # Log the user in automatically
             login(request, user)
@@ -60,6 +86,33 @@ def register(request):
     return render(request, 'lostfound/register.html', {'form': form})
 
 
+@ratelimit('login')
+def accept_invitation(request, pk, token):
+    """
+    A student whose account was created from a roster opens the link in
+    their invitation email and chooses a password (see roster.py).
+    """
+    invitation = roster.check_invitation(pk, token)
+    if invitation is None:
+        messages.error(request, 'This invitation link has expired or was already used. '
+                                'Ask the lost & found desk for a new one.')
+        return redirect('login')
+    
+    if request.method == 'POST':
+        form = InvitationPasswordForm(invitation.user, request.POST)
+        if form.is_valid():
+            user = form.save()
+            roster.accept(invitation)
+            login(request, user)
+            messages.success(request, f'Welcome, {user.username}! Your account is ready.')
+            return redirect('home')
+    else:
+        form = InvitationPasswordForm(invitation.user)
+    
+    return render(request, 'lostfound/accept_invitation.html', {'form': form, 'invitation': invitation})
+
+
+@ratelimit('login')
 def login_view(request):
     """
     Login view.
@@ -98,11 +151,14 @@ def logout_view(request):
 @login_required
 def profile(request):
     """
-    User profile page.
+    User profile page with the student's dashboard.
     @login_required means: user must be logged in to access this page.
     """
-    # Get or create user profile
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    # Load the profile without writing anything on a normal visit.
+    # (Old accounts may not have one yet; it gets created when the form is saved.)
+    profile = UserProfile.objects.filter(user=request.user).first()
+    if profile is None:
+        profile = UserProfile(user=request.user, campus=request.campus)
     
     if request.method == 'POST':
         # Update profile
@@ -114,20 +170,21 @@ def profile(request):
     else:
         form = UserProfileForm(instance=profile)
     
-    # Get user's posts
-    user_lost_items = LostItem.objects.filter(posted_by=request.user)
-    user_found_items = FoundItem.objects.filter(posted_by=request.user)
-    
-    context = {
+    # Counts per status + one page of the user's posts (cached per user)
+    context = get_dashboard(
+        request.user,
+        lost_page=request.GET.get('lost_page', 1),
+        found_page=request.GET.get('found_page', 1),
+    )
+    context.update({
         'profile': profile,
         'form': form,
-        'user_lost_items': user_lost_items,
-        'user_found_items': user_found_items,
-    }
+    })
     return render(request, 'lostfound/profile.html', context)
 
 
 @login_required
+@ratelimit('post_item')
 def post_lost_item(request):
     """
     View for posting a lost item.
@@ -139,15 +196,27 @@ def post_lost_item(request):
         if form.is_valid():
             # Save the item, but don't commit to database yet
             lost_item = form.save(commit=False)
-            # Set who posted it
+            # Set who posted it, and on which campus
             lost_item.posted_by = request.user
+            lost_item.campus = request.campus
+            # Flag it for the moderators if the same text was posted recently
+            item_bands = duplicates.text_bands(lost_item)
+            lost_item.duplicate_of = duplicates.find_duplicate('lost', lost_item, item_bands)
             # Save to database
             lost_item.save()
+            duplicates.index_item('lost', lost_item, item_bands)
             
-            messages.success(
-                request,
-                'Your lost item post has been submitted! It will appear after admin approval.'
-            )
+            if lost_item.duplicate_of:
+                messages.info(
+                    request,
+                    'A very similar post was submitted recently. A moderator will check '
+                    'whether yours is a duplicate before it appears.'
+                )
+            else:
+                messages.success(
+                    request,
+                    'Your lost item post has been submitted! It will appear after admin approval.'
+                )
             return redirect('lost_items_list')
     else:
         form = LostItemForm()
@@ -156,6 +225,7 @@ def post_lost_item(request):
 
 
 @login_required
+@ratelimit('post_item')
 def post_found_item(request):
     """
     View for posting a found item.
@@ -166,12 +236,23 @@ def post_found_item(request):
         if form.is_valid():
             found_item = form.save(commit=False)
             found_item.posted_by = request.user
+            found_item.campus = request.campus
+            item_bands = duplicates.text_bands(found_item)
+            found_item.duplicate_of = duplicates.find_duplicate('found', found_item, item_bands)
             found_item.save()
+            duplicates.index_item('found', found_item, item_bands)
             
-            messages.success(
-                request,
-                'Your found item post has been submitted! It will appear after admin approval.'
-            )
+            if found_item.duplicate_of:
+                messages.info(
+                    request,
+                    'A very similar post was submitted recently. A moderator will check '
+                    'whether yours is a duplicate before it appears.'
+                )
+            else:
+                messages.success(
+                    request,
+                    'Your found item post has been submitted! It will appear after admin approval.'
+                )
             return redirect('found_items_list')
     else:
         form = FoundItemForm()
@@ -179,6 +260,8 @@ def post_found_item(request):
     return render(request, 'lostfound/post_found.html', {'form': form})
 
 
+@cache_anonymous_page('list:lost')
+@ratelimit('search', methods=('GET',), when=has_search_query)
 def lost_items_list(request):
     """
     View all lost items (approved only).
@@ -186,101 +269,207 @@ def lost_items_list(request):
     # Get search query from URL
     query = request.GET.get('q', '')
     category = request.GET.get('category', '')
+    # Where the current page starts (given by the "Next page" link)
+    cursor = request.GET.get('cursor', '')
     
-    # Start with all approved lost items
-    items = LostItem.objects.filter(is_approved=True)
-    
-    # Filter by search query (search in title and description)
-    if query:
-        items = items.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
-        # Q objects allow complex queries
-        # icontains = case-insensitive contains
-    
-    # Filter by category
-    if category:
-        items = items.filter(category=category)
-    
-    # Order by newest first
-    items = items.order_by('-created_at')
+    # One page of approved items, newest first, or best matches first when
+    # searching (typo-tolerant, see search.py). Results are cached by
+    # search_cache.py until an approved lost item changes.
+    items, next_cursor = search_cache.get_page(LostItem, request.campus, query, category, cursor)
     
     context = {
         'items': items,
         'query': query,
         'category': category,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
     }
     return render(request, 'lostfound/lost_items_list.html', context)
 
 
+@cache_anonymous_page('list:found')
+@ratelimit('search', methods=('GET',), when=has_search_query)
 def found_items_list(request):
     """
     View all found items (approved only).
     """
     query = request.GET.get('q', '')
     category = request.GET.get('category', '')
+    cursor = request.GET.get('cursor', '')
     
-    items = FoundItem.objects.filter(is_approved=True)
-    
-    if query:
-        items = items.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
-    
-    if category:
-        items = items.filter(category=category)
-    
-    items = items.order_by('-created_at')
+    items, next_cursor = search_cache.get_page(FoundItem, request.campus, query, category, cursor)
     
     context = {
         'items': items,
         'query': query,
         'category': category,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
     }
     return render(request, 'lostfound/found_items_list.html', context)
 
 
+@cache_anonymous_page(lambda request, pk: f'detail:lost:{pk}')
 def lost_item_detail(request, pk):
     """
     View details of a specific lost item.
     pk = primary key (unique ID of the item)
     """
-    item = get_object_or_404(LostItem, pk=pk, is_approved=True)
+    item = get_object_or_404(LostItem, pk=pk, campus=request.campus, is_approved=True)
     # get_object_or_404: Get the item, or show 404 error if not found
+    # (items of other campuses are "not found" here too)
     
     context = {
         'item': item,
+        # Lost/found items whose photo looks like this one
+        'similar_items': find_similar_items(item),
+        # Status buttons this user may press (e.g. "I Found It!")
+        'actions': workflow.available_actions('lost', item, request.user),
     }
     return render(request, 'lostfound/lost_item_detail.html', context)
 
 
+@cache_anonymous_page(lambda request, pk: f'detail:found:{pk}')
 def found_item_detail(request, pk):
     """
     View details of a specific found item.
     """
-    item = get_object_or_404(FoundItem, pk=pk, is_approved=True)
+    item = get_object_or_404(FoundItem, pk=pk, campus=request.campus, is_approved=True)
     
     context = {
         'item': item,
+        'similar_items': find_similar_items(item),
+        'actions': workflow.available_actions('found', item, request.user),
     }
     return render(request, 'lostfound/found_item_detail.html', context)
 
+def _change_status(request, kind, pk, action):
+    """
+    Apply a status action (claim, mark_returned...) from a detail page form.
+    The form sends the item's updated_at as "version", so the change fails
+    if someone else changed the item after the page was loaded.
+    """
+    model = LostItem if kind == 'lost' else FoundItem
+    item = get_object_or_404(model, pk=pk, campus=request.campus, is_approved=True)
+    version = parse_datetime(request.POST.get('version', ''))
+    
+    try:
+        message = workflow.apply_action(kind, item, action, request.user, version)
+        messages.success(request, message)
+    except workflow.StatusChangeError as error:
+        messages.error(request, str(error))
+    return redirect(f'{kind}_item_detail', pk=pk)
+
+
 @login_required
 def mark_found(request, pk):
     """
     Allow user to mark their lost item as found.
     """
-    item = get_object_or_404(LostItem, pk=pk)
-    
-    # Check if user is the owner
-    if item.posted_by != request.user:
-        messages.error(request, "You are not authorized to edit this item.")
+    if request.method != 'POST':
         return redirect('lost_item_detail', pk=pk)
-        
-    if request.method == 'POST':
-        item.status = 'found'
-        item.save()
-        messages.success(request, "Great news! Your item has been marked as found.")
-        return redirect('lost_item_detail', pk=pk)
-        
-    return redirect('lost_item_detail', pk=pk)
\ No newline at end of file
+    return _change_status(request, 'lost', pk, 'mark_found')
+
+
+@login_required
+@require_POST
+def lost_item_status(request, pk):
+    """
+    Owner changes the status of their lost item (found / returned / reopen).
+    """
+    return _change_status(request, 'lost', pk, request.POST.get('action', ''))
+
+
+@login_required
+@require_POST
+def found_item_status(request, pk):
+    """
+    Claim a found item, cancel a claim, or (finder) mark it as returned.
+    """
+    return _change_status(request, 'found', pk, request.POST.get('action', ''))
+
+
+def search_suggestions(request):
+    """
+    Suggestions for the search box while the user types (returns JSON).
+    Example: /search/suggest/?kind=lost&q=wal
+    Served from an in-memory index, so no database query per keystroke.
+    """
+    kind = request.GET.get('kind', 'lost')
+    if kind not in ('lost', 'found'):
+        kind = 'lost'
+    suggestions = typeahead_indexes.suggest(request.campus.pk, kind, request.GET.get('q', '')[:100])
+    
+    response = JsonResponse({
+        'suggestions': [{'text': text, 'type': text_type} for text, text_type in suggestions],
+    })
+    # Let the browser reuse answers for a minute (typing back and forth)
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+def offline(request):
+    """
+    The page shown by the service worker when there is no connection and
+    the page asked for isn't saved (see lostfound/pwa.py).
+    """
+    return render(request, 'lostfound/offline.html')
+
+
+def live_items_unavailable(request):
+    """
+    /live/items/ is streamed by the ASGI server (see lostfound/live.py).
+    When running under WSGI this view answers instead: 204 No Content
+    tells the browser's EventSource to stop reconnecting.
+    """
+    return HttpResponse(status=204)
+
+
+def prometheus_metrics(request):
+    """
+    Metrics of all worker processes in the Prometheus text format (see
+    lostfound/metrics.py). Needs the METRICS_TOKEN as a bearer token when
+    one is set, otherwise a staff login.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        expected = f'Bearer {token}'
+        if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif not request.user.is_staff:
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def page_cache_stats(request):
+    """
+    Full-page cache hit ratio of this process (staff only).
+    """
+    return JsonResponse(get_page_cache_stats())
+
+
+@staff_member_required
+def live_stats(request):
+    """
+    Open live-update connections in this process (staff only).
+    """
+    return JsonResponse(live.get_stats())
+
+
+@staff_member_required
+def search_cache_stats(request):
+    """
+    Hit/miss counters of the list/search result cache (staff only).
+    The numbers are for the worker process that answers the request.
+    """
+    return JsonResponse(search_cache.get_stats())
+
+
+@staff_member_required
+def ratelimit_stats(request):
+    """
+    Rate limiting counters for monitoring (staff only).
+    Shows how many requests were allowed/limited per endpoint group.
+    """
+    return JsonResponse(get_ratelimit_stats())
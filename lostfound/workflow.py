@@ -0,0 +1,144 @@
+"""
+Status workflow for lost and found items (claim, return, reopen...).
+
+Lost item (owner only):   pending --mark_found--> found --mark_returned--> returned
+                                 <----reopen-----
+Found item:               pending --claim--> claimed --mark_returned--> returned
+                                  <-release--
+    claim:          any logged-in user except the finder
+    release:        the finder (rejecting the claim) or the claimant
+    mark_returned:  the finder, once they handed the item over
+
+Two people may click "Claim" at the same moment. Instead of locking rows,
+each change is ONE conditional UPDATE (optimistic concurrency):
+
+    UPDATE ... SET status='claimed', claimed_by_id=7, updated_at=now
+     WHERE id=42 AND status='pending' AND updated_at=<what the user saw>
+
+The database runs UPDATEs on a row one after another, so only the first
+claim matches the WHERE clause; the second one updates 0 rows and gets
+StatusConflict ("someone else changed this item"). The WHERE on updated_at
+also catches any other edit made since the user loaded the page. Only the
+changed columns are written and no lock is held between requests.
+
+queryset.update() sends no signals, so apply_action() calls the same
+hooks signals.py would (dashboard counts, analytics, cached pages, sitemap).
+Each change is also appended to the item event log (see events.py), and a
+claim queues an email to the finder (see notifications.py).
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics, dashboard, events, feeds, notifications, page_cache
+from .models import LostItem, FoundItem
+
+
+ITEM_MODELS = {'lost': LostItem, 'found': FoundItem}
+
+# kind -> action -> what it does and who may do it
+ACTIONS = {
+    'lost': {
+        'mark_found': {'from': 'pending', 'to': 'found', 'who': 'owner',
+                       'label': 'I Found It!',
+                       'message': 'Great news! Your item has been marked as found.'},
+        'mark_returned': {'from': 'found', 'to': 'returned', 'who': 'owner',
+                          'label': 'I Got It Back',
+                          'message': 'Your item has been marked as returned.'},
+        'reopen': {'from': 'found', 'to': 'pending', 'who': 'owner',
+                   'label': 'Still Looking',
+                   'message': 'Your item is marked as lost again.'},
+    },
+    'found': {
+        'claim': {'from': 'pending', 'to': 'claimed', 'who': 'other',
+                  'label': 'This Is Mine',
+                  'message': 'You have claimed this item. Contact the finder to get it back.'},
+        'release': {'from': 'claimed', 'to': 'pending', 'who': 'owner_or_claimant',
+                    'label': 'Cancel Claim',
+                    'message': 'The claim has been cancelled.'},
+        'mark_returned': {'from': 'claimed', 'to': 'returned', 'who': 'owner',
+                          'label': 'Returned to Owner',
+                          'message': 'Thank you! The item has been marked as returned.'},
+    },
+}
+
+
+class StatusChangeError(Exception):
+    """
+    The action can't be done (not allowed, or wrong status).
+    """
+
+
+class StatusConflict(StatusChangeError):
+    """
+    Someone else changed the item first.
+    """
+
+
+def _is_allowed(spec, item, user):
+    if not user.is_authenticated:
+        return False
+    is_owner = item.posted_by_id == user.pk
+    if spec['who'] == 'owner':
+        return is_owner
+    if spec['who'] == 'other':
+        return not is_owner
+    # owner_or_claimant
+    return is_owner or getattr(item, 'claimed_by_id', None) == user.pk
+
+
+def available_actions(kind, item, user):
+    """
+    [(action, label), ...] the user can do on the item right now
+    (for the buttons on the detail page).
+    """
+    return [
+        (action, spec['label'])
+        for action, spec in ACTIONS[kind].items()
+        if spec['from'] == item.status and _is_allowed(spec, item, user)
+    ]
+
+
+def apply_action(kind, item, action, user, version=None):
+    """
+    Do `action` on `item` for `user` with a conditional UPDATE.
+
+    `version` is the updated_at the user saw (from the form); if another
+    change happened since, StatusConflict is raised and nothing is written.
+    Returns the success message. `item` is updated in place.
+    """
+    spec = ACTIONS[kind].get(action)
+    if spec is None:
+        raise StatusChangeError('Unknown action.')
+    if not _is_allowed(spec, item, user):
+        raise StatusChangeError('You are not allowed to do that.')
+    if item.status != spec['from']:
+        raise StatusConflict('This item has already been updated. Please check its new status.')
+
+    changes = {'status': spec['to'], 'updated_at': timezone.now()}
+    if kind == 'found' and action == 'claim':
+        changes['claimed_by_id'] = user.pk
+    elif kind == 'found' and action == 'release':
+        changes['claimed_by_id'] = None
+
+    old_status = item.status
+    with transaction.atomic():
+        updated = ITEM_MODELS[kind].objects.filter(
+            pk=item.pk, status=spec['from'], updated_at=version or item.updated_at,
+        ).update(**changes)
+        if not updated:
+            raise StatusConflict('Someone else updated this item just now. Please check its new status.')
+        for field, value in changes.items():
+            setattr(item, field, value)
+        events.record(kind, item, 'status', old_status=old_status)
+        if kind == 'found' and action == 'claim':
+            # Email the finder (queued in the same transaction, see notifications.py)
+            notifications.item_claimed(item)
+    # Same bookkeeping as signals.py does after a save
+    dashboard.invalidate_user(item.posted_by_id)
+    analytics.record_status_change(kind, item, old_status)
+    if item.is_approved:
+        page_cache.item_changed(item.campus_id, kind, item.pk)  # Pages showing the old status
+        feeds.items_changed(kind, [item])  # Sitemap "last modified" dates
+    item._loaded_status = item.status
+    return spec['message']
@@ -0,0 +1,57 @@
+/*
+ * Live updates of new items.
+ * Listens to the server-sent events at /live/items/ and shows a banner
+ * "2 new items posted - Show" instead of making people reload the page.
+ * The <script> tag sets data-campus (the campus ID; only its items are sent)
+ * and may set data-kind="lost" or "found" to only hear one kind.
+ */
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+    const script = document.currentScript;
+    const kind = script && script.dataset.kind;
+    const campus = script && script.dataset.campus;
+    const params = new URLSearchParams();
+    if (campus) {
+        params.set('campus', campus);
+    }
+    if (kind) {
+        params.set('kind', kind);
+    }
+    const url = '/live/items/?' + params.toString();
+    const seen = {};
+    let count = 0;
+    let banner = null;
+
+    function showBanner(text) {
+        if (!banner) {
+            banner = document.createElement('div');
+            banner.className = 'live-banner';
+            banner.addEventListener('click', function () { window.location.reload(); });
+            const main = document.querySelector('main') || document.body;
+            main.insertBefore(banner, main.firstChild);
+        }
+        banner.textContent = text;
+    }
+
+    const source = new EventSource(url);
+
+    source.addEventListener('item', function (event) {
+        const item = JSON.parse(event.data);
+        const key = item.kind + ':' + item.id;
+        if (seen[key]) {
+            return;  // Same item sent again (e.g. edited)
+        }
+        seen[key] = true;
+        count += 1;
+        showBanner(count === 1
+            ? 'New ' + item.kind + ' item: ' + item.title + ' - click to show'
+            : count + ' new items posted - click to show');
+    });
+
+    // We fell behind and were disconnected: just offer a reload
+    source.addEventListener('reset', function () {
+        showBanner('New items were posted - click to show');
+    });
+})();
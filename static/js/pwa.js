@@ -0,0 +1,104 @@
+/*
+ * Offline support (see lostfound/pwa.py).
+ * Registers the service worker (service-worker.js) for the whole site and
+ * shows banners about posts made without a connection.
+ * The <script> tag sets data-worker (the worker's URL), data-assets (static
+ * files to keep for offline use, comma separated), data-shell (this
+ * campus's offline page) and data-user (ID of the logged-in user, if any).
+ */
+(function () {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+    const data = document.currentScript.dataset;
+    const PAGE_CACHE = 'lostfound-pages-v1';  // Same name as in service-worker.js
+
+    function showBanner(text, tags) {
+        let box = document.querySelector('.messages');
+        if (!box) {
+            const main = document.querySelector('main');
+            box = document.createElement('div');
+            box.className = 'messages';
+            main.parentNode.insertBefore(box, main);
+        }
+        const alert = document.createElement('div');
+        alert.className = 'alert alert-' + tags;
+        alert.textContent = text;
+        box.appendChild(alert);
+    }
+
+    const workerUrl = new URL(data.worker, location.href);
+    if (workerUrl.origin !== location.origin) {
+        // Static files on another host (e.g. Cloudinary): browsers only run
+        // workers served by the site itself
+        return;
+    }
+    workerUrl.searchParams.set('assets', data.assets);
+    navigator.serviceWorker.register(workerUrl.href, {scope: '/'}).catch(function (error) {
+        console.warn('Offline support unavailable:', error);
+    });
+
+    // Tell the worker who is logged in (it drops pages kept for someone
+    // else) and, when online, to send posts made offline
+    function pageOpened(registration) {
+        registration.active.postMessage({
+            type: 'page', user: data.user || '', shell: data.shell, online: navigator.onLine,
+        });
+    }
+    navigator.serviceWorker.ready.then(function (registration) {
+        pageOpened(registration);
+        window.addEventListener('online', function () {
+            pageOpened(registration);
+        });
+    });
+
+    navigator.serviceWorker.addEventListener('message', function (event) {
+        if (!event.data || event.data.type !== 'posts-sent') {
+            return;
+        }
+        if (event.data.sent) {
+            showBanner(event.data.sent === 1
+                ? 'Your post made offline has been submitted! It will appear after admin approval.'
+                : event.data.sent + ' posts made offline have been submitted! They will appear after admin approval.',
+            'success');
+        }
+        if (event.data.rejected) {
+            showBanner(event.data.rejected === 1
+                ? 'A post made offline could not be submitted (maybe you were logged out). Please post it again.'
+                : event.data.rejected + ' posts made offline could not be submitted (maybe you were logged out). Please post them again.',
+            'error');
+        }
+    });
+
+    if (location.hash === '#queued-post') {
+        showBanner("You're offline. Your post is saved on this device and will be submitted when you're back online.", 'info');
+        history.replaceState(null, '', location.pathname + location.search);
+    }
+
+    // On the offline page: links to the pages that can be read offline
+    const list = document.getElementById('offline-pages');
+    if (list && window.caches) {
+        caches.open(PAGE_CACHE).then(function (cache) {
+            return cache.keys().then(function (requests) {
+                return Promise.all(requests.reverse().map(function (request) {
+                    return cache.match(request).then(function (response) {
+                        return response.text();
+                    }).then(function (html) {
+                        const title = new DOMParser().parseFromString(html, 'text/html').title;
+                        const link = document.createElement('a');
+                        link.href = request.url;
+                        link.textContent = title || new URL(request.url).pathname;
+                        const item = document.createElement('li');
+                        item.appendChild(link);
+                        return item;
+                    });
+                }));
+            });
+        }).then(function (items) {
+            items.forEach(function (item) {
+                list.appendChild(item);
+            });
+            document.getElementById('offline-pages-box').hidden = items.length === 0;
+        });
+    }
+})();
@@ -0,0 +1,315 @@
+/*
+ * Service worker: makes the site usable on flaky Wi-Fi (overview in
+ * lostfound/pwa.py). pwa.js registers it for the whole site ("/") as
+ *   /static/js/service-worker.<hash>.js?assets=<static files to keep>
+ *
+ * - Static files: served from the shell cache (hashed names never change;
+ *   files without a hash are refreshed in the background).
+ * - Home, list and detail pages: stale-while-revalidate from the page cache
+ *   (the newest MAX_PAGES pages). Right after another page (a form post,
+ *   an action, login/logout) the next page comes from the network, since
+ *   it may show a message about what was just done.
+ * - Without a connection, any page that isn't kept shows the offline shell.
+ * - Lost/found posts made offline are kept in IndexedDB and sent on the
+ *   "sync" event (Background Sync), or when a page asks (pwa.js does on
+ *   every page load and when the browser comes back online).
+ */
+
+const SHELL_CACHE = 'lostfound-shell-v1';
+const PAGE_CACHE = 'lostfound-pages-v1';  // pwa.js lists this cache on the offline page
+const MAX_PAGES = 40;
+const SYNC_TAG = 'lostfound-posts';
+const DEFAULT_SHELL = '/offline/';
+const USER_KEY = '/offline/?user';  // Shell cache entry: the user the kept pages belong to
+const FRESH_MS = 10000;
+
+// The static files of base.html, passed by pwa.js in the worker's URL
+const ASSETS = (new URL(self.location.href).searchParams.get('assets') || '')
+    .split(',').filter(Boolean)
+    .map((url) => new URL(url, self.location.origin).href);
+// This file is <STATIC_URL>js/service-worker.js
+const STATIC_PREFIX = new URL('..', self.location.href).pathname;
+// ManifestStaticFilesStorage adds 12 hex digits: modern_style.3f2a9c8e1b7d.css
+const HASHED_NAME = /\.[0-9a-f]{12}\.\w+$/;
+
+// Home, list and detail pages, optionally under a /c/<slug>/ campus prefix
+const PAGE_PATH = /^(\/c\/[\w-]+)?\/((lost|found)-items\/|(lost|found)-item\/\d+\/)?$/;
+const POST_PATH = /^(\/c\/[\w-]+)?\/post-(lost|found)\/$/;
+const ACCOUNT_PATH = /\/(login|logout|register)\/$/;
+
+// Until when pages are loaded from the network first (see above).
+// Only kept in memory: if the browser stops the worker in between, the
+// next page is simply served the normal way.
+let freshUntil = 0;
+
+
+// ---------------- Install / activate ----------------
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then((cache) => cache.addAll(
+                [DEFAULT_SHELL, ...ASSETS].map((url) => new Request(url, {cache: 'reload'}))
+            ))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        // Caches of older versions of this file
+        for (const name of await caches.keys()) {
+            if (name.startsWith('lostfound-') && name !== SHELL_CACHE && name !== PAGE_CACHE) {
+                await caches.delete(name);
+            }
+        }
+        // Static files of the previous deploy (they have other hashes now)
+        const shell = await caches.open(SHELL_CACHE);
+        for (const request of await shell.keys()) {
+            const path = new URL(request.url).pathname;
+            if (path.startsWith(STATIC_PREFIX) && !ASSETS.includes(request.url)) {
+                await shell.delete(request);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+
+// ---------------- Requests ----------------
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.method === 'GET' && url.pathname.startsWith(STATIC_PREFIX)) {
+        event.respondWith(staticFile(event));
+        return;
+    }
+    if (request.mode !== 'navigate') {
+        return;  // Photos, search suggestions, live updates...: the browser's normal way
+    }
+    if (request.method === 'GET' && PAGE_PATH.test(url.pathname)) {
+        event.respondWith(page(event, url));
+        return;
+    }
+
+    freshUntil = Date.now() + FRESH_MS;
+    if (ACCOUNT_PATH.test(url.pathname)) {
+        // Kept pages show the menu and forms of whoever was logged in
+        event.waitUntil(caches.delete(PAGE_CACHE));
+    }
+    if (request.method === 'POST' && POST_PATH.test(url.pathname)) {
+        event.respondWith(postOrQueue(request));
+    } else if (request.method === 'GET') {
+        event.respondWith(fetch(request).catch(() => offlineShell(url)));
+    }
+});
+
+async function staticFile(event) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(event.request);
+    const fresh = fetch(event.request).then(async (response) => {
+        if (response.ok && response.type === 'basic') {
+            await cache.put(event.request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        if (!HASHED_NAME.test(event.request.url)) {
+            event.waitUntil(fresh.catch(() => null));
+        }
+        return cached;
+    }
+    return fresh;
+}
+
+function keepable(response) {
+    // No redirects, errors or pages marked no-store (pages showing a
+    // message, see NoStoreMessagesMiddleware)
+    return response.status === 200 && response.type === 'basic' && !response.redirected
+        && !/no-store/.test(response.headers.get('Cache-Control') || '');
+}
+
+async function page(event, url) {
+    const cache = await caches.open(PAGE_CACHE);
+    const cached = await cache.match(url.href, {ignoreVary: true});
+    const fresh = fetch(event.request).then(async (response) => {
+        if (keepable(response)) {
+            await cache.put(url.href, response.clone());
+            // Cache keys are in the order they were stored: drop the oldest
+            const keys = await cache.keys();
+            await Promise.all(keys.slice(0, Math.max(keys.length - MAX_PAGES, 0)).map((key) => cache.delete(key)));
+        } else if (response.status === 404) {
+            await cache.delete(url.href);  // Item deleted or no longer approved
+        }
+        return response;
+    });
+
+    if (cached && Date.now() >= freshUntil) {
+        event.waitUntil(fresh.catch(() => null));
+        return cached;
+    }
+    try {
+        const response = await fresh;
+        freshUntil = 0;
+        return response;
+    } catch (error) {
+        return cached || offlineShell(url);
+    }
+}
+
+async function offlineShell(url) {
+    const cache = await caches.open(SHELL_CACHE);
+    const prefix = (url.pathname.match(/^\/c\/[\w-]+/) || [''])[0];
+    const shell = await cache.match(prefix + DEFAULT_SHELL) || await cache.match(DEFAULT_SHELL);
+    return shell || new Response('You are offline.', {
+        status: 503, headers: {'Content-Type': 'text/plain; charset=utf-8'},
+    });
+}
+
+
+// ---------------- Posts made offline ----------------
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open('lostfound-offline', 1);
+        open.onupgradeneeded = () => open.result.createObjectStore('posts', {keyPath: 'id', autoIncrement: true});
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+// Run work(store) in one transaction; resolves with the result of the
+// IndexedDB request it returns, once the transaction is committed
+async function withPosts(mode, work) {
+    const db = await openQueue();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction('posts', mode);
+        const request = work(transaction.objectStore('posts'));
+        transaction.oncomplete = () => {
+            db.close();
+            resolve(request.result);
+        };
+        transaction.onerror = transaction.onabort = () => {
+            db.close();
+            reject(transaction.error);
+        };
+    });
+}
+
+async function postOrQueue(request) {
+    // Read the form first: the request's body can only be sent once
+    const form = await request.clone().formData();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        // No connection: keep the post (photos are kept as files too)
+        await withPosts('readwrite', (store) => store.add({
+            url: request.url, fields: Array.from(form.entries()), queuedAt: Date.now(),
+        }));
+        if (self.registration.sync) {
+            await self.registration.sync.register(SYNC_TAG).catch(() => null);
+        }
+        // Show the (kept) list; pwa.js sees #queued-post and explains what happened
+        const list = new URL(request.url).pathname.replace(/post-(lost|found)\/$/, '$1-items/');
+        return Response.redirect(new URL(list + '#queued-post', self.location.origin).href, 303);
+    }
+}
+
+let sending = null;
+
+// Send the kept posts, oldest first. Rejects while posts are left, so the
+// browser fires "sync" again later
+function sendQueued() {
+    if (!sending) {
+        sending = sendPosts().finally(() => {
+            sending = null;
+        });
+    }
+    return sending;
+}
+
+async function sendPosts() {
+    const posts = await withPosts('readonly', (store) => store.getAll());
+    let sent = 0;
+    let rejected = 0;
+    let left = posts.length;
+    for (const post of posts) {
+        const body = new FormData();
+        for (const [name, value] of post.fields) {
+            body.append(name, value);
+        }
+        let response;
+        try {
+            response = await fetch(post.url, {method: 'POST', body: body, credentials: 'same-origin'});
+        } catch (error) {
+            break;  // Still offline
+        }
+        if (response.status === 429 || response.status >= 500) {
+            break;  // Rate limited or server trouble: try again later
+        }
+        // A successful post redirects to the list; a form error shows the
+        // form again, and an expired login redirects to the login page
+        if (response.redirected && !/\/login\/$/.test(new URL(response.url).pathname)) {
+            sent += 1;
+        } else {
+            rejected += 1;
+        }
+        await withPosts('readwrite', (store) => store.delete(post.id));
+        left -= 1;
+    }
+
+    if (sent || rejected) {
+        for (const client of await self.clients.matchAll({type: 'window'})) {
+            client.postMessage({type: 'posts-sent', sent: sent, rejected: rejected});
+        }
+    }
+    if (left) {
+        throw new Error(`${left} offline posts not sent yet`);
+    }
+}
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(sendQueued());
+    }
+});
+
+
+// ---------------- Messages from pages (pwa.js) ----------------
+
+self.addEventListener('message', (event) => {
+    const data = event.data || {};
+    if (data.type === 'page') {
+        event.waitUntil(pageOpened(data).catch(() => null));
+    }
+});
+
+async function pageOpened(data) {
+    const shell = await caches.open(SHELL_CACHE);
+    const user = data.user || '';
+    const known = await shell.match(USER_KEY);
+    if (!known || await known.text() !== user) {
+        // Another user (or none) than on the kept pages: they show the
+        // other user's menu and forms, so drop them and the shells
+        await caches.delete(PAGE_CACHE);
+        for (const request of await shell.keys()) {
+            if (new URL(request.url).pathname.endsWith(DEFAULT_SHELL)) {
+                await shell.delete(request);
+            }
+        }
+        await shell.put(USER_KEY, new Response(user));
+    }
+    // The shell of this page's campus (and the default one)
+    for (const url of new Set([DEFAULT_SHELL, data.shell || DEFAULT_SHELL])) {
+        if (!await shell.match(url)) {
+            await shell.add(new Request(url, {cache: 'reload'})).catch(() => null);
+        }
+    }
+    if (data.online) {
+        await sendQueued().catch(() => null);
+    }
+}
@@ -0,0 +1,46 @@
+/*
+ * Search box suggestions.
+ * While the user types in a search box that has a data-suggest-url,
+ * ask the server for suggestions and show them in the box's <datalist>.
+ */
+(function () {
+    const DELAY_MS = 120;  // Wait for a short pause in typing
+
+    document.querySelectorAll('input[data-suggest-url]').forEach(function (input) {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        let lastQuery = '';
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                const query = input.value.trim();
+                if (query === lastQuery) {
+                    return;
+                }
+                lastQuery = query;
+                if (!query) {
+                    datalist.innerHTML = '';
+                    return;
+                }
+
+                fetch(input.dataset.suggestUrl + '&q=' + encodeURIComponent(query))
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        // Ignore answers to older queries
+                        if (query !== lastQuery) {
+                            return;
+                        }
+                        datalist.innerHTML = '';
+                        data.suggestions.forEach(function (suggestion) {
+                            const option = document.createElement('option');
+                            option.value = suggestion.text;
+                            option.label = suggestion.type;
+                            datalist.appendChild(option);
+                        });
+                    })
+                    .catch(function () { /* Suggestions are optional */ });
+            }, DELAY_MS);
+        });
+    });
+})();